@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from extractors import KINDS, extract_all
+from table_backends import DEFAULT_TABLE_BACKEND
+from ocr import OcrCache, OcrReader
+from pdf_source import source_name
+from result_cache import ResultCache
+from templates import TemplateStore
+from timing import StageTimer
+from time_budget import DOCUMENT_BUDGET, PAGE_BUDGET
+
+# One cache / template store / OCR reader per pool process, opened on first use
+_caches = {}
+# Files submitted per pool process ahead of the next result iter_batch yields
+SUBMIT_AHEAD = 4
+
+
+def collect_pdfs(inputs, extensions=(".pdf",)):
+    # Accept a directory, a single file or a list mixing both.
+    # Directories are scanned (non-recursively) and sorted so batches are reproducible.
+    # Other file types (e.g. Word files for conversion) via `extensions`.
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            names = sorted(n for n in os.listdir(item) if n.lower().endswith(extensions))
+            paths.extend(os.path.join(item, n) for n in names)
+        elif item.lower().endswith(extensions):
+            paths.append(item)
+    # Drop duplicates but keep first-seen order
+    seen = set()
+    unique = []
+    for p in paths:
+        key = os.path.normcase(os.path.abspath(p))
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def extract_file(pdf_path, kinds, table_backend=DEFAULT_TABLE_BACKEND, use_cache=False, track_memory=False,
+                 use_templates=False, low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET,
+                 document_budget=DOCUMENT_BUDGET, ocr=None):
+    # Runs inside a pool process: parse one PDF (a path or a pdf_source.PdfSource) once for every requested kind.
+    # Returns (result, cached, stage records) where `cached` is True if nothing
+    # had to be parsed. low_memory / memory_limit (MB) bound the pool process
+    # while it parses the file, page_budget / document_budget (seconds) its
+    # time (see extractors.ParsedReport). `ocr` names an OCR engine (ocr.py)
+    # for pages without a text layer; the pool already runs a file per
+    # process, so each recognizes one page at a time.
+    timer = StageTimer(track_memory)
+    try:
+        templates = None
+        if use_templates:
+            if 'templates' not in _caches:
+                _caches['templates'] = TemplateStore()
+            templates = _caches['templates']
+        reader = None
+        if ocr is not None:
+            if ('ocr', ocr, use_cache) not in _caches:
+                _caches[('ocr', ocr, use_cache)] = OcrReader(ocr, OcrCache() if use_cache else None, workers=1)
+            reader = _caches[('ocr', ocr, use_cache)]
+        if not use_cache:
+            result = extract_all(pdf_path, kinds, table_backend, timer=timer, templates=templates,
+                                 low_memory=low_memory, memory_limit=memory_limit, page_budget=page_budget,
+                                 document_budget=document_budget, ocr=reader)
+            return result, False, timer.records
+        if 'default' not in _caches:
+            _caches['default'] = ResultCache()
+        cache = _caches['default']
+        misses = cache.misses
+        result = extract_all(pdf_path, kinds, table_backend, cache, timer, templates, low_memory, memory_limit,
+                             page_budget, document_budget, reader)
+        return result, cache.misses == misses, timer.records
+    finally:
+        timer.close()
+
+
+def iter_batch(paths, kinds=None, max_workers=None, on_result=None, table_backend=DEFAULT_TABLE_BACKEND,
+               use_cache=False, timings=None, track_memory=False, use_templates=False, low_memory=False,
+               memory_limit=None, page_budget=PAGE_BUDGET, document_budget=DOCUMENT_BUDGET, ocr=None):
+    # Extract every PDF on a process pool, yielding (path, result, error) in
+    # input order as soon as a file and all files before it are done, so the
+    # caller can write rows while the rest are still parsed. `result` maps
+    # kind -> rows; a failing file only sets its own `error`.
+    # on_result(done, total, path, error, cached) fires per completed file (in
+    # completion order; total is None when `paths` has no length). Only a few files per process are submitted ahead of
+    # the next one to yield, so finished results never pile up however big the batch.
+    # Pass a list as `timings` to collect (path, stage records) of each extracted file.
+    # use_templates reuses table layouts learned per report template (templates.py).
+    # low_memory / memory_limit (MB) apply in each pool process; a file over the limit fails on its own.
+    # page_budget / document_budget (seconds) bound each file's table pass: a page over them is read
+    # with the fallback engine and listed under the result's extractors.DEGRADED key, so one
+    # pathological file cannot hold a pool process for long.
+    # ocr names an OCR engine for scanned pages (see extract_file).
+    kinds = list(kinds or KINDS)
+    # `paths` may also hold pdf_source.PdfSource items (archive members, uploads)
+    # and be any iterable: a generator is consumed only as files are submitted
+    total = len(paths) if hasattr(paths, '__len__') else None
+    if total == 0:
+        return
+    items = iter(paths)
+    window = (max_workers or os.cpu_count() or 1) * SUBMIT_AHEAD
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}  # future -> index
+        names = {}  # index -> name, of the files submitted and not yet yielded
+        ready = {}  # index -> ((path, result, error), stage records)
+        submitted = yielded = done = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and submitted - yielded < window:
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    future = pool.submit(extract_file, item, kinds, table_backend, use_cache, track_memory,
+                                         use_templates, low_memory, memory_limit, page_budget, document_budget,
+                                         ocr)
+                    futures[future] = submitted
+                    names[submitted] = source_name(item)
+                    submitted += 1
+                if exhausted and yielded == submitted:
+                    break
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    i = futures.pop(future)
+                    cached = False
+                    try:
+                        result, cached, records = future.result()
+                        ready[i] = ((names[i], result, None), records)
+                    except Exception as e:
+                        ready[i] = ((names[i], None, str(e) or e.__class__.__name__), None)
+                    done += 1
+                    if on_result:
+                        on_result(done, total, names[i], ready[i][0][2], cached)
+                while yielded in ready:
+                    item, records = ready.pop(yielded)
+                    del names[yielded]
+                    if timings is not None and records is not None:
+                        timings.append((item[0], records))
+                    yielded += 1
+                    yield item
+        except BaseException:
+            # on_result or the consumer raised (e.g. the job was cancelled): drop the files not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+
+def run_batch(paths, kinds=None, max_workers=None, on_result=None, table_backend=DEFAULT_TABLE_BACKEND,
+              use_cache=False, timings=None, track_memory=False, use_templates=False, low_memory=False,
+              memory_limit=None, page_budget=PAGE_BUDGET, document_budget=DOCUMENT_BUDGET, ocr=None):
+    # iter_batch collected into a list of (path, result, error) tuples
+    return list(iter_batch(paths, kinds, max_workers, on_result, table_backend, use_cache, timings, track_memory,
+                           use_templates, low_memory, memory_limit, page_budget, document_budget, ocr))
+
+
+def combine_results(results, kinds=None):
+    # Flatten per-file results into one row list per kind, tagging each row
+    # with its source file. Failed files are collected separately.
+    kinds = list(kinds or KINDS)
+    combined = {kind: [] for kind in kinds}
+    failures = []
+    for path, result, error in results:
+        source = os.path.basename(path)
+        if error is not None:
+            failures.append({'源文件': source, '错误': error})
+            continue
+        for kind in kinds:
+            for row in result.get(kind, []):
+                combined[kind].append({'源文件': source, **row})
+    return combined, failures
@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from extractors import ParsedReport, parse_rearrangements, parse_mutations
+
+# Wall time per report for table extraction over every page ("full", the old
+# behaviour) versus only the pages located from the PyMuPDF text ("targeted").
+#
+#   python benchmarks/bench_table_pages.py [report.pdf ...] [--repeat 3]
+#
+# Without arguments it uses the sample report plus 40- and 60-page copies of it.
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample", "NGS报告范例.pdf")
+
+
+def make_long_copies(tmp_dir, copies=(2, 3)):
+    paths = []
+    for n in copies:
+        src = fitz.open(SAMPLE)
+        out = fitz.open()
+        for _ in range(n):
+            out.insert_pdf(src)
+        path = os.path.join(tmp_dir, f"sample_x{n}.pdf")
+        out.save(path)
+        paths.append(path)
+        out.close()
+        src.close()
+    return paths
+
+
+def run_once(pdf_path, targeted):
+    start = time.perf_counter()
+    with ParsedReport(pdf_path, targeted=targeted) as report:
+        rows = (parse_rearrangements(report), parse_mutations(report))
+        pages = len(report.page_texts)
+        located = len(report.table_regions) if targeted else pages
+    return time.perf_counter() - start, rows, pages, located
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-page vs page-targeted table extraction timing")
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdfs = args.pdfs or [SAMPLE] + make_long_copies(tmp_dir)
+        print(f"{'report':<28}{'pages':>6}{'located':>9}{'full s':>9}{'targeted s':>12}{'speedup':>9}  same")
+        for pdf_path in pdfs:
+            full = [run_once(pdf_path, False) for _ in range(args.repeat)]
+            targeted = [run_once(pdf_path, True) for _ in range(args.repeat)]
+            t_full = min(r[0] for r in full)
+            t_targeted = min(r[0] for r in targeted)
+            same = full[0][1] == targeted[0][1]
+            print(f"{os.path.basename(pdf_path)[:27]:<28}{full[0][2]:>6}{targeted[0][3]:>9}"
+                  f"{t_full:>9.3f}{t_targeted:>12.3f}{t_full / t_targeted:>8.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
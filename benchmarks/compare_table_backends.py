@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch import collect_pdfs
+from extractors import ParsedReport, parse_rearrangements, parse_mutations, REARRANGEMENT_COLUMNS, MUTATION_COLUMNS
+from table_backends import TABLE_BACKENDS
+
+# Runs every table backend over a directory of reports and compares them
+# against the first backend: wall time per report and cell-level agreement
+# of the mutation / rearrangement rows (rows aligned by position, only the
+# table-derived columns compared).
+#
+#   python benchmarks/compare_table_backends.py reports/ [--backends pdfplumber fitz] [--json out.json]
+
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample")
+
+TABLE_COLUMNS = {
+    'rearrangement': [c for c in REARRANGEMENT_COLUMNS if c not in ('姓名', '检测号')],
+    'mutation': [c for c in MUTATION_COLUMNS if c != '检测号'],
+}
+
+
+def run_backend(pdf_path, backend):
+    start = time.perf_counter()
+    with ParsedReport(pdf_path, table_backend=backend) as report:
+        rows = {'rearrangement': parse_rearrangements(report), 'mutation': parse_mutations(report)}
+    return time.perf_counter() - start, rows
+
+
+def agreement(reference, other):
+    # (matching cells, total cells) across both table kinds
+    same = total = 0
+    for kind, columns in TABLE_COLUMNS.items():
+        ref_rows, other_rows = reference[kind], other[kind]
+        for i in range(max(len(ref_rows), len(other_rows))):
+            for col in columns:
+                a = ref_rows[i][col] if i < len(ref_rows) else None
+                b = other_rows[i][col] if i < len(other_rows) else None
+                total += 1
+                same += a == b
+    return same, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare table backends for speed and cell agreement")
+    parser.add_argument("inputs", nargs="*", default=[SAMPLE_DIR])
+    parser.add_argument("--backends", nargs="+", default=list(TABLE_BACKENDS), choices=list(TABLE_BACKENDS))
+    parser.add_argument("--json", help="write per-report results to this file")
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.inputs)
+    ref = args.backends[0]
+    records = []
+    totals = {b: {'seconds': 0.0, 'same': 0, 'cells': 0} for b in args.backends}
+
+    print(f"{'report':<30}" + "".join(f"{b + ' s':>14}" for b in args.backends)
+          + "".join(f"{b + ' agree':>16}" for b in args.backends[1:]))
+    for pdf_path in pdfs:
+        record = {'report': pdf_path}
+        results = {}
+        for backend in args.backends:
+            try:
+                seconds, rows = run_backend(pdf_path, backend)
+            except Exception as e:
+                record[backend] = {'error': str(e)}
+                continue
+            results[backend] = rows
+            record[backend] = {'seconds': seconds,
+                               'rows': {k: len(v) for k, v in rows.items()}}
+            totals[backend]['seconds'] += seconds
+
+        line = f"{os.path.basename(pdf_path)[:29]:<30}"
+        line += "".join(f"{record[b]['seconds']:>14.3f}" if 'seconds' in record[b] else f"{'error':>14}"
+                        for b in args.backends)
+        for backend in args.backends[1:]:
+            if ref in results and backend in results:
+                same, cells = agreement(results[ref], results[backend])
+                record[backend]['agreement'] = same / cells if cells else 1.0
+                totals[backend]['same'] += same
+                totals[backend]['cells'] += cells
+                line += f"{record[backend]['agreement']:>15.1%} "
+            else:
+                line += f"{'-':>16}"
+        print(line)
+        records.append(record)
+
+    print()
+    for backend in args.backends:
+        t = totals[backend]
+        summary = f"{backend:<12} total {t['seconds']:.3f}s"
+        if backend != ref and t['cells']:
+            summary += f", {t['same']}/{t['cells']} cells agree with {ref} ({t['same'] / t['cells']:.1%})"
+        print(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({'reference': ref, 'reports': records, 'totals': totals}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fitz  # PyMuPDF
+import pandas as pd
+from extractors import KINDS, KIND_COLUMNS, extract_all
+from table_backends import TABLE_BACKENDS, DEFAULT_TABLE_BACKEND
+from templates import TemplateStore
+from timing import StageTimer
+from synthetic_reports import make_report
+
+# Extractor benchmark suite. Times every extractor on the sample report and
+# on synthetic reports (synthetic_reports.py) of growing size, checks each
+# output against the expected rows, and checks the sample against the
+# committed sample/*.xlsx files. Runs offline; everything is generated in a
+# temporary directory.
+#
+#   python benchmarks/run_benchmarks.py                     full suite
+#   python benchmarks/run_benchmarks.py --quick             sample + three synthetic cases (one continued table)
+#   python benchmarks/run_benchmarks.py --compare benchmark-abc1234.json
+#   python benchmarks/run_benchmarks.py --templates         reuse learned table layouts
+#   python benchmarks/run_benchmarks.py --page-workers 8    also spread each report's table pass over 8 processes
+#
+# Results go to benchmark-<commit>.json (or --output): one entry per case,
+# extractor and table backend with min/median seconds, pages/s, reports/s,
+# the per-stage breakdown of the fastest run and whether the output matched.
+# The exit status is 1 if any output check failed. With --templates the
+# layouts (templates.py) go to a fresh store, so each case's first run learns
+# them and the later runs reuse them; compare against a run without it.
+# With --page-workers every table extractor is timed a second time with
+# ParsedReport.page_workers, and a single-report latency table compares the
+# two (one report at a time, as the GUI and `cli extract` on one file run it).
+
+EXTRACTORS = {'basic': ['basic'], 'rearrangement': ['rearrangement'], 'mutation': ['mutation'], 'all': KINDS}
+
+# name, pages, mutation rows, rearrangement rows, label style, header repeated on continuation pages
+CASES = [
+    ('syn_20p_stacked', 20, 19, 0, 'stacked', True),
+    ('syn_20p_spaced', 20, 19, 1, 'spaced', True),
+    ('syn_20p_compact', 20, 19, 1, 'compact', True),
+    ('syn_60p', 60, 40, 2, 'stacked', True),
+    ('syn_60p_no_mutations', 60, 0, 0, 'compact', True),
+    ('syn_120p', 120, 80, 5, 'spaced', True),
+    ('syn_120p_continued', 120, 80, 5, 'spaced', False),
+    ('syn_300p', 300, 600, 20, 'stacked', True),
+]
+QUICK_CASES = ['syn_20p_stacked', 'syn_60p', 'syn_120p_continued']
+
+SAMPLE_DIR = os.path.join(ROOT, "sample")
+SAMPLE_PDF = os.path.join(SAMPLE_DIR, "NGS报告范例.pdf")
+SAMPLE_SHEETS = {'basic': "基础信息.xlsx", 'rearrangement': "重排结果.xlsx", 'mutation': "突变数据.xlsx"}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else "unknown"
+    except OSError:
+        return "unknown"
+
+
+def sample_expected():
+    # The committed workbooks, read as text the way the extractors return cells
+    expected = {}
+    for kind, name in SAMPLE_SHEETS.items():
+        df = pd.read_excel(os.path.join(SAMPLE_DIR, name), dtype=str, keep_default_na=False)
+        expected[kind] = df[KIND_COLUMNS[kind]].to_dict('records')
+    return expected
+
+
+def first_difference(got, expected):
+    if len(got) != len(expected):
+        return f"{len(got)} rows, expected {len(expected)}"
+    for i, (a, b) in enumerate(zip(got, expected)):
+        for key in b:
+            if a.get(key) != b[key]:
+                return f"row {i} {key}: {a.get(key)!r} != {b[key]!r}"
+    return None
+
+
+def time_extractor(pdf_path, kinds, backend, repeat, templates=None, page_workers=1):
+    runs = []
+    for _ in range(repeat):
+        timer = StageTimer()
+        start = time.perf_counter()
+        result = extract_all(pdf_path, kinds, backend, timer=timer, templates=templates, page_workers=page_workers)
+        runs.append((time.perf_counter() - start, result, timer.records))
+    best = min(runs, key=lambda r: r[0])
+    return [r[0] for r in runs], best[1], best[2]
+
+
+def run_case(name, pdf_path, expected, extractors, backends, repeat, templates=None, page_workers=None):
+    with fitz.open(pdf_path) as doc:
+        pages = doc.page_count
+    entries = []
+    for extractor in extractors:
+        kinds = EXTRACTORS[extractor]
+        # Basic info never touches the table backend
+        for backend in ([DEFAULT_TABLE_BACKEND] if extractor == 'basic' else backends):
+            for workers in [1] + ([page_workers] if page_workers and extractor != 'basic' else []):
+                seconds, result, stages = time_extractor(pdf_path, kinds, backend, repeat, templates, workers)
+                problems = {kind: first_difference(result[kind], expected[kind]) for kind in kinds}
+                problems = {kind: p for kind, p in problems.items() if p}
+                best = min(seconds)
+                entries.append({
+                    'case': name, 'extractor': extractor, 'backend': backend, 'page_workers': workers,
+                    'pages': pages, 'seconds_min': best, 'seconds_median': statistics.median(seconds),
+                    'pages_per_s': pages / best, 'reports_per_s': 1 / best,
+                    'correct': not problems, 'problems': problems,
+                    'stages': {s['stage']: round(s['seconds'], 6) for s in stages},
+                })
+                label = backend if workers == 1 else f"{backend}x{workers}"
+                print(f"{name:<22}{extractor:<15}{label:<14}{pages:>6}{best:>9.3f}{pages / best:>10.1f}"
+                      f"{1 / best:>10.2f}  {'ok' if not problems else 'FAIL ' + '; '.join(problems.values())}")
+    return entries
+
+
+def latency_table(results, page_workers):
+    # Single-report latency, table pass in one process vs over `page_workers`
+    one = {(e['case'], e['extractor'], e['backend']): e for e in results if e.get('page_workers', 1) == 1}
+    print(f"\nsingle-report latency, table pass over {page_workers} processes ({os.cpu_count()} CPUs)")
+    print(f"{'case':<22}{'extractor':<15}{'backend':<14}{'1 proc s':>9}{'N proc s':>9}{'speedup':>9}")
+    for e in results:
+        o = one.get((e['case'], e['extractor'], e['backend']))
+        if e.get('page_workers', 1) == 1 or not o:
+            continue
+        print(f"{e['case']:<22}{e['extractor']:<15}{e['backend']:<14}{o['seconds_min']:>9.3f}"
+              f"{e['seconds_min']:>9.3f}{o['seconds_min'] / e['seconds_min']:>8.2f}x")
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(e['case'], e['extractor'], e['backend'], e.get('page_workers', 1)): e for e in baseline['results']}
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline_path})")
+    print(f"{'case':<22}{'extractor':<15}{'backend':<14}{'old s':>9}{'new s':>9}{'speedup':>9}")
+    for e in results:
+        o = old.get((e['case'], e['extractor'], e['backend'], e.get('page_workers', 1)))
+        if not o:
+            continue
+        note = "" if e['correct'] or not o['correct'] else "  now FAILS"
+        workers = e.get('page_workers', 1)
+        label = e['backend'] if workers == 1 else f"{e['backend']}x{workers}"
+        print(f"{e['case']:<22}{e['extractor']:<15}{label:<14}{o['seconds_min']:>9.3f}"
+              f"{e['seconds_min']:>9.3f}{o['seconds_min'] / e['seconds_min']:>8.2f}x{note}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extractor benchmark suite on the sample and synthetic reports")
+    parser.add_argument("--quick", action="store_true", help="sample plus three synthetic cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--extractors", nargs="+", choices=list(EXTRACTORS), default=list(EXTRACTORS))
+    parser.add_argument("--backends", nargs="+", choices=list(TABLE_BACKENDS), default=[DEFAULT_TABLE_BACKEND])
+    parser.add_argument("--output", help="results file (default: benchmark-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    parser.add_argument("--templates", action="store_true", help="learn and reuse report table layouts")
+    parser.add_argument("--page-workers", type=int, metavar="N",
+                        help="also time table extraction with each report's pages spread over N processes")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    cases = [c for c in CASES if not args.quick or c[0] in QUICK_CASES]
+    print(f"{'case':<22}{'extractor':<15}{'backend':<14}{'pages':>6}{'min s':>9}{'pages/s':>10}{'reports/s':>10}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        templates = TemplateStore(os.path.join(tmp_dir, "templates.sqlite3")) if args.templates else None
+        results += run_case('sample', SAMPLE_PDF, sample_expected(), args.extractors, args.backends, args.repeat,
+                            templates, args.page_workers)
+        for seed, (name, pages, mutations, rearrangements, style, repeat_header) in enumerate(cases):
+            pdf_path = os.path.join(tmp_dir, name + ".pdf")
+            expected = make_report(pdf_path, pages, mutations, rearrangements, style, seed, repeat_header)
+            results += run_case(name, pdf_path, expected, args.extractors, args.backends, args.repeat, templates,
+                                args.page_workers)
+        if templates is not None:
+            print(templates.stats_message())
+            templates.close()
+
+    output = args.output or f"benchmark-{commit}.json"
+    meta = {
+        'commit': commit, 'time': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(),
+        'platform': platform.platform(), 'pymupdf': fitz.VersionBind, 'repeat': args.repeat,
+        'templates': args.templates, 'page_workers': args.page_workers, 'cpus': os.cpu_count(),
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=1)
+    print(f"\nresults: {output}")
+
+    if args.page_workers:
+        latency_table(results, args.page_workers)
+
+    if args.compare:
+        compare(results, args.compare)
+
+    failed = [e for e in results if not e['correct']]
+    if failed:
+        print(f"{len(failed)} output check(s) failed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
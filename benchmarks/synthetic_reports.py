@@ -0,0 +1,258 @@
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from extractors import BASIC_COLUMNS
+
+# Synthetic NGS reports modelled on sample/NGS报告范例.pdf: a running header
+# with 检测号 and version numbers on every page, the basic-info block on page 2,
+# ruled mutation / rearrangement tables from page 3 (the header row repeated
+# when a table runs onto the next page, unless repeat_header=False) and interpretation text up to the
+# requested page count. make_report() returns the rows the extractors are
+# expected to produce, so benchmarks can check correctness as well as speed.
+#
+#   python benchmarks/synthetic_reports.py out_dir --pages 60 --mutations 40 --rearrangements 2
+#
+# label_style controls how the spaced labels (姓名, 性别, 年龄, 身份证号) are laid out:
+#   compact  "姓名：张AB"
+#   spaced   "姓 名：张AB"
+#   stacked  one text block per character, then "：" and the value, as in the sample
+
+LABEL_STYLES = ['compact', 'spaced', 'stacked']
+SPACED_LABELS = {'姓名', '性别', '年龄', '身份证号'}
+
+PAGE_WIDTH, PAGE_HEIGHT = 595.3, 841.9
+LEFT, RIGHT, BOTTOM = 50, 545, 790
+FONT = "china-s"  # PyMuPDF built-in CJK font, so no font files are needed
+
+MUTATION_HEADER = ["突变基因", "转录本ID", "外显子", "核苷酸改变", "氨基酸改变", "突变频率"]
+MUTATION_WIDTHS = [120, 100, 55, 90, 70, 60]
+REARRANGEMENT_HEADER = ["重排基因", "左断裂点位置", "右断裂点位置"]
+REARRANGEMENT_WIDTHS = [165, 165, 165]
+ROW_HEIGHT = 18
+
+GENES = [("MYD88", "NM_002468"), ("ATM", "NM_000051"), ("CD79B", "NM_000626"), ("CREBBP", "NM_004380"),
+         ("KLHL14", "NM_020805"), ("PIM1", "NM_001243186"), ("TP53", "NM_000546"), ("EZH2", "NM_004456"),
+         ("BCL2", "NM_000633"), ("NOTCH1", "NM_017617"), ("TNFAIP3", "NM_006290"), ("CARD11", "NM_032415")]
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+FUSIONS = [("BCL2/IGH", "chr18", "chr14"), ("MYC/IGH", "chr8", "chr14"), ("BCL6/IGH", "chr3", "chr14"),
+           ("MYC/IGL", "chr8", "chr22")]
+FILLER = ("本检测基于高通量测序技术，对送检样本进行靶向区域捕获测序。检测结果仅对本次送检样本负责，"
+          "结果解读需结合临床表现、病理诊断及其他实验室检查综合判断。")
+FILLER_TABLE_WORDS = "部分基因的拷贝数改变及表达改变不在本检测范围内，如需评估请选择相应检测项目。"
+
+
+def id_number(rng, age):
+    body = f"{rng.randint(110000, 659000)}{2023 - age}{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}" \
+           f"{rng.randint(0, 999):03d}"
+    weights = [7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2]
+    check = "10X98765432"[sum(int(d) * w for d, w in zip(body, weights)) % 11]
+    return body + check
+
+
+def basic_values(rng):
+    age = rng.randint(18, 85)
+    return {
+        '检测号': f"JX{rng.randint(202300000, 202399999)}",
+        '报告系统版本号': "acornHMDB V3.0",
+        '生信分析版本号': "acornHMAS V2.0",
+        '上机号': str(rng.randint(230000, 239999)),
+        '姓名': rng.choice("张王李赵刘陈杨黄周吴") + "".join(rng.choice("ABCDEFGHJK") for _ in range(2)),
+        '性别': rng.choice("男女"),
+        '年龄': f"{age}岁",
+        '采样日期': f"2023-{rng.randint(1, 12):02d}-{rng.randint(10, 28):02d}",
+        '标本类型': rng.choice(["骨髓、唾液", "外周血", "组织"]),
+        '住院号': rng.choice(["-", str(rng.randint(100000, 999999))]),
+        '病理号': rng.choice(["-", f"B{rng.randint(10000, 99999)}"]),
+        '身份证号': id_number(rng, age),
+        '送检日期': f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 9):02d}",
+        '病历号': str(rng.randint(2300000000, 2399999999)),
+        '送检医生': rng.choice("张王李赵刘陈") + rng.choice("德明华强"),
+        '送检单位': rng.choice(["本院", "外院"]),
+        '检测项目': "淋巴瘤基因DNA 检测",
+        '检测方法': "Illumina 高通量测序（NGS）",
+        '送检材料': rng.choice(["骨髓、唾液", "外周血"]),
+        '临床诊断': rng.choice(["弥漫大B 细胞淋巴瘤", "滤泡性淋巴瘤", "套细胞淋巴瘤"]),
+    }
+
+
+def mutation_rows(rng, count):
+    rows = []
+    for _ in range(count):
+        gene, transcript = rng.choice(GENES)
+        germline = rng.random() < 0.1
+        pos = rng.randint(30, 3000)
+        ref, alt = rng.sample("ACGT", 2)
+        codon = rng.randint(10, 900)
+        rows.append([f"{gene}({'胚系突变' if germline else '体细胞突变'})", transcript, f"Exon{rng.randint(1, 40)}",
+                     f"c.{pos}{ref}>{alt}", f"p.{rng.choice(AMINO_ACIDS)}{codon}{rng.choice(AMINO_ACIDS)}",
+                     "Heterozygote" if germline else f"{rng.uniform(1, 45):.2f}%"])
+    return rows
+
+
+def rearrangement_rows(rng, count):
+    rows = []
+    for _ in range(count):
+        name, left, right = rng.choice(FUSIONS)
+        rows.append([name, f"{left}:{rng.randint(1000000, 130000000)}", f"{right}:{rng.randint(1000000, 105000000)}"])
+    return rows
+
+
+class ReportWriter:
+    # Lays out text top to bottom, starting new pages (with the running header) as needed
+    def __init__(self, values):
+        self.doc = fitz.open()
+        self.values = values
+        self.page = None
+        self.y = 0
+
+    def new_page(self):
+        self.page = self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self.y = 40
+        if self.doc.page_count > 1:
+            v = self.values
+            self.line("浙江大学医学院附属第一医院", size=12)
+            self.line("胰腺病研究重点实验室报告单", size=12)
+            self.line(f"检测号：{v['检测号']}")
+            self.line(f"报告系统版本号 {v['报告系统版本号']} 生信分析版本号 {v['生信分析版本号']} 上机号：{v['上机号']}")
+            self.y += 10
+
+    def ensure(self, height):
+        if self.page is None or self.y + height > BOTTOM:
+            self.new_page()
+
+    def text(self, x, text, size=9):
+        self.page.insert_text((x, self.y + size), text, fontname=FONT, fontsize=size)
+
+    def line(self, text, size=9):
+        self.ensure(size + 7)
+        self.text(LEFT, text, size)
+        self.y += size + 7
+
+    def paragraph(self, text, size=9):
+        lines = max(1, int(fitz.get_text_length(text, fontname=FONT, fontsize=size) / (RIGHT - LEFT)) + 1)
+        height = lines * (size + 5) + 6
+        self.ensure(height)
+        self.page.insert_textbox(fitz.Rect(LEFT, self.y, RIGHT, self.y + height), text, fontname=FONT, fontsize=size)
+        self.y += height
+
+    def field(self, label, value, style):
+        self.ensure(16)
+        if style == 'spaced' and label in SPACED_LABELS:
+            self.text(LEFT, f"{' '.join(label)}：{value}")
+        elif style != 'stacked':
+            self.text(LEFT, f"{label}：{value}")
+        else:
+            # Separate text blocks, so PyMuPDF returns one per line like the sample's layout
+            x = LEFT
+            parts = list(label) if label in SPACED_LABELS else [label]
+            for part in parts + ["："]:
+                self.text(x, part)
+                x += fitz.get_text_length(part, fontname=FONT, fontsize=9) + 2
+            self.text(x + 6, value)
+        self.y += 16
+
+    def table(self, header, widths, rows, repeat_header=True):
+        # Ruled grid; the header row is repeated at the top of each continuation page
+        # unless repeat_header is False (the rows just run on)
+        def row(cells, bold_rule):
+            x = LEFT
+            for cell, width in zip(cells, widths):
+                rect = fitz.Rect(x, self.y, x + width, self.y + ROW_HEIGHT)
+                self.page.draw_rect(rect, color=(0, 0, 0), width=0.8 if bold_rule else 0.5)
+                # Shrink to fit: text running past the cell edge is read as part of the next cell
+                size = min(8.0, 8.0 * (width - 6) / max(1.0, fitz.get_text_length(cell, fontname=FONT, fontsize=8)))
+                self.page.insert_text((x + 3, self.y + 12), cell, fontname=FONT, fontsize=size)
+                x += width
+            self.y += ROW_HEIGHT
+
+        self.ensure(ROW_HEIGHT * 2)
+        row(header, True)
+        for cells in rows:
+            if self.y + ROW_HEIGHT > BOTTOM:
+                self.new_page()
+                if repeat_header:
+                    row(header, True)
+            row(cells, False)
+        self.y += 12
+
+
+def make_report(path, pages=20, mutations=19, rearrangements=0, label_style='stacked', seed=0, repeat_header=True):
+    # Writes a report to `path`; returns {kind: expected rows} in the extractors' output format
+    if label_style not in LABEL_STYLES:
+        raise ValueError(f"Unknown label style: {label_style} (choose from {', '.join(LABEL_STYLES)})")
+    rng = random.Random(seed)
+    values = basic_values(rng)
+    mutations = mutation_rows(rng, mutations)
+    fusions = rearrangement_rows(rng, rearrangements)
+
+    w = ReportWriter(values)
+    w.new_page()
+    w.y = 300
+    w.line("淋巴瘤基因检测报告", size=20)
+    w.line(f"检测号：{values['检测号']}", size=12)
+
+    w.new_page()
+    w.line("一.基本信息", size=11)
+    for name in BASIC_COLUMNS[4:]:
+        value = values[name].replace("岁", " 岁") if name == '年龄' else values[name]
+        w.field(name, value, label_style)
+
+    w.new_page()
+    w.line("四.检测结果及解读", size=11)
+    w.line("4.1 检出突变")
+    if mutations:
+        w.table(MUTATION_HEADER, MUTATION_WIDTHS, mutations, repeat_header)
+    else:
+        w.line("未检出相关突变。")
+    w.line("4.2 基因重排")
+    w.table(REARRANGEMENT_HEADER, REARRANGEMENT_WIDTHS, fusions or [["-", "-", "-"]], repeat_header)
+
+    filler = 0
+    while w.doc.page_count < pages:
+        w.new_page()
+        filler += 1
+        w.line(f"五.结果解读（{filler}）", size=11)
+        for i in range(12):
+            w.paragraph(FILLER_TABLE_WORDS if i == 5 and filler % 5 == 0 else FILLER)
+
+    w.doc.save(path)
+    w.doc.close()
+
+    expected_fusions = [{'重排基因': g, '左断裂点位': left, '右断裂点位': right} for g, left, right in fusions]
+    return {
+        'basic': [{name: values[name] for name in BASIC_COLUMNS}],
+        'rearrangement': [{'姓名': values['姓名'], '检测号': values['检测号'], **row}
+                          for row in expected_fusions or [{'重排基因': "无", '左断裂点位': "-", '右断裂点位': "-"}]],
+        'mutation': [{'检测号': values['检测号'], '突变基因': m[0], '转录本 ID': m[1], '外显子': m[2],
+                      '核苷酸改变': m[3], '氨基酸改变': m[4], '突变频率': m[5]} for m in mutations],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic NGS reports")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--mutations", type=int, default=19)
+    parser.add_argument("--rearrangements", type=int, default=0)
+    parser.add_argument("--label-style", choices=LABEL_STYLES, default='stacked')
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-repeat-header", action="store_true",
+                        help="tables run onto the next page without repeating their header row")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    for i in range(args.count):
+        path = os.path.join(args.out_dir, f"synthetic_{args.pages}p_{i + 1:03d}.pdf")
+        make_report(path, args.pages, args.mutations, args.rearrangements, args.label_style, args.seed + i,
+                    not args.no_repeat_header)
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from table_backends import TABLE_BACKENDS, DEFAULT_TABLE_BACKEND
+from office_backends import WORD_BACKEND_CHOICES, DEFAULT_WORD_BACKEND, DEFAULT_TIMEOUT
+from timing import StageTimer, write_jsonl
+from time_budget import DOCUMENT_BUDGET, PAGE_BUDGET
+from pdf_source import ARCHIVE_EXTENSIONS, is_archive, iter_sources, source_name
+from ocr import DEFAULT_OCR_ENGINE, OCR_ENGINES
+
+# Headless command line, no Qt needed:
+#
+#   python -m cli extract mutation report.pdf -o 突变数据.xlsx
+#   python -m cli extract all "reports/**/*.pdf" -o 全部数据_批量.xlsx --workers 4
+#   python -m cli extract basic report.pdf            (JSON lines on stdout)
+#   python -m cli extract mutation new/*.pdf -o master.csv --append
+#   python -m cli extract all reports.zip -o 全部数据.xlsx      (archive members, not unpacked to disk)
+#   python -m cli extract all reports/ --store             (also upsert into the record store)
+#   python -m cli extract basic scans/ -o 基础信息.xlsx --ocr   (OCR pages without a text layer)
+#   python -m cli query --gene EGFR -o EGFR.xlsx             (reports from the store)
+#   python -m cli watch all /mnt/drop -o 全部数据.csv --store   (keep extracting what lands there)
+#   python -m cli serve --port 8765 --workers 4                (HTTP: POST /extract, GET /health)
+#   python -m cli convert pdf2word scans/*.pdf -o out/ --workers 4
+#   python -m cli convert word2pdf letters/ -o out/ --office libreoffice --timeout 60
+#
+# It is called once per file from cron jobs and LIMS hooks, so startup time
+# matters: PyMuPDF, pdfplumber, pandas and the converter libraries are only
+# imported by the subcommand (and output format) that needs them.
+#
+# --timings FILE appends per-file stage records (JSON lines, see timing.py)
+# and prints a summary to stderr; --profile FILE saves a cProfile dump.
+
+EXTRACT_KINDS = ['basic', 'rearrangement', 'mutation', 'all']
+CONVERT_MODES = ['pdf2word', 'word2pdf']
+
+
+def expand_inputs(inputs, extensions):
+    # Files, directories (non-recursive) and glob patterns ("**" recurses).
+    # Patterns are expanded here too because Windows shells pass them through.
+    paths = []
+    for item in inputs:
+        matches = sorted(glob.glob(item, recursive=True)) if any(c in item for c in "*?[") else [item]
+        for match in matches:
+            if os.path.isdir(match):
+                names = sorted(n for n in os.listdir(match) if n.lower().endswith(extensions))
+                paths.extend(os.path.join(match, n) for n in names)
+            elif match.lower().endswith(extensions):
+                paths.append(match)
+    seen = set()
+    unique = []
+    for p in paths:
+        key = os.path.normcase(os.path.abspath(p))
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def extract_paths(paths, kinds, table_backend, use_cache, workers, timings, track_memory=False, use_templates=False,
+                  low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET, document_budget=DOCUMENT_BUDGET,
+                  ocr=None):
+    # Yields (path, result, error) per file in input order as files finish;
+    # (path, stage records) of each extracted file go to `timings`. One file
+    # (or --workers 1) runs in this process; starting a pool would cost more than it saves.
+    # Archives among `paths` stand for their PDF members, read one by one as they are extracted.
+    # `ocr` names an OCR engine: a pool recognizes a page per process, a
+    # single file `workers` pages at once. A single long file also reads its
+    # tables on `workers` processes (extractors.ParsedReport.page_workers).
+    sources = iter_sources(paths)
+    if (len(paths) > 1 or any(is_archive(p) for p in paths)) and workers != 1:
+        from batch import iter_batch
+        yield from iter_batch(sources, kinds, workers, None, table_backend, use_cache, timings, track_memory,
+                              use_templates, low_memory, memory_limit, page_budget, document_budget, ocr)
+        return
+
+    from extractors import extract_all
+    from result_cache import ResultCache
+    from templates import TemplateStore
+    cache = ResultCache() if use_cache else None
+    templates = TemplateStore() if use_templates else None
+    reader = None
+    if ocr is not None:
+        from ocr import OcrCache, OcrReader
+        reader = OcrReader(ocr, OcrCache() if use_cache else None, workers)
+    try:
+        for source in sources:
+            path = source_name(source)
+            timer = StageTimer(track_memory)
+            try:
+                result = extract_all(source, kinds, table_backend, cache, timer, templates, low_memory, memory_limit,
+                                     page_budget, document_budget, reader, workers)
+                timings.append((path, timer.records))
+            except Exception as e:
+                result, error = None, str(e) or e.__class__.__name__
+            else:
+                error = None
+            finally:
+                timer.close()
+            yield path, result, error
+    finally:
+        if cache is not None:
+            cache.close()
+        if templates is not None:
+            templates.close()
+        if reader is not None:
+            if reader.recognized or reader.hits:
+                print(f"OCR: {reader.recognized} pages recognized, {reader.hits} from cache", file=sys.stderr)
+            reader.close()
+
+
+def report_errors(results, failed):
+    # Passes results through, noting failures and degraded pages on stderr as they come.
+    # A report with incomplete rows is written but counts as failed.
+    from extractors import DEGRADED, INCOMPLETE
+    for path, result, error in results:
+        if error is not None:
+            failed.append(path)
+            print(f"{path}: {error}", file=sys.stderr)
+        else:
+            for page in result.get(DEGRADED, []):
+                print(f"{path}: page {page['页码']} degraded, {page['原因']}", file=sys.stderr)
+            if result.get(INCOMPLETE):
+                failed.append(path)
+                print(f"{path}: incomplete {', '.join(result[INCOMPLETE])} rows", file=sys.stderr)
+        yield path, result, error
+
+
+def run_extract(args, timer, timings):
+    paths = expand_inputs(args.inputs, (".pdf",) + ARCHIVE_EXTENSIONS)
+    if not paths:
+        print("No PDF files matched", file=sys.stderr)
+        return 1
+    single = len(paths) == 1 and not is_archive(paths[0])
+
+    if args.output:
+        # Fail on an unknown extension before any PDF is parsed
+        from exporters import output_writer_class
+        try:
+            output_writer_class(args.output)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    from extractors import KINDS
+    kinds = list(KINDS) if args.kind == 'all' else [args.kind]
+
+    failed = []
+    # Basic info never reads tables, so it has no use for layouts
+    use_templates = not args.no_templates and kinds != ['basic']
+    results = report_errors(extract_paths(paths, kinds, args.backend, not args.no_cache, args.workers, timings,
+                                          args.trace_memory, use_templates, args.low_memory, args.memory_limit,
+                                          args.page_budget, args.file_budget, args.ocr),
+                            failed)
+    store = None
+    if args.store:
+        from record_store import RecordStore, store_results
+        store = RecordStore(None if args.store is True else args.store)
+        results = store_results(store, results, timer)
+    try:
+        write_results(args, results, kinds, single, timer)
+    finally:
+        if store is not None:
+            print(store.stats_message(), file=sys.stderr)
+            store.close()
+    return 1 if failed else 0
+
+
+def write_results(args, results, kinds, single, timer):
+    if args.output:
+        # Rows are written as files finish; a single readable report keeps the plain layout
+        from exporters import write_report, write_batch
+        if single:
+            results = list(results)
+        if single and results[0][2] is None:
+            write_report(args.output, results[0][1], kinds, timer, args.append, args.normalize)
+        else:
+            write_batch(args.output, results, kinds, timer, args.append, args.normalize)
+    else:
+        for path, result, error in results:
+            if error is not None:
+                record = {'file': path, 'error': error}
+            else:
+                record = {'file': path, **(normalized(result) if args.normalize else result)}
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def normalized(result):
+    # JSON output normalizes file by file; files and batches written with -o go through exporters
+    from normalize import normalize_rows
+    return {kind: normalize_rows(kind, rows) for kind, rows in result.items()}
+
+
+def run_query(args, timer, timings):
+    from record_store import RecordStore
+    from extractors import KINDS
+    kinds = list(KINDS) if args.kind == 'all' else [args.kind]
+    if args.output:
+        from exporters import output_writer_class
+        try:
+            output_writer_class(args.output)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+    if args.store and not os.path.exists(args.store):
+        print(f"No record store at {args.store}", file=sys.stderr)
+        return 1
+    with RecordStore(args.store) as store:
+        with timer.stage('store') as counts:
+            ids = store.find(args.id, args.id_card, args.name, args.gene)
+            counts['files'] = len(ids)
+        if not ids:
+            print("No matching reports", file=sys.stderr)
+            return 1
+        results = store.iter_results(ids, kinds)
+        if args.output:
+            from exporters import write_batch
+            write_batch(args.output, results, kinds, timer, args.append, args.normalize)
+            print(f"{len(ids)} reports -> {args.output}", file=sys.stderr)
+        else:
+            for source, result, _ in results:
+                result = normalized(result) if args.normalize else result
+                print(json.dumps({'file': source, **result}, ensure_ascii=False), flush=True)
+    return 0
+
+
+def run_watch(args, timer, timings):
+    folders = [f for f in args.folders if os.path.isdir(f)]
+    for folder in set(args.folders) - set(folders):
+        print(f"{folder}: not a folder", file=sys.stderr)
+    if not folders:
+        return 1
+    from exporters import output_writer_class
+    for output in args.output or []:
+        try:
+            output_writer_class(output)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+    if not args.output and not args.store:
+        print("Nothing to write to: give -o and/or --store", file=sys.stderr)
+        return 1
+
+    import signal
+    from extractors import KINDS
+    from record_store import RecordStore
+    from watcher import FolderWatcher, Ledger
+    kinds = list(KINDS) if args.kind == 'all' else [args.kind]
+
+    def on_event(kind, path, detail):
+        if kind == 'failed':
+            print(f"{path}: {detail}", file=sys.stderr)
+        elif kind == 'flushed':
+            print(f"{detail} files -> {path}", file=sys.stderr)
+        elif kind == 'write_failed':
+            print(f"{path}: cannot write ({detail}), will retry", file=sys.stderr)
+        elif args.verbose:
+            print(f"{path}: {kind}", file=sys.stderr)
+
+    store = RecordStore(None if args.store is True else args.store) if args.store else None
+    ledger = Ledger(args.ledger)
+    # Per-file timings are appended at every flush (a service never reaches the end of the run)
+    watcher = FolderWatcher(folders, args.output or [], kinds, args.workers, args.interval, args.settle,
+                            args.flush_files, args.flush_seconds, ledger, store, args.normalize, on_event,
+                            args.timings, timer, args.backend, not args.no_cache, args.trace_memory,
+                            not args.no_templates and kinds != ['basic'], args.low_memory, args.memory_limit,
+                            args.page_budget, args.file_budget, args.ocr)
+    signal.signal(signal.SIGINT, lambda signum, frame: watcher.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    print(f"Watching {', '.join(folders)} (ledger: {ledger.path}); Ctrl+C to stop", file=sys.stderr)
+    try:
+        watcher.run(args.once)
+    finally:
+        print(watcher.stats_message(), file=sys.stderr)
+        if store is not None:
+            print(store.stats_message(), file=sys.stderr)
+            store.close()
+        ledger.close()
+    return 0
+
+
+def run_serve(args, timer, timings):
+    from server import ExtractionServer
+    try:
+        server = ExtractionServer((args.host, args.port), args.workers, args.queue, args.max_size * 1024 * 1024,
+                                  args.timings, args.backend, not args.no_cache, not args.no_templates,
+                                  args.low_memory, args.memory_limit, args.page_budget, args.file_budget,
+                                  args.ocr)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 1
+    server.quiet = args.quiet
+    print(f"Serving on {server.url} ({server.workers} workers, queue {args.queue}); Ctrl+C to stop",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+def run_convert(args, timer, timings):
+    from converters import CONVERSIONS, convert_file, convert_batch, default_output
+    _, source_ext, target_ext = CONVERSIONS[args.mode]
+    paths = expand_inputs(args.inputs, (source_ext,))
+    if not paths:
+        print(f"No {source_ext} files matched", file=sys.stderr)
+        return 1
+
+    # -o is the target file for a single input, otherwise a directory
+    single = len(paths) == 1 and args.output and args.output.lower().endswith(target_ext)
+    if args.output and not single:
+        os.makedirs(args.output, exist_ok=True)
+
+    # Several files: --workers conversions at once (PDF: one process each;
+    # Word: that many warm office processes). One file (or --workers 1): in
+    # this process, a PDF's pages parsed on --workers processes.
+    if len(paths) > 1 and args.workers != 1:
+        results = convert_batch(paths, args.mode, args.output, args.workers, None, timings, args.trace_memory,
+                                args.office, args.timeout)
+        for path, target, error in results:
+            if error is None:
+                print(f"{path} -> {target}")
+            else:
+                print(f"{path}: {error}", file=sys.stderr)
+        return 1 if any(error is not None for _, _, error in results) else 0
+
+    if args.mode == 'pdf2word':
+        options = {'max_workers': args.workers}
+    else:
+        options = {'backend': args.office, 'timeout': args.timeout}
+    failed = 0
+    for path in paths:
+        target = args.output if single else default_output(path, args.mode, args.output)
+        file_timer = StageTimer(args.trace_memory)
+        try:
+            with file_timer.stage('convert'):
+                convert_file(args.mode, path, target, **options)
+            timings.append((path, file_timer.records))
+            print(f"{path} -> {target}")
+        except Exception as e:
+            failed += 1
+            print(f"{path}: {e}", file=sys.stderr)
+        finally:
+            file_timer.close()
+    return 1 if failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cli", description="PDF Tool Suite command line")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    diagnostics = argparse.ArgumentParser(add_help=False)
+    diagnostics.add_argument("--timings", metavar="FILE", help="append per-stage timing records (JSON lines)")
+    diagnostics.add_argument("--trace-memory", action="store_true", help="record peak Python memory per stage")
+    diagnostics.add_argument("--profile", metavar="FILE", help="save a cProfile dump of the run")
+
+    extraction = argparse.ArgumentParser(add_help=False)
+    extraction.add_argument("--backend", choices=list(TABLE_BACKENDS), default=DEFAULT_TABLE_BACKEND,
+                            help="table extraction engine")
+    extraction.add_argument("--workers", type=int, default=None,
+                            help="processes for several files, or for the table pages of one long file "
+                                 "(default: CPU count)")
+    extraction.add_argument("--no-cache", action="store_true", help="do not read or write the result cache")
+    extraction.add_argument("--no-templates", action="store_true",
+                            help="always detect tables in full instead of reusing learned report layouts")
+    extraction.add_argument("--low-memory", action="store_true",
+                            help="release each page's parsed objects once read (very large PDFs)")
+    extraction.add_argument("--memory-limit", type=int, metavar="MB",
+                            help="fail a file whose process stays above MB of RSS (implies --low-memory)")
+    extraction.add_argument("--page-budget", type=float, default=PAGE_BUDGET, metavar="SECONDS",
+                            help=f"read a page the table engine has not finished in SECONDS with the words "
+                                 f"engine, flagged as degraded (default: {PAGE_BUDGET:g}, 0: no limit)")
+    extraction.add_argument("--file-budget", type=float, default=DOCUMENT_BUDGET, metavar="SECONDS",
+                            help=f"after SECONDS on one file, read its remaining table pages with the words engine "
+                                 f"(default: {DOCUMENT_BUDGET:g}, 0: no limit)")
+    extraction.add_argument("--ocr", nargs="?", const=DEFAULT_OCR_ENGINE, choices=list(OCR_ENGINES), metavar="ENGINE",
+                            help=f"recognize the text of pages without a text layer (scans) with an OCR engine "
+                                 f"(default: {DEFAULT_OCR_ENGINE}); for one file, --workers pages at once")
+
+    extract = sub.add_parser("extract", parents=[diagnostics, extraction],
+                             help="extract report data to Excel or JSON lines")
+    extract.add_argument("kind", choices=EXTRACT_KINDS)
+    extract.add_argument("inputs", nargs="+",
+                         help="PDF files, folders or glob patterns; .zip / .tar(.gz) archives are read in place")
+    extract.add_argument("-o", "--output", help="output file, .xlsx / .csv / .jsonl / .parquet "
+                                                "(default: JSON lines on stdout)")
+    extract.add_argument("--append", action="store_true", help="add rows to an existing output file")
+    extract.add_argument("--normalize", action="store_true",
+                         help="add typed columns: numeric VAF and exon, breakpoint positions, HGVS parts, gene symbols")
+    extract.add_argument("--store", nargs="?", const=True, metavar="DB",
+                         help="also upsert the results into the record store (default location, or DB)")
+    extract.set_defaults(func=run_extract)
+
+    query = sub.add_parser("query", parents=[diagnostics], help="look up or export reports from the record store")
+    query.add_argument("--store", metavar="DB", help="record store (default: the one extract --store fills)")
+    query.add_argument("--id", help="检测号")
+    query.add_argument("--id-card", help="身份证号")
+    query.add_argument("--name", help="姓名")
+    query.add_argument("--gene", help="突变基因, or 重排基因 (whole or one fusion partner)")
+    query.add_argument("--kind", choices=EXTRACT_KINDS, default='all', help="tables to export (default: all)")
+    query.add_argument("-o", "--output", help="output file, .xlsx / .csv / .jsonl / .parquet "
+                                              "(default: JSON lines on stdout)")
+    query.add_argument("--append", action="store_true", help="add rows to an existing output file")
+    query.add_argument("--normalize", action="store_true", help="add typed columns as extract --normalize does")
+    query.set_defaults(func=run_query)
+
+    watch = sub.add_parser("watch", parents=[diagnostics, extraction],
+                           help="keep extracting the reports that arrive in folders, appending to the outputs")
+    watch.add_argument("kind", choices=EXTRACT_KINDS)
+    watch.add_argument("folders", nargs="+", help="folders to watch (not recursive)")
+    watch.add_argument("-o", "--output", action="append", metavar="FILE",
+                       help="output file to append to, repeatable; .csv / .jsonl keep appends cheap")
+    watch.add_argument("--normalize", action="store_true", help="add typed columns as extract --normalize does")
+    watch.add_argument("--store", nargs="?", const=True, metavar="DB",
+                       help="also upsert the results into the record store (default location, or DB)")
+    watch.add_argument("--ledger", metavar="DB", help="processed-file ledger (default: in the user data folder)")
+    watch.add_argument("--interval", type=float, default=2.0, metavar="SECONDS",
+                       help="seconds between folder scans (default: 2)")
+    watch.add_argument("--settle", type=float, default=5.0, metavar="SECONDS",
+                       help="seconds a file must stay unchanged before it is read (default: 5)")
+    watch.add_argument("--flush-files", type=int, default=50, metavar="N",
+                       help="write the outputs every N finished files (default: 50)")
+    watch.add_argument("--flush-seconds", type=float, default=10.0, metavar="SECONDS",
+                       help="or at least every SECONDS while files finish (default: 10)")
+    watch.add_argument("--once", action="store_true", help="extract what is in the folders now, then exit")
+    watch.add_argument("-v", "--verbose", action="store_true", help="note every queued and finished file")
+    watch.set_defaults(func=run_watch)
+
+    serve = sub.add_parser("serve", parents=[diagnostics, extraction],
+                           help="HTTP service: POST a PDF to /extract, get its records as JSON")
+    serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1, this machine)")
+    # Defaults as in server.py, which is only imported by run_serve (http.server and ssl cost
+    # half of the CLI's startup)
+    serve.add_argument("--port", type=int, default=8765, help="port (default: 8765)")
+    serve.add_argument("--queue", type=int, default=16, metavar="N",
+                       help="requests waiting for a worker before more are refused with 503 (default: 16)")
+    serve.add_argument("--max-size", type=int, default=100, metavar="MB", help="largest accepted PDF (default: 100)")
+    serve.add_argument("-q", "--quiet", action="store_true", help="no access log on stderr")
+    serve.set_defaults(func=run_serve)
+
+    convert = sub.add_parser("convert", parents=[diagnostics], help="convert between PDF and Word")
+    convert.add_argument("mode", choices=CONVERT_MODES)
+    convert.add_argument("inputs", nargs="+", help="files, folders or glob patterns")
+    convert.add_argument("-o", "--output", help="output file (single input) or folder (default: next to each input)")
+    convert.add_argument("--workers", type=int, default=None,
+                         help="files converted at once, or for one PDF the processes parsing its pages "
+                              "(default: CPU count; Word to PDF: 2 office processes)")
+    convert.add_argument("--office", choices=WORD_BACKEND_CHOICES, default=DEFAULT_WORD_BACKEND,
+                         help="Word to PDF engine (auto: LibreOffice if installed, else Microsoft Word)")
+    convert.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                         help="seconds per document before a LibreOffice process is killed and restarted")
+    convert.set_defaults(func=run_convert)
+    return parser
+
+
+def report_timings(args, timer, timings):
+    job = " ".join(filter(None, ["cli", args.command, getattr(args, 'kind', None) or getattr(args, 'mode', None)]))
+    output = getattr(args, 'output', None)
+    entries = [({'job': job, 'input': path, 'output': output}, records) for path, records in timings]
+    entries.append(({'job': job, 'input': None, 'output': output}, timer.records))
+    write_jsonl(args.timings, entries)
+
+    per_file = StageTimer()
+    for _, records in timings:
+        per_file.merge(records)
+    if timings:
+        print(f"各文件{per_file.summary()}", file=sys.stderr)
+    if timer.records:
+        print(timer.summary(), file=sys.stderr)
+
+
+def check_ocr(engine):
+    # Why the OCR engine cannot run, or None: a missing Tesseract fails the command once, not every file
+    from ocr import get_ocr_engine
+    try:
+        get_ocr_engine(engine).key
+    except (RuntimeError, OSError, subprocess.SubprocessError) as e:
+        return str(e)
+    return None
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'ocr', None) is not None:
+        error = check_ocr(args.ocr)
+        if error:
+            print(error, file=sys.stderr)
+            return 1
+    timer = StageTimer(args.trace_memory)
+    timings = []
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        return args.func(args, timer, timings)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        timer.close()
+        if args.timings:
+            report_timings(args, timer, timings)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from timing import StageTimer
+
+# PDF <-> Word conversion without Qt. The converter libraries are slow to
+# import (pdf2docx pulls in its own PyMuPDF/python-docx stack), so each one is
+# imported only when a conversion actually runs.
+
+# Pages per pdf2docx parse job: small enough to spread a report evenly over the
+# pool and report progress often, large enough that reopening the PDF for each
+# job (~0.1s) stays small next to parsing (~0.4s a page).
+PAGES_PER_CHUNK = 4
+
+
+def _parse_page_range(pdf_path, start, end):
+    # Runs in a pool process (or inline): parse pages [start, end) and return
+    # them in pdf2docx's store() format, which pickles cleanly
+    from pdf2docx import Converter
+    cv = Converter(pdf_path)
+    try:
+        settings = cv.default_settings
+        cv.load_pages(start, end).parse_document(**settings).parse_pages(**settings)
+        return cv.store()
+    finally:
+        cv.close()
+
+
+def pdf_to_word(pdf_path, docx_path, max_workers=1, on_progress=None):
+    # pdf2docx lays out every page on its own (its document-level pass does
+    # nothing yet), so the pages are parsed in ranges of PAGES_PER_CHUNK on
+    # `max_workers` processes (None: one per CPU, 1: in this process) and the
+    # parsed layouts are restored in page order before the docx is written.
+    # on_progress(pages_done, total_pages) fires as each range finishes.
+    # pdf2docx's own multi_processing option is not used: it gives no progress
+    # and writes its intermediate files into the working directory.
+    from pdf2docx import Converter
+    cv = Converter(pdf_path)
+    try:
+        total = len(cv.fitz_doc)
+        ranges = [(start, min(start + PAGES_PER_CHUNK, total)) for start in range(0, total, PAGES_PER_CHUNK)]
+        done = 0
+        if max_workers == 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                cv.restore(_parse_page_range(pdf_path, start, end))
+                done += end - start
+                if on_progress:
+                    on_progress(done, total)
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(ranges))) as pool:
+                futures = {pool.submit(_parse_page_range, pdf_path, start, end): (start, end)
+                           for start, end in ranges}
+                try:
+                    for future in as_completed(futures):
+                        start, end = futures[future]
+                        cv.restore(future.result())
+                        done += end - start
+                        if on_progress:
+                            on_progress(done, total)
+                except BaseException:
+                    # on_progress raised (e.g. the job was cancelled): drop the ranges not started yet
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+        cv.make_docx(docx_path, **cv.default_settings)
+    finally:
+        cv.close()
+    return docx_path
+
+
+def word_to_pdf(docx_path, pdf_path, backend=None, timeout=None):
+    # Through the shared office backend (office_backends.py): warm LibreOffice
+    # processes when installed, else Microsoft Word via docx2pdf
+    from office_backends import get_word_backend
+    return get_word_backend(backend).convert(docx_path, pdf_path, timeout)
+
+
+CONVERSIONS = {
+    'pdf2word': (pdf_to_word, ".pdf", ".docx"),
+    'word2pdf': (word_to_pdf, ".docx", ".pdf"),
+}
+
+
+def default_output(path, mode, out_dir=None):
+    # report.pdf -> report.docx (in out_dir when given)
+    target = os.path.splitext(path)[0] + CONVERSIONS[mode][2]
+    if out_dir:
+        target = os.path.join(out_dir, os.path.basename(target))
+    return target
+
+
+def convert_file(mode, src, dst=None, **options):
+    # `options` go to the conversion function (e.g. max_workers, backend)
+    func = CONVERSIONS[mode][0]
+    return func(src, dst or default_output(src, mode), **options)
+
+
+def _convert_job(mode, src, dst, track_memory=False, options=None):
+    # Runs inside a pool process or thread: one whole file, timed like a single conversion
+    timer = StageTimer(track_memory)
+    try:
+        with timer.stage('convert'):
+            convert_file(mode, src, dst, **(options or {}))
+        return timer.records
+    finally:
+        timer.close()
+
+
+def convert_batch(paths, mode, out_dir=None, max_workers=None, on_result=None, timings=None, track_memory=False,
+                  word_backend=None, timeout=None):
+    # Convert many files with at most `max_workers` conversions running at
+    # once. Returns (src, dst, error) tuples in input order; a failing file
+    # only sets its own `error`. on_result(done, total, src, error) fires per
+    # completed file; `timings` collects (src, stage records) like batch.run_batch.
+    #
+    # pdf2word: one pool process per file (None: one per CPU), pages parsed
+    # serially there. word2pdf: the office backend's own processes do the
+    # work, grown to `max_workers` (None: its default pool size); threads here
+    # just feed them. A docx2pdf backend converts one file at a time.
+    if not paths:
+        return []
+    targets = [default_output(p, mode, out_dir) for p in paths]
+    results = [None] * len(paths)
+    file_timings = [None] * len(paths)
+
+    options = None
+    if mode == 'word2pdf':
+        from office_backends import get_word_backend
+        backend = get_word_backend(word_backend, max_workers)
+        options = {'backend': backend.name, 'timeout': timeout}
+        executor = ThreadPoolExecutor(max_workers=backend.size)
+        track_memory = False  # tracemalloc peaks are per process, threads would mix them up
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    with executor as pool:
+        futures = {pool.submit(_convert_job, mode, src, dst, track_memory, options): i
+                   for i, (src, dst) in enumerate(zip(paths, targets))}
+        done = 0
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    file_timings[i] = (paths[i], future.result())
+                    results[i] = (paths[i], targets[i], None)
+                except Exception as e:
+                    results[i] = (paths[i], targets[i], str(e) or e.__class__.__name__)
+                done += 1
+                if on_result:
+                    on_result(done, len(paths), paths[i], results[i][2])
+        except BaseException:
+            # on_result raised (e.g. the job was cancelled): drop the files not started yet
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    if timings is not None:
+        timings.extend(t for t in file_timings if t is not None)
+    return results
@@ -0,0 +1,417 @@
+import csv
+import json
+import os
+import tempfile
+from extractors import DEGRADED, DEGRADED_COLUMNS, KIND_COLUMNS, SHEET_NAMES
+from timing import StageTimer
+
+# Output writers shared by the GUI workers and the CLI. Rows are streamed to
+# the file as they arrive, so a batch holds at most a few reports' rows at a
+# time and no DataFrame; pandas is not needed. The format follows the extension:
+#
+#   .xlsx     openpyxl write-only workbook, a sheet per table
+#   .csv      UTF-8 with BOM (Excel then reads the Chinese headers)
+#   .jsonl    one JSON object per row
+#   .parquet  string columns in row groups (needs pyarrow)
+#
+# A workbook holds every table. The other formats write the only table to the
+# given path, or each table to <stem>_<table><ext> when there are several.
+#
+# With append=True new rows are added to an existing output, whose columns
+# must match. CSV and JSONL are opened for appending; xlsx and Parquet cannot
+# grow in place, so the existing rows are streamed into a new file first,
+# which replaces the old one only once it is complete. An aborted run (error
+# or cancel) leaves no new files behind; rows already appended to a CSV or
+# JSONL stay.
+#
+#   with open_writer(path, [(table, columns), ...], append, timer) as out:
+#       out.write(table, rows)
+#       out.write('失败文件', rows, columns)   # a table can also start on first write
+#
+# Writing is timed as the 'write' stage.
+#
+# With normalize=True the mutation and rearrangement tables get the typed
+# columns of normalize.py (numeric VAF, exon, breakpoints, HGVS parts, gene
+# symbols) after the text ones. A batch's rows are buffered and normalized
+# NORMALIZE_CHUNK at a time (the 'normalize' stage). Parquet stores those
+# columns as int64 / float64; xlsx and JSONL keep numbers as numbers.
+
+FAILURE_TABLE = '失败文件'
+FAILURE_COLUMNS = ['源文件', '错误']
+# Pages read with the fallback table engine (extractors.DEGRADED), a table
+# that starts once a report has some
+DEGRADED_TABLE = '降级页面'
+DEFAULT_SHEET = 'Sheet1'  # name of an unnamed table in a workbook
+PARQUET_ROW_GROUP = 10000
+NORMALIZE_CHUNK = 20000  # rows per kind normalized at once in a batch
+
+
+class OutputWriter:
+    def __init__(self, path, append=False, timer=None, column_types=None):
+        self.path = path
+        self.append = append
+        self.timer = timer or StageTimer()
+        self.column_types = column_types or {}  # column -> 'int' / 'float'; others are text
+        self.tables = {}  # table name -> columns
+        self.several = False
+
+    def open_tables(self, tables):
+        self.several = len(tables) > 1
+        for name, columns in tables:
+            self.add_table(name, columns)
+
+    def add_table(self, name, columns):
+        self.tables[name] = list(columns)
+        self._open_table(name, self.tables[name])
+
+    def write(self, name, rows, columns=None):
+        # `rows` are dicts; missing keys are written empty
+        if name not in self.tables:
+            if columns is None:
+                raise KeyError(f"Unknown output table: {name}")
+            self.several = True
+            self.add_table(name, columns)
+        columns = self.tables[name]
+        with self.timer.stage('write') as counts:
+            values = [[row.get(c) for c in columns] for row in rows]
+            self._write_rows(name, values)
+            counts['rows'] = len(values)
+
+    def table_path(self, name):
+        # Fixed when the table opens: a table added later (failures) does not move earlier ones
+        if name is None or not self.several:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_{name}{ext}"
+
+    def close(self):
+        with self.timer.stage('write'):
+            self._close()
+
+    def abort(self):
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _open_table(self, name, columns):
+        raise NotImplementedError
+
+    def _write_rows(self, name, values):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+def _check_columns(path, found, columns):
+    if list(found) != list(columns):
+        raise ValueError(f"Cannot append to {os.path.basename(path)}: its columns differ "
+                         f"({', '.join(map(str, found))})")
+
+
+def _temp_beside(path):
+    # Replacement file in the same folder, so os.replace() is atomic
+    fd, temp = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1],
+                                dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    return temp
+
+
+class XlsxWriter(OutputWriter):
+    def __init__(self, path, append=False, timer=None, column_types=None):
+        super().__init__(path, append, timer, column_types)
+        from openpyxl import Workbook
+        self.book = Workbook(write_only=True)
+        self.sheets = {}
+        self.temp = None  # created when saving, so a writer that fails before that leaves no file behind
+        self.existing = {}  # sheet title -> header of sheets copied from the old file
+        if append and os.path.exists(path):
+            with self.timer.stage('write'):
+                self._copy_existing()
+
+    def _copy_existing(self):
+        from openpyxl import load_workbook
+        old = load_workbook(self.path, read_only=True)
+        try:
+            for ws in old.worksheets:
+                sheet = self.book.create_sheet(ws.title)
+                rows = ws.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is not None:
+                    header = list(header)
+                    while header and header[-1] is None:
+                        header.pop()
+                    sheet.append(header)
+                self.existing[ws.title] = header
+                for row in rows:
+                    sheet.append(row)
+                self.sheets[ws.title] = sheet
+        finally:
+            old.close()
+
+    def _open_table(self, name, columns):
+        title = name or DEFAULT_SHEET
+        if title in self.existing:
+            if self.existing[title] is not None:
+                _check_columns(self.path, self.existing[title], columns)
+                return
+            sheet = self.sheets[title]
+        else:
+            sheet = self.sheets[title] = self.book.create_sheet(title)
+        sheet.append(columns)
+
+    def _write_rows(self, name, values):
+        sheet = self.sheets[name or DEFAULT_SHEET]
+        for row in values:
+            sheet.append(row)
+
+    def _close(self):
+        self.temp = _temp_beside(self.path)
+        try:
+            self.book.save(self.temp)
+        except BaseException:
+            os.remove(self.temp)
+            raise
+        os.replace(self.temp, self.path)
+
+    def abort(self):
+        # Finish the half-written sheet streams before dropping the temp file
+        for sheet in self.sheets.values():
+            try:
+                sheet.close()
+            except Exception:
+                pass
+        if self.temp is not None and os.path.exists(self.temp):
+            os.remove(self.temp)
+
+
+class CsvWriter(OutputWriter):
+    def __init__(self, path, append=False, timer=None, column_types=None):
+        super().__init__(path, append, timer, column_types)
+        self.files = {}
+        self.created = []  # removed again if the run is aborted
+
+    def _open_table(self, name, columns):
+        path = self.table_path(name)
+        if self.append and os.path.exists(path) and os.path.getsize(path):
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                _check_columns(path, next(csv.reader(f), []), columns)
+            f = open(path, "a", newline="", encoding="utf-8")
+            self.files[name] = (f, csv.writer(f))
+        else:
+            f = open(path, "w", newline="", encoding="utf-8-sig")
+            self.created.append(path)
+            self.files[name] = (f, csv.writer(f))
+            self.files[name][1].writerow(columns)
+
+    def _write_rows(self, name, values):
+        self.files[name][1].writerows(values)
+
+    def _close(self):
+        for f, _ in self.files.values():
+            f.close()
+
+    def abort(self):
+        self._close()
+        for path in self.created:
+            os.remove(path)
+
+
+class JsonlWriter(OutputWriter):
+    def __init__(self, path, append=False, timer=None, column_types=None):
+        super().__init__(path, append, timer, column_types)
+        self.files = {}
+        self.created = []
+
+    def _open_table(self, name, columns):
+        path = self.table_path(name)
+        if self.append and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                first = f.readline()
+            if first.strip():
+                _check_columns(path, json.loads(first), columns)
+            self.files[name] = open(path, "a", encoding="utf-8")
+        else:
+            self.files[name] = open(path, "w", encoding="utf-8")
+            self.created.append(path)
+
+    def _write_rows(self, name, values):
+        columns = self.tables[name]
+        f = self.files[name]
+        for row in values:
+            f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+
+    def _close(self):
+        for f in self.files.values():
+            f.close()
+
+    def abort(self):
+        self._close()
+        for path in self.created:
+            os.remove(path)
+
+
+class ParquetWriter(OutputWriter):
+    PARQUET_TYPES = {'int': 'int64', 'float': 'float64'}
+
+    def __init__(self, path, append=False, timer=None, column_types=None):
+        super().__init__(path, append, timer, column_types)
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+        self.writers = {}  # table name -> (ParquetWriter, schema, temp path, buffered rows, path)
+        self.text_columns = {}  # table name -> whether each column is stored as text
+
+    def _open_table(self, name, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        path = self.table_path(name)
+        types = [self.PARQUET_TYPES.get(self.column_types.get(c), 'string') for c in columns]
+        schema = pa.schema([(str(c), pa.type_for_alias(t)) for c, t in zip(columns, types)])
+        self.text_columns[name] = [t == 'string' for t in types]
+        temp = _temp_beside(path)
+        writer = pq.ParquetWriter(temp, schema)
+        self.writers[name] = (writer, schema, temp, [], path)
+        if self.append and os.path.exists(path):
+            with self.timer.stage('write'):
+                old = pq.ParquetFile(path)
+                _check_columns(path, old.schema_arrow.names, schema.names)
+                for batch in old.iter_batches():
+                    writer.write_batch(batch.cast(schema))
+
+    def _write_rows(self, name, values):
+        buffered = self.writers[name][3]
+        text = self.text_columns[name]
+        buffered.extend([v if v is None or not t else str(v) for v, t in zip(row, text)] for row in values)
+        if len(buffered) >= PARQUET_ROW_GROUP:
+            self._flush(name)
+
+    def _flush(self, name):
+        import pyarrow as pa
+        writer, schema, _, buffered, _ = self.writers[name]
+        if buffered:
+            columns = list(zip(*buffered))
+            writer.write_table(pa.table([list(c) for c in columns], schema=schema))
+            buffered.clear()
+
+    def _close(self):
+        for name, (writer, _, temp, _, path) in self.writers.items():
+            self._flush(name)
+            writer.close()
+            os.replace(temp, path)
+        self.writers = {}
+
+    def abort(self):
+        for writer, _, temp, _, _ in self.writers.values():
+            writer.close()
+            if os.path.exists(temp):
+                os.remove(temp)
+        self.writers = {}
+
+
+OUTPUT_FORMATS = {
+    '.xlsx': XlsxWriter,
+    '.csv': CsvWriter,
+    '.jsonl': JsonlWriter,
+    '.parquet': ParquetWriter,
+}
+
+
+def output_writer_class(path):
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        return OUTPUT_FORMATS[ext]
+    except KeyError:
+        raise ValueError(f"Unsupported output format: {ext or path} (use {', '.join(OUTPUT_FORMATS)})")
+
+
+def open_writer(path, tables, append=False, timer=None, column_types=None):
+    writer = output_writer_class(path)(path, append, timer, column_types)
+    try:
+        writer.open_tables(tables)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer
+
+
+def _normalizer(normalize):
+    # (columns of a kind, rows of a kind -> normalized rows, column types)
+    if not normalize:
+        return (lambda kind: KIND_COLUMNS[kind]), None, None
+    # Imported here: pandas is only needed for normalized output
+    from normalize import COLUMN_TYPES, normalize_rows, normalized_columns
+    return (lambda kind: normalized_columns(kind, KIND_COLUMNS[kind])), normalize_rows, COLUMN_TYPES
+
+
+def _normalized(out, kind, rows, normalize_rows):
+    with out.timer.stage('normalize') as counts:
+        rows = normalize_rows(kind, rows)
+        counts['rows'] = len(rows)
+    return rows
+
+
+def write_report(path, result, kinds, timer=None, append=False, normalize=False):
+    # One report. A single kind keeps the plain one-table layout the
+    # single-purpose tools have always written; several kinds get a named
+    # table each.
+    kinds = list(kinds)
+    names = [SHEET_NAMES[kind] if len(kinds) > 1 else None for kind in kinds]
+    columns, normalize_rows, types = _normalizer(normalize)
+    tables = [(name, columns(kind)) for name, kind in zip(names, kinds)]
+    with open_writer(path, tables, append, timer, types) as out:
+        for name, kind in zip(names, kinds):
+            rows = result[kind]
+            if normalize_rows:
+                rows = _normalized(out, kind, rows, normalize_rows)
+            out.write(name, rows)
+        if result.get(DEGRADED):
+            out.write(DEGRADED_TABLE, result[DEGRADED], DEGRADED_COLUMNS)
+
+
+def write_batch(path, results, kinds, timer=None, append=False, normalize=False):
+    # Streams (path, result, error) tuples, e.g. straight from batch.iter_batch,
+    # into a table per kind with a 源文件 column, plus a 失败文件 table once a
+    # file fails and a 降级页面 table once one has degraded pages. Returns
+    # (files written, files failed).
+    kinds = list(kinds)
+    columns, normalize_rows, types = _normalizer(normalize)
+    tables = [(SHEET_NAMES[kind], ['源文件'] + columns(kind)) for kind in kinds]
+    pending = {kind: [] for kind in kinds}  # rows waiting to be normalized
+
+    def flush(kind):
+        out.write(SHEET_NAMES[kind], _normalized(out, kind, pending[kind], normalize_rows))
+        pending[kind] = []
+
+    written = failed = 0
+    with open_writer(path, tables, append, timer, types) as out:
+        for pdf_path, result, error in results:
+            source = os.path.basename(pdf_path)
+            if error is not None:
+                out.write(FAILURE_TABLE, [{'源文件': source, '错误': error}], FAILURE_COLUMNS)
+                failed += 1
+                continue
+            if result.get(DEGRADED):
+                out.write(DEGRADED_TABLE, [{'源文件': source, **row} for row in result[DEGRADED]],
+                          ['源文件'] + DEGRADED_COLUMNS)
+            for kind in kinds:
+                rows = [{'源文件': source, **row} for row in result.get(kind, [])]
+                if normalize_rows is None:
+                    out.write(SHEET_NAMES[kind], rows)
+                    continue
+                pending[kind].extend(rows)
+                if len(pending[kind]) >= NORMALIZE_CHUNK:
+                    flush(kind)
+            written += 1
+        if normalize_rows is not None:
+            for kind in kinds:
+                flush(kind)
+    return written, failed
@@ -0,0 +1,697 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from fields import parse_page_fields
+from table_backends import DEFAULT_TABLE_BACKEND, WordsBackend, get_table_backend
+from pdf_source import as_source
+from memory import check_memory
+from ocr import needs_ocr
+from time_budget import DOCUMENT_BUDGET, PAGE_BUDGET, BudgetExceeded, TimeBudget
+from timing import StageTimer
+from templates import template_fingerprint, has_header, kind_tables, layout_matches
+
+# Extraction logic shared by the GUI workers and the batch process pool.
+# Everything here must stay free of Qt so it can run in worker processes.
+
+BASIC_COLUMNS = [
+    '检测号', '报告系统版本号', '生信分析版本号', '上机号',
+    '姓名', '性别', '年龄', '采样日期', '标本类型',
+    '住院号', '病理号', '身份证号', '送检日期', '病历号',
+    '送检医生', '送检单位', '检测项目', '检测方法',
+    '送检材料', '临床诊断'
+]
+REARRANGEMENT_COLUMNS = ['姓名', '检测号', '重排基因', '左断裂点位', '右断裂点位']
+MUTATION_COLUMNS = ['检测号', '突变基因', '转录本 ID', '外显子', '核苷酸改变', '氨基酸改变', '突变频率']
+
+# Report kinds, in the order their sheets appear in combined workbooks
+KINDS = ['basic', 'rearrangement', 'mutation']
+SHEET_NAMES = {'basic': '基础信息', 'rearrangement': '重排结果', 'mutation': '突变数据'}
+KIND_COLUMNS = {'basic': BASIC_COLUMNS, 'rearrangement': REARRANGEMENT_COLUMNS, 'mutation': MUTATION_COLUMNS}
+# Result key, next to the kinds, listing the pages read with the fallback table
+# engine (see ParsedReport's time budgets) as {'页码', '原因'} rows; only present when there are some
+DEGRADED = 'degraded'
+DEGRADED_COLUMNS = ['页码', '原因']
+# Result key listing the kinds whose rows are known to be missing some: a table
+# continued onto a degraded page the fallback engine could not read the rows of
+INCOMPLETE = 'incomplete'
+
+
+# Locating stage for table extraction. A page is handed to the table backend only if
+# its PyMuPDF text contains every `required` keyword of a table kind; the
+# table is then assumed to start at the first `anchor` keyword, so the page
+# is cropped from there (minus CROP_MARGIN for multi-line header cells and
+# the table's top rule) to the bottom.
+#
+# A table can run on over a page break without repeating its header row; the
+# next page then has the kind's `rows` (cell values such as c.2236_2250del or
+# chr14:106032614) but not its keywords. Such a page right after one located
+# for the kind is located as a continuation (uncropped), and a headerless table
+# heading it is joined to the table it continues (join_continued).
+TABLE_LOCATORS = {
+    'rearrangement': {'required': ["重排基因", "断裂点"], 'anchors': ["重排基因", "断裂点"],
+                      'rows': re.compile(r"chr[0-9XYM]+:\d")},
+    'mutation': {'required': ["基因", "改变"], 'anchors': ["改变"], 'rows': re.compile(r"\bc\.[-*]?\d")},
+}
+CROP_MARGIN = 40
+# Fewest pages a pool process reads tables for with page_workers: opening
+# the PDF there costs as much as a few pages' tables (pdfplumber builds every
+# page object on open, ~0.1s for 200 pages), so each process opens it once and
+# reads at least this many located pages
+MIN_PAGES_PER_PROCESS = 8
+# Fewest table pages (all pages when not targeted) a report needs before its
+# table pass goes to processes at all: below that, starting them costs more
+# than they save
+MIN_POOL_PAGES = 32
+
+
+class ParsedReport:
+    # Shared parsed representation of one report: the text pass (PyMuPDF) and
+    # the table pass (a table backend, pdfplumber by default) each run at most
+    # once, on first use, so every extractor run against the same report reuses them.
+    # Page text is read lazily, so a header-only pass (basic info) stops after
+    # the pages it needs; the table pass reads the rest when it locates tables.
+    # With targeted=False every page is sent to the table backend uncropped.
+    # `table_backend` names an engine from table_backends.TABLE_BACKENDS.
+    # With a templates.TemplateStore, a table kind whose layout is known for
+    # this report's template is read with it instead of full detection.
+    # Each pass is recorded as a stage (open/text/locate/template/tables) on `timer`.
+    #
+    # low_memory bounds what a long report keeps alive: the table backend
+    # drops each page's parsed objects once its tables are read, only the
+    # located pages' text is kept after the locate pass (other pages are read
+    # again if asked for) and the full text is not cached. memory_limit (MB,
+    # implies low_memory) is checked after every table page; over it, the
+    # engines' caches are released and, if that is not enough,
+    # memory.MemoryLimitExceeded is raised.
+    #
+    # page_budget / document_budget (seconds, None for no limit) bound the
+    # table pass (time_budget.py): a page the engine does not finish in time
+    # is read again with table_backends.WordsBackend and recorded in
+    # `degraded` (page index -> reason); the kinds whose tables came from such
+    # pages are in `degraded_kinds`. The fallback is given the table a
+    # continuation page carries on (see _continues); when it cannot find those
+    # rows, the kinds continued onto the page are in `incomplete`.
+    #
+    # `pdf_path` is anything pdf_source.PdfSource takes (a path, bytes, a
+    # file-like object, a PdfSource): its bytes are read once and opened by
+    # PyMuPDF and the table engine alike (open_pdf).
+    #
+    # With an ocr.OcrReader, a page without a usable text layer (a scan) is
+    # recognized and its OCR text stands in for the page text; the next few
+    # such pages are recognized along with it (ocr.workers at once). Their
+    # indices are in `ocr_pages`.
+    #
+    # page_workers > 1 (None: one per CPU) spreads the table pass of a long
+    # report over processes, each opening the PDF itself (the file, or a copy
+    # of the bytes). The pages a kind needs are dealt out in turn, every Nth
+    # page to the same process (at least MIN_PAGES_PER_PROCESS each): table
+    # pages come together and cost several times a prose page, so contiguous
+    # ranges would leave one process with most of the work. The tables come
+    # back, by page, into the store the sequential pass fills, so templates,
+    # continuations and degraded pages work unchanged. Time budgets and the
+    # memory limit apply in each process (the document budget left when the
+    # pool starts); the 'tables' stage records the wall time. One pool serves
+    # every kind of the report: started on first use, with at most one process
+    # per CPU, and shut down by close(). Reports with fewer than MIN_POOL_PAGES
+    # table pages, and the words engine (which reads the words the text pass
+    # already has), stay in this process.
+    def __init__(self, pdf_path, targeted=True, table_backend=DEFAULT_TABLE_BACKEND, timer=None, templates=None,
+                 low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET, document_budget=DOCUMENT_BUDGET,
+                 ocr=None, page_workers=1):
+        self.source = as_source(pdf_path)
+        self.pdf_path = self.source.name
+        self.targeted = targeted
+        self.timer = timer or StageTimer()
+        self.templates = templates
+        self.memory_limit = memory_limit
+        self.low_memory = low_memory or bool(memory_limit)
+        self._doc = None
+        self._page_texts = []
+        self._text = None
+        self._regions = None
+        self._fingerprint = None
+        self._page_tables = {}
+        self.table_backend = get_table_backend(table_backend)(self)
+        self.fallback_backend = WordsBackend(self)
+        self.budget = TimeBudget(page_budget, document_budget)
+        self.degraded = {}
+        self.degraded_kinds = set()
+        self.incomplete = set()
+        self.ocr = ocr
+        self._ocr_texts = {}
+        self.ocr_pages = set()
+        self.page_workers = page_workers
+        self.continued = {}  # page index -> kinds whose table may continue onto it
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self.table_backend.close()
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+        self.source.close()
+
+    def open_pdf(self):
+        # What a parser opens: a reader over the shared bytes, or with
+        # low_memory the file itself when there is one (see pdf_source.py)
+        if self.low_memory and self.source.path is not None:
+            return self.source.path
+        return self.source.reader()
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            with self.timer.stage('open') as counts:
+                if self.low_memory and self.source.path is not None:
+                    self._doc = fitz.open(self.source.path)
+                else:
+                    self._doc = fitz.open(stream=self.source.view, filetype="pdf")
+                counts['pages'] = self._doc.page_count
+        return self._doc
+
+    def iter_page_texts(self):
+        # Page texts in order; a page is read on first request and kept for later
+        # passes (with low_memory, past the locate pass only the located pages)
+        for index in range(self.doc.page_count):
+            yield self.page_text(index)
+
+    def page_text(self, index):
+        if index < len(self._page_texts) and self._page_texts[index] is not None:
+            return self._page_texts[index]
+        with self.timer.stage('text', pages=1):
+            text = self.doc[index].get_text()
+        if self.ocr is not None and needs_ocr(self.doc[index], text):
+            text = self._ocr_text(index)
+        if index == len(self._page_texts):
+            self._page_texts.append(text)
+        return text
+
+    def _ocr_text(self, index):
+        if index not in self._ocr_texts:
+            # This page and the next pages that need OCR, up to one per OCR worker
+            pending = [index]
+            for other in range(index + 1, self.doc.page_count):
+                if len(pending) == self.ocr.workers:
+                    break
+                if other not in self._ocr_texts and needs_ocr(self.doc[other], self.doc[other].get_text()):
+                    pending.append(other)
+            self._ocr_texts.update(self.ocr.recognize_pages(self.doc, pending, self.timer))
+            self.ocr_pages.update(pending)
+        if self.low_memory:
+            return self._ocr_texts.pop(index)
+        return self._ocr_texts[index]
+
+    @property
+    def page_texts(self):
+        if self.low_memory:
+            return list(self.iter_page_texts())
+        if len(self._page_texts) < self.doc.page_count:
+            for _ in self.iter_page_texts():
+                pass
+        return self._page_texts
+
+    @property
+    def pages_read(self):
+        return len(self._page_texts)
+
+    @property
+    def read_text(self):
+        # Text of the pages read so far (all of them once `text` or the table pass ran)
+        return "".join(t + "\n" for t in self._page_texts if t is not None)
+
+    @property
+    def text(self):
+        if self._text is None:
+            text = "".join(t + "\n" for t in self.iter_page_texts())
+            if self.low_memory:
+                return text
+            self._text = text
+        return self._text
+
+    @property
+    def table_regions(self):
+        # {page index: (kinds located on the page, crop top or None for the full page)}
+        if self._regions is None:
+            with self.timer.stage('locate') as counts:
+                regions = {}
+                for index, page_text in enumerate(self.iter_page_texts()):
+                    compact = "".join(page_text.split())
+                    kinds = [kind for kind, loc in TABLE_LOCATORS.items()
+                             if all(k in compact for k in loc['required'])]
+                    continued = [kind for kind in regions.get(index - 1, ((), None))[0]
+                                 if kind not in kinds and TABLE_LOCATORS[kind]['rows'].search(page_text)]
+                    if continued:
+                        # The continued rows are above any header on the page: keep it whole
+                        self.continued[index] = continued
+                        regions[index] = (kinds + continued, None)
+                    elif kinds:
+                        regions[index] = (kinds, self._crop_top(index, kinds))
+                counts['pages'] = len(regions)
+            self._regions = regions
+            if self.low_memory:
+                self._page_texts = [t if i in regions else None for i, t in enumerate(self._page_texts)]
+        return self._regions
+
+    def _crop_top(self, index, kinds):
+        page = self.doc[index]
+        if page.rotation:
+            return None
+        tops = [rect.y0 for kind in kinds for anchor in TABLE_LOCATORS[kind]['anchors']
+                for rect in page.search_for(anchor)]
+        if not tops:
+            # Anchor split across lines or otherwise not searchable: keep the full page
+            return None
+        return max(0, min(tops) - CROP_MARGIN)
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            with self.timer.stage('template'):
+                self._fingerprint = template_fingerprint(self.doc)
+        return self._fingerprint
+
+    def tables(self, kind):
+        # Tables of the pages located for `kind` (all pages when not targeted), in page order,
+        # with tables continued over a page break joined
+        if not self.targeted:
+            pages = list(range(self.doc.page_count))
+            found = self._page_range_tables(pages)
+        else:
+            pages = [i for i, (kinds, _) in sorted(self.table_regions.items()) if kind in kinds]
+            found = self._located_tables(kind, pages)
+        if any(index in self.degraded for index in pages):
+            self.degraded_kinds.add(kind)
+        continued = [i for i in pages if kind in self.continued.get(i, ())] if self.targeted else None
+        return join_continued(found, kind, continued)
+
+    def _page_range_tables(self, pages):
+        # (page index, FoundTable) of every table on `pages`, in page order
+        self._read_in_pool(pages)
+        return [(index, t) for index in pages for t in self._tables_on_page(index)]
+
+    def _located_tables(self, kind, pages):
+        if self.templates is None or not pages:
+            return self._page_range_tables(pages)
+        found = self._template_tables(kind, pages)
+        if found is not None:
+            return found
+        found = self._page_range_tables(pages)
+        if not any(index in self.degraded for index in pages):
+            # Fallback tables say nothing about the engine's layout
+            with self.timer.stage('template'):
+                self.templates.learn(self.fingerprint, kind, self.table_backend.name, [t for _, t in found],
+                                     TABLE_LOCATORS[kind]['required'])
+        return found
+
+    def _template_tables(self, kind, pages):
+        # The kind's tables from the pages its learned layout picks, or None
+        # for full detection
+        fingerprint = self.fingerprint
+        with self.timer.stage('template'):
+            layout = self.templates.get(fingerprint, kind, self.table_backend.name)
+        if layout is None:
+            return None
+        continued = [i for i in pages if kind in self.continued.get(i, ())]
+        pages = [i for i in pages if i in continued or has_header(self.page_text(i), layout)]
+        if len(pages) == len(continued):
+            return None
+        required = TABLE_LOCATORS[kind]['required']
+        self._read_in_pool(pages)
+        found = []
+        for index in pages:
+            tables = self._tables_on_page(index)
+            # A continuation page has no header to check the layout against
+            checked = index not in self.degraded and index not in continued
+            if checked and not layout_matches(tables, layout, required):
+                with self.timer.stage('template'):
+                    self.templates.forget(fingerprint, kind, self.table_backend.name)
+                return None
+            found.extend((index, t) for t in tables)
+        self.templates.hits += 1
+        return found
+
+    def _tables_on_page(self, index):
+        # Full detection (FoundTable list); shared by every kind located on the page
+        if index not in self._page_tables:
+            # A table continued onto the page is read given the one it continues
+            # (_continues), whichever kind asks first: read the unread pages
+            # that table runs over first, in page order
+            first = index
+            while self.targeted and first in self.continued and first - 1 not in self._page_tables:
+                first -= 1
+            for i in range(first, index + 1):
+                self._read_tables(i)
+        return self._page_tables[index]
+
+    def _read_tables(self, index):
+        top = self.table_regions[index][1] if self.targeted else None
+        with self.timer.stage('tables', pages=1) as counts:
+            self._page_tables[index] = self._budgeted_tables(index, top)
+            counts['tables'] = len(self._page_tables[index])
+            if index in self.degraded:
+                counts['degraded'] = 1
+        if self.low_memory:
+            self.table_backend.release(index)
+            check_memory(self.memory_limit, self.release)
+
+    def _continues(self, index):
+        # (column boundaries, row pattern) of the table the page may carry on
+        # from the previous page, for engines that only find tables under a
+        # header (table_backends); None when there is none to carry on
+        kinds = self.continued.get(index, ()) if self.targeted else list(TABLE_LOCATORS)
+        previous = self._page_tables.get(index - 1)
+        if not kinds or not previous:
+            return None
+        return previous[-1].columns, re.compile("|".join(TABLE_LOCATORS[kind]['rows'].pattern for kind in kinds))
+
+    def _budgeted_tables(self, index, top):
+        # The engine's tables for the page, or the fallback's once the page or
+        # the document is out of time
+        if not self.budget.exhausted:
+            try:
+                with self.budget.page_deadline():
+                    return self.table_backend.find_tables(index, top, self._continues(index))
+            except BudgetExceeded:
+                # Whatever the engine had parsed of the page is of no further use
+                self.table_backend.release(index)
+        self.degraded[index] = self.budget.reason()
+        return self._fallback_tables(index, top)
+
+    def _fallback_tables(self, index, top):
+        # The fallback engine's tables for a degraded page
+        continues = self._continues(index)
+        tables = self.fallback_backend.find_tables(index, top, continues)
+        kinds = self.continued.get(index, ()) if self.targeted else ()
+        if kinds and (continues is None or not tables
+                      or not any(cell and continues[1].search(cell) for cell in tables[0].rows[0])):
+            self.incomplete.update(kinds)
+            self.degraded[index] += "; the table rows continued onto it were not read"
+        return tables
+
+    def _read_in_pool(self, pages):
+        # With page_workers, read the tables of those of `pages` not read yet
+        # on a process pool (see above); they are then served from _page_tables
+        pending = [i for i in pages if i not in self._page_tables]
+        if not self.table_backend.shardable or self.budget.exhausted:
+            return
+        size = self._pool_size()
+        workers = min(size, len(pending) // MIN_PAGES_PER_PROCESS)
+        if workers < 2:
+            return
+        runs = [pending[k::workers] for k in range(workers)]
+        regions = self.table_regions if self.targeted else {}
+        with self.timer.stage('tables', pages=len(pending)) as counts:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=size)
+            futures = [self._pool.submit(_read_page_range, self.source, self.table_backend.name, self.targeted,
+                                         {i: regions[i] for i in run if i in regions}, run, self.low_memory,
+                                         self.memory_limit, self.budget.page, self.budget.remaining)
+                       for run in runs]
+            for future in futures:
+                tables, degraded = future.result()
+                self._page_tables.update(tables)
+                self.degraded.update(degraded)
+            for index in pending:
+                if index in self.degraded and index in self.continued:
+                    # The page it continues from may be another kind's, not read yet
+                    self._tables_on_page(index - 1)
+                if index in self.degraded and self._continues(index) is not None:
+                    # A process had not read the page before it: read it again given that page's table
+                    self._page_tables[index] = self._fallback_tables(index, regions[index][1] if regions else None)
+            counts['tables'] = sum(len(self._page_tables[i]) for i in pending)
+            counts['processes'] = workers
+            if any(i in self.degraded for i in pending):
+                counts['degraded'] = sum(1 for i in pending if i in self.degraded)
+
+    def _pool_size(self):
+        # Processes the report's table pass may use (below 2: none)
+        pages = len(self.table_regions) if self.targeted else self.doc.page_count
+        if pages < MIN_POOL_PAGES:
+            return 0
+        cpus = os.cpu_count() or 1
+        return min(self.page_workers or cpus, cpus, pages // MIN_PAGES_PER_PROCESS)
+
+    def release(self):
+        # Drop the table engine's document (reopened on next use) and its caches
+        self.table_backend.close()
+
+
+def _read_page_range(source, table_backend, targeted, regions, pages, low_memory, memory_limit, page_budget,
+                     document_budget):
+    # Runs in a pool process (ParsedReport.page_workers): open the report and
+    # read the tables of `pages` with the parent's locate results, returning
+    # ({page index: FoundTable list}, degraded pages); both pickle cleanly
+    with ParsedReport(source, targeted, table_backend, low_memory=low_memory, memory_limit=memory_limit,
+                      page_budget=page_budget, document_budget=document_budget) as report:
+        report._regions = regions
+        tables = {index: report._tables_on_page(index) for index in pages}
+        return tables, report.degraded
+
+
+def join_continued(found, kind, continued=None):
+    # Rows of each table found ((page index, FoundTable), in page order). A
+    # table first on its page, without the kind's header row but starting with
+    # one of its `rows`, right after a table on the previous page with as many
+    # columns continues that one over the page break: its rows are appended to
+    # it. `continued`: the pages located as the kind's continuations, the only
+    # ones such a table may be on (None: any page, for untargeted reports).
+    # Every engine returns such a part: the words engine, which otherwise only
+    # finds tables under a header, is given the table it continues (_continues).
+    locator = TABLE_LOCATORS[kind]
+    joined = []
+    last_page = None
+    for index, table in found:
+        if (joined and last_page == index - 1 and (continued is None or index in continued)
+                and not kind_tables([table], locator['required']) and len(table.rows[0]) == len(joined[-1][0])
+                and any(cell and locator['rows'].search(cell) for cell in table.rows[0])):
+            # A new list: the page's tables stay as read for the other kinds
+            joined[-1] = joined[-1] + table.rows
+        else:
+            joined.append(table.rows)
+        last_page = index
+    return joined
+
+
+def parse_basic_info(report):
+    # Field patterns live in fields.FIELD_SPECS. Pages are pulled one at a time
+    # and reading stops once every field is resolved (the header is on page 1-2).
+    data = parse_page_fields(report_pages(report))
+    return {name: data[name] for name in BASIC_COLUMNS}
+
+
+def report_pages(report):
+    # Page texts as the field engine sees them: each followed by a newline,
+    # exactly as in report.text
+    return (t + "\n" for t in report.iter_page_texts())
+
+
+def find_idx(header, keywords):
+    for idx, col in enumerate(header):
+        if any(k in col for k in keywords):
+            return idx
+    return -1
+
+
+def get_cell(row, idx):
+    if idx != -1 and idx < len(row):
+        val = row[idx]
+        return val.replace('\n', ' ').strip() if val else ""
+    return ""
+
+
+def parse_rearrangements(report):
+    # Name and Detection No come from the text pass (PyMuPDF is faster/reliable for plain text)
+    data_header = parse_page_fields(report_pages(report), ['姓名', '检测号'])
+
+    # Rearrangement rows come from the table pass
+    # The image shows a table with headers: 重排基因 | 左断裂点位置 | 右断裂点位置
+    all_rows = []
+
+    for table in report.tables('rearrangement'):
+        # Check header row
+        header = [str(cell).replace('\n', '').strip() for cell in table[0] if cell]
+        header_str = "".join(header)
+
+        # Look for key headers from user image
+        if "重排基因" in header_str and "断裂点" in header_str:
+            # Identify column indices
+            idx_gene = find_idx(header, ["重排基因"])
+            idx_left = find_idx(header, ["左断裂", "Left"])
+            idx_right = find_idx(header, ["右断裂", "Right"])
+
+            # Extract rows
+            for row in table[1:]:
+                if not row or len(row) < 2: continue
+
+                gene_val = get_cell(row, idx_gene)
+                # Placeholder rows ("-" or empty) are reported as "无" ("有就写有，没有就写无")
+                if not gene_val or gene_val == "-":
+                    gene_val = "无"
+
+                left_val = get_cell(row, idx_left)
+                right_val = get_cell(row, idx_right)
+
+                all_rows.append({
+                    '姓名': data_header['姓名'],
+                    '检测号': data_header['检测号'],
+                    '重排基因': gene_val,
+                    '左断裂点位': left_val if left_val else "-",
+                    '右断裂点位': right_val if right_val else "-"
+                })
+
+    # If no table found or empty table, create a default "None" row
+    if not all_rows:
+        all_rows.append({
+            '姓名': data_header['姓名'],
+            '检测号': data_header['检测号'],
+            '重排基因': "无",
+            '左断裂点位': "-",
+            '右断裂点位': "-"
+        })
+    return all_rows
+
+
+def parse_mutations(report):
+    # Detection No comes from the text pass, mutation rows from the table pass
+    detection_no = parse_page_fields(report_pages(report), ['检测号'])['检测号']
+
+    # We are looking for columns: 突变基因, 转录本 ID, 外显子, 核苷酸改变, 氨基酸改变, 突变频率
+    # Note: Column names in PDF might vary slightly (e.g. "Gene", "Transcript", "Exon", "c.Change", "p.Change", "VAF")
+    all_rows = []
+
+    for table in report.tables('mutation'):
+        header = [str(cell).replace('\n', '') for cell in table[0] if cell]
+        # Check for keywords like "基因" (Gene), "突变" (Mutation), "频率" (Frequency)
+        header_str = " ".join(header)
+
+        if "基因" in header_str and "改变" in header_str:
+            # Standard format: Gene | ... | Transcript | Exon | c. | p. | VAF
+            idx_gene = find_idx(header, ["基因", "Gene"])
+            idx_trans = find_idx(header, ["转录本", "Transcript"])
+            idx_exon = find_idx(header, ["外显子", "Exon"])
+            idx_nuc = find_idx(header, ["核苷酸", "c."])
+            idx_aa = find_idx(header, ["氨基酸", "p."])
+            idx_vaf = find_idx(header, ["频率", "VAF", "%"])
+
+            # Iterate data rows (skip header)
+            for row in table[1:]:
+                if not row or len(row) < 3: continue # Skip empty or short rows
+
+                # Check if row is valid (has gene name)
+                gene_val = get_cell(row, idx_gene)
+                if not gene_val: continue
+
+                all_rows.append({
+                    '检测号': detection_no,
+                    '突变基因': gene_val,
+                    '转录本 ID': get_cell(row, idx_trans),
+                    '外显子': get_cell(row, idx_exon),
+                    '核苷酸改变': get_cell(row, idx_nuc),
+                    '氨基酸改变': get_cell(row, idx_aa),
+                    '突变频率': get_cell(row, idx_vaf)
+                })
+    return all_rows
+
+
+def parse_rows(report, kind):
+    # Uniform entry point: every kind returns a list of row dicts
+    if kind not in KIND_COLUMNS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    with report.timer.stage('parse') as counts:
+        if kind == 'basic':
+            rows = [parse_basic_info(report)]
+        elif kind == 'rearrangement':
+            rows = parse_rearrangements(report)
+        else:
+            rows = parse_mutations(report)
+        counts['rows'] = len(rows)
+    return rows
+
+
+def extract_basic_info(pdf_path):
+    with ParsedReport(pdf_path) as report:
+        return parse_basic_info(report)
+
+
+def extract_rearrangements(pdf_path, table_backend=DEFAULT_TABLE_BACKEND):
+    with ParsedReport(pdf_path, table_backend=table_backend) as report:
+        return parse_rearrangements(report)
+
+
+def extract_mutations(pdf_path, table_backend=DEFAULT_TABLE_BACKEND):
+    with ParsedReport(pdf_path, table_backend=table_backend) as report:
+        return parse_mutations(report)
+
+
+def extract_rows(pdf_path, kind, table_backend=DEFAULT_TABLE_BACKEND):
+    with ParsedReport(pdf_path, table_backend=table_backend) as report:
+        return parse_rows(report, kind)
+
+
+def extract_all(pdf_path, kinds=None, table_backend=DEFAULT_TABLE_BACKEND, cache=None, timer=None, templates=None,
+                low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET, document_budget=DOCUMENT_BUDGET,
+                ocr=None, page_workers=1):
+    # Single-pass extraction: the report is parsed once and every kind reads
+    # from the same text and tables. `pdf_path` may also be bytes, a file-like
+    # object or a pdf_source.PdfSource, read once for the hash and both parsers.
+    # With a result_cache.ResultCache, kinds already cached for this file
+    # content are returned without parsing the PDF.
+    # With a templates.TemplateStore, table layouts are learned and reused.
+    # low_memory / memory_limit bound the parse as described at ParsedReport,
+    # page_budget / document_budget its time. Pages read with the fallback
+    # engine are listed under DEGRADED, and kinds read from them are not cached;
+    # kinds known to be missing rows there are listed under INCOMPLETE.
+    # With an ocr.OcrReader, scanned pages are recognized (see ParsedReport);
+    # such results are cached apart from those read without OCR.
+    # page_workers spreads a long report's table pass over processes (see ParsedReport).
+    # Stage timings go to `timer` (a timing.StageTimer) when given.
+    kinds = list(kinds or KINDS)
+    timer = timer or StageTimer()
+    with as_source(pdf_path) as source:
+        return _extract_source(source, kinds, table_backend, cache, timer, templates, low_memory, memory_limit,
+                               page_budget, document_budget, ocr, page_workers)
+
+
+def _extract_source(source, kinds, table_backend, cache, timer, templates, low_memory, memory_limit, page_budget,
+                    document_budget, ocr, page_workers):
+    result = {}
+    digest = None
+    cache_backend = table_backend if ocr is None else f"{table_backend}+{ocr.key}"
+    if cache is not None:
+        with timer.stage('cache'):
+            digest = source.digest()
+            for kind in kinds:
+                rows = cache.get(digest, kind, cache_backend)
+                if rows is not None:
+                    result[kind] = rows
+
+    missing = [kind for kind in kinds if kind not in result]
+    degraded = {}
+    incomplete = set()
+    if missing:
+        with ParsedReport(source, table_backend=table_backend, timer=timer, templates=templates,
+                          low_memory=low_memory, memory_limit=memory_limit, page_budget=page_budget,
+                          document_budget=document_budget, ocr=ocr, page_workers=page_workers) as report:
+            for kind in missing:
+                result[kind] = parse_rows(report, kind)
+                if cache is not None and kind not in report.degraded_kinds:
+                    with timer.stage('cache'):
+                        cache.put(digest, kind, cache_backend, result[kind])
+            degraded = report.degraded
+            incomplete = report.incomplete
+    result = {kind: result[kind] for kind in kinds}
+    if degraded:
+        result[DEGRADED] = [{'页码': index + 1, '原因': reason} for index, reason in sorted(degraded.items())]
+    if incomplete & set(kinds):
+        result[INCOMPLETE] = [kind for kind in kinds if kind in incomplete]
+    return result
@@ -0,0 +1,186 @@
+import re
+from collections import namedtuple
+
+# Declarative basic-info field table.
+#
+#   name      output column
+#   label     regex for the field label ("姓\s*名" tolerates "姓 名"); it should
+#             start with a literal character so the combined scanner keeps
+#             re's literal-prefix fast path
+#   values    value regexes matched right after the label, tried in order
+#             (strict first, then looser variants) at each occurrence of the
+#             label; group 1 is the value
+#   post      optional clean-up applied to a matched value
+#   valid     optional regex the final value must match, otherwise ...
+#   fallback  ... the first hit of this pattern anywhere in the text is used
+#
+# All labels are compiled into one alternation at import, so a report's text
+# is scanned once (and only until every field has its value); each value is
+# read from its label's position instead of searching the text again.
+# The first occurrence of a label with a usable value wins.
+FieldSpec = namedtuple('FieldSpec', 'name label values post valid fallback', defaults=(None, None, None))
+
+ID_NUMBER = r"(?<!\d)(?:\d{18}|\d{17}[0-9Xx])(?!\d)"
+_MORE_TEXT = re.compile(r"\s*\S")
+
+
+def _age(value):
+    return value + "岁"
+
+
+def _id_card(value):
+    return value.replace(" ", "").replace("-", "")
+
+
+def _unit(value):
+    # The ID number is often laid out on the same line as 送检单位
+    return re.sub(r"\d{18}|\d{17}[Xx]", "", value).strip()
+
+
+FIELD_SPECS = [
+    FieldSpec('检测号', r"检测号", [r"[：:]\s*([A-Za-z0-9]+)"]),
+    FieldSpec('报告系统版本号', r"报告系统版本号", [r"\s*([A-Za-z0-9\s\.]+?)(?=\s+生信分析版本号|$)"]),
+    FieldSpec('生信分析版本号', r"生信分析版本号", [r"\s*([A-Za-z0-9\s\.]+?)(?=\s+上机号|$)"]),
+    FieldSpec('上机号', r"上机号", [r"[：:]\s*(\d+)"]),
+    FieldSpec('姓名', r"姓\s*名", [r"[：:]\s*(\S+)", r"\s*[：:]?\s*(\S+)"]),
+    FieldSpec('性别', r"性\s*别", [r"[：:]\s*([男女])", r"\s*[：:]?\s*([男女])"]),
+    FieldSpec('年龄', r"年\s*龄", [r"[：:]\s*(\d+)\s*岁?", r"\s*[：:]?\s*(\d+)\s*岁?"], post=_age),
+    FieldSpec('采样日期', r"采样日期", [r"[：:]\s*(\d{4}-\d{2}-\d{2})"]),
+    FieldSpec('标本类型', r"标本类型", [r"[：:]\s*(.+?)(?=\s+住院号|\s+病理号|\n|$)"]),
+    FieldSpec('住院号', r"住院号", [r"[：:]\s*(\S+)"]),
+    FieldSpec('病理号', r"病理号", [r"[：:]\s*(\S+)"]),
+    FieldSpec('身份证号', r"身\s*份\s*证\s*号", [r"[：:]\s*(.*?)(?=\s+姓\s*名|\s+送\s*检|\n|$)"],
+              post=_id_card, valid=r"^(\d{15}|\d{17}[0-9Xx])$", fallback=ID_NUMBER),
+    FieldSpec('送检日期', r"送检日期", [r"[：:]\s*(\d{4}-\d{2}-\d{2})"]),
+    FieldSpec('病历号', r"病历号", [r"[：:]\s*(\d+)"]),
+    FieldSpec('送检医生', r"送检医生", [r"[：:]\s*(\S+)"]),
+    FieldSpec('送检单位', r"送检单位", [r"[：:]\s*(.+?)(?=\s+身份证号|\n|$)"], post=_unit),
+    FieldSpec('检测项目', r"检测项目", [r"[：:]\s*(.+)"]),
+    FieldSpec('检测方法', r"检测方法", [r"[：:]\s*(.+)"]),
+    FieldSpec('送检材料', r"送检材料", [r"[：:]\s*(.+)"]),
+    FieldSpec('临床诊断', r"临床诊断", [r"[：:]\s*(.+)"]),
+]
+
+
+class FieldEngine:
+    # Compiled form of a field table. Each label is followed by an empty
+    # marker group (l0, l1, ...) so match.lastgroup names the field and
+    # match.end() is where its value starts.
+    #
+    # Text is consumed page by page: a field is settled at the first label
+    # occurrence where one of its value patterns matches (strict first), and
+    # no further pages are read once every wanted field is settled. A value
+    # that runs into the end of the pages read so far is not trusted until
+    # the next page (or the end of the document) shows where it stops.
+
+    # Labels may straddle a page break, so each new page is scanned from a
+    # little before the previous end
+    OVERLAP = 32
+
+    def __init__(self, specs):
+        self.specs = list(specs)
+        self.names = [spec.name for spec in self.specs]
+        self.scanner = re.compile("|".join(f"{spec.label}(?P<l{i}>)" for i, spec in enumerate(self.specs)))
+        self._group_index = {f"l{i}": i for i in range(len(self.specs))}
+        self._values = [[re.compile(v) for v in spec.values] for spec in self.specs]
+        self._valid = [re.compile(spec.valid) if spec.valid else None for spec in self.specs]
+        self._fallback = [re.compile(spec.fallback) if spec.fallback else None for spec in self.specs]
+
+    def parse(self, text, names=None):
+        return self.parse_pages([text], names)
+
+    def parse_pages(self, pages, names=None):
+        # `pages` is any iterable of page texts; it is only advanced while
+        # some wanted field is still unsettled. Each page is scanned once
+        # (from OVERLAP before it) and only a window of the text is kept: the
+        # previous page, for labels whose value was cut off by the break, and
+        # whatever an unsettled field still holds on to before that.
+        wanted = [i for i, name in enumerate(self.names) if not names or name in names]
+        pending = set(wanted)
+        positions = {i: [] for i in wanted}  # label ends, as offsets into `text`
+        # Offset the first fallback hit can start from (the hit itself once there is one)
+        fallback_from = {i: 0 for i in wanted if self._fallback[i]}
+        holds = {}
+        values = {}
+        text = ""
+        page_start = 0
+        pages = iter(pages)
+        exhausted = False
+
+        while pending and not exhausted:
+            page = next(pages, None)
+            if page is None:
+                exhausted = True
+            else:
+                scanned = len(text)
+                keep = min([page_start, max(0, scanned - self.OVERLAP)] + list(holds.values())
+                           + [max(0, fallback_from[i] - 1) for i in pending if i in fallback_from])
+                text = text[keep:] + page
+                scanned -= keep
+                page_start = scanned
+                for i in pending:
+                    positions[i] = [pos - keep for pos in positions[i] if pos >= keep]
+                    if i in fallback_from:
+                        fallback_from[i] -= keep
+                for label in self.scanner.finditer(text, max(0, scanned - self.OVERLAP)):
+                    i = self._group_index[label.lastgroup]
+                    if i in pending and label.end() not in positions[i]:
+                        positions[i].append(label.end())
+                for i in pending:
+                    if i in fallback_from:
+                        hit = self._fallback[i].search(text, fallback_from[i])
+                        fallback_from[i] = hit.start() if hit else max(fallback_from[i], len(text) - self.OVERLAP)
+
+            holds = {}
+            for i in sorted(pending):
+                settled, value, hold = self._settle(i, text, positions[i], fallback_from.get(i, 0), exhausted)
+                if settled:
+                    values[i] = value
+                    pending.discard(i)
+                elif hold is not None:
+                    holds[i] = hold
+
+        return {self.names[i]: values.get(i, "") for i in wanted}
+
+    def _complete(self, match, text, exhausted):
+        # A match followed only by whitespace in the text read so far might
+        # grow, or a stricter pattern might match instead, once more text arrives
+        return exhausted or _MORE_TEXT.match(text, match.end()) is not None
+
+    def _settle(self, i, text, positions, fallback_from, exhausted):
+        # Returns (settled, value, hold) for field i given the text read so far;
+        # hold is the label end an unsettled field's value is waiting on, if any
+        value = match = None
+        for pos in positions:
+            match = next((m for m in (v.match(text, pos) for v in self._values[i]) if m), None)
+            if match:
+                if not self._complete(match, text, exhausted):
+                    return False, None, pos
+                value = match.group(1).strip()
+                if self.specs[i].post:
+                    value = self.specs[i].post(value)
+                break
+        if value is None and not exhausted:
+            return False, None, None
+        value = value or ""
+
+        valid = self._valid[i]
+        if valid and not valid.match(value):
+            hit = self._fallback[i].search(text, fallback_from) if self._fallback[i] else None
+            if hit:
+                if not self._complete(hit, text, exhausted):
+                    return False, None, pos if match else None
+                value = hit.group(0)
+            elif not exhausted:
+                return False, None, pos if match else None
+        return True, value, None
+
+BASIC_FIELDS = FieldEngine(FIELD_SPECS)
+
+
+def parse_fields(text, names=None):
+    return BASIC_FIELDS.parse(text, names)
+
+
+def parse_page_fields(pages, names=None):
+    return BASIC_FIELDS.parse_pages(pages, names)
@@ -0,0 +1,119 @@
+import time
+from PySide6.QtCore import QObject, Signal
+
+# Shared job queue behind the tabs. Tabs build a worker (workers.py) and
+# submit it; at most `max_running` workers run at once and the rest wait in
+# submission order. The scheduler belongs to the main window, so jobs keep
+# running when a tab or mode is switched away (the tab and its log go, the job
+# does not). Cancelling a queued job drops it; a running job stops at its next
+# checkpoint (see WorkerSignals.check_cancelled).
+
+QUEUED, RUNNING, CANCELLING, DONE, FAILED, CANCELLED = '排队中', '运行中', '取消中', '完成', '失败', '已取消'
+ENDED = (DONE, FAILED, CANCELLED)
+DEFAULT_MAX_RUNNING = 2
+
+
+class Job:
+    def __init__(self, job_id, title, worker):
+        self.id = job_id
+        self.title = title
+        self.worker = worker
+        self.status = QUEUED
+        self.progress = None  # percent, None until the worker reports any
+        self.message = ""
+        self.submitted = time.monotonic()
+        self.started = None
+        self.ended = None
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.monotonic()) - self.started
+
+
+class JobScheduler(QObject):
+    job_added = Signal(int)
+    job_changed = Signal(int)
+    job_removed = Signal(int)
+
+    def __init__(self, max_running=DEFAULT_MAX_RUNNING, parent=None):
+        super().__init__(parent)
+        self.max_running = max_running
+        self.jobs = {}
+        self._next_id = 1
+
+    def submit(self, worker, title):
+        job = Job(self._next_id, title, worker)
+        self._next_id += 1
+        self.jobs[job.id] = job
+        worker.progress.connect(lambda value, job=job: self._on_progress(job, value))
+        worker.finished.connect(lambda message, job=job: self._on_ended(job, DONE, message))
+        worker.error.connect(lambda message, job=job: self._on_ended(job, FAILED, message))
+        worker.cancelled.connect(lambda message, job=job: self._on_ended(job, CANCELLED, message))
+        self.job_added.emit(job.id)
+        self._start_ready()
+        return job.id
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status in ENDED:
+            return
+        if job.status == QUEUED:
+            job.status = CANCELLED
+            job.message = "Cancelled before start"
+            job.worker.cancelled.emit(job.message)  # lets the submitting tab log it
+            self.job_changed.emit(job.id)
+        elif job.status == RUNNING:
+            job.status = CANCELLING
+            job.worker.cancel()
+            self.job_changed.emit(job.id)
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def set_max_running(self, value):
+        self.max_running = max(1, value)
+        self._start_ready()
+
+    def running(self):
+        return [job for job in self.jobs.values() if job.status in (RUNNING, CANCELLING)]
+
+    def clear_ended(self):
+        # Forget finished jobs; their threads have returned by now
+        for job in [job for job in self.jobs.values() if job.status in ENDED]:
+            job.worker.wait()
+            del self.jobs[job.id]
+            self.job_removed.emit(job.id)
+
+    def wait_all(self):
+        for job in self.running():
+            job.worker.wait()
+
+    def _start_ready(self):
+        free = self.max_running - len(self.running())
+        for job in sorted(self.jobs.values(), key=lambda j: j.id):
+            if free <= 0:
+                break
+            if job.status == QUEUED:
+                job.status = RUNNING
+                job.started = time.monotonic()
+                job.worker.start()
+                self.job_changed.emit(job.id)
+                free -= 1
+
+    def _on_progress(self, job, value):
+        job.progress = value
+        self.job_changed.emit(job.id)
+
+    def _on_ended(self, job, status, message):
+        if job.status in ENDED:
+            return
+        job.status = status
+        job.message = message
+        job.ended = time.monotonic()
+        if status == DONE:
+            job.progress = 100
+        self.job_changed.emit(job.id)
+        self._start_ready()
@@ -1,24 +1,49 @@
 # This Python file uses the following encoding: utf-8
 import sys
-from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget
-from ui_components import ConversionTab, CombinedConversionTab
+import multiprocessing
+from PySide6.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QMessageBox
+from ui_components import CombinedConversionTab, JobQueueView
+from jobs import JobScheduler
 from theme import APP_QSS
 
 class MainWindow(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("PDF Tool Suite")
-        self.resize(600, 400)
+        self.resize(760, 680)
         self.setStyleSheet(APP_QSS)
+
+        # One job queue for both tabs, shown below them
+        self.scheduler = JobScheduler(parent=self)
         
         tabs = QTabWidget()
-        tabs.addTab(CombinedConversionTab("doc"), "文件转换")
-        tabs.addTab(CombinedConversionTab("extract"), "报告提取")
-        
-        self.setCentralWidget(tabs)
+        tabs.addTab(CombinedConversionTab("doc", self.scheduler), "文件转换")
+        tabs.addTab(CombinedConversionTab("extract", self.scheduler), "报告提取")
+
+        central = QWidget()
+        layout = QVBoxLayout()
+        layout.addWidget(tabs, 3)
+        layout.addWidget(JobQueueView(self.scheduler), 2)
+        central.setLayout(layout)
+        self.setCentralWidget(central)
+
+    def closeEvent(self, event):
+        # Threads must not outlive the window: cancel what is left and wait for
+        # running jobs to reach their next checkpoint
+        running = len(self.scheduler.running())
+        if running:
+            answer = QMessageBox.question(self, "退出", f"仍有 {running} 个任务在运行，取消并退出？")
+            if answer != QMessageBox.Yes:
+                event.ignore()
+                return
+        self.scheduler.cancel_all()
+        self.scheduler.wait_all()
+        event.accept()
 
 
 if __name__ == "__main__":
+    # Batch extraction uses a process pool; needed for frozen Windows builds
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
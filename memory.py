@@ -0,0 +1,80 @@
+import ctypes
+import gc
+import os
+import sys
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Process memory for the bounded extraction mode and the per-job RSS figures
+# (timing.StageTimer). RSS is read through psutil when installed, else from
+# /proc on Linux or the Win32 API on Windows; current_rss() returns None where
+# neither works (macOS without psutil), and the memory ceiling is then not enforced.
+#
+# RSS is a process figure: GUI jobs share the application's process, batch
+# files each count against their pool process.
+
+
+class MemoryLimitExceeded(RuntimeError):
+    pass
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong),
+                ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+
+def current_rss():
+    # Resident set size of this process in bytes, or None when it cannot be read
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if os.name == "nt":
+        from ctypes import wintypes
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.WinDLL("kernel32")
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if ctypes.WinDLL("psapi").GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters),
+                                                       counters.cb):
+            return counters.WorkingSetSize
+    return None
+
+
+def release_memory():
+    # Hand freed memory back: PyMuPDF's object store, Python's garbage and,
+    # with glibc, the heap pages malloc keeps for reuse
+    import fitz  # PyMuPDF
+    fitz.TOOLS.store_shrink(100)
+    gc.collect()
+    if sys.platform.startswith("linux"):
+        try:
+            ctypes.CDLL("libc.so.6").malloc_trim(0)
+        except (OSError, AttributeError):
+            pass
+
+
+def check_memory(limit_mb, release=None):
+    # Raise MemoryLimitExceeded when RSS is over `limit_mb` even after
+    # `release()` (the caller's caches) and release_memory() have run
+    if not limit_mb:
+        return
+    rss = current_rss()
+    if rss is None or rss <= limit_mb * 2**20:
+        return
+    if release is not None:
+        release()
+    release_memory()
+    rss = current_rss()
+    if rss > limit_mb * 2**20:
+        raise MemoryLimitExceeded(f"Memory limit exceeded: {rss // 2**20} MB in use, limit {limit_mb} MB")
@@ -0,0 +1,155 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Typed columns derived from the extracted text, computed column-wise over
+# many rows at once (exporters buffer a batch's rows for it). The original
+# text columns are kept; these are added after them:
+#
+#   mutation       基因符号 / 突变来源  "ATM(胚系突变)" -> ATM, 胚系突变
+#                  外显子编号           "Exon19" -> 19
+#                  c.位置 / c.起始 / c.终止 / c.改变
+#                                       "c.2236_2250del" -> 2236_2250, 2236, 2250, del
+#                  p.参考 / p.位置 / p.改变   "p.L858R" -> L, 858, R (of a range, its start)
+#                  突变频率(%)          "12.3%" -> 12.3 (text such as Heterozygote -> empty)
+#   rearrangement  重排基因1 / 重排基因2  "BCL6/IGH" -> BCL6, IGH
+#                  左/右断裂点染色体, 左/右断裂点坐标   "chr14:106032614" -> chr14, 106032614
+#
+# Values that do not parse are left empty (None in rows, NA in frames).
+# Each text column is parsed once per distinct value: genes, exons and the
+# common variants repeat across the reports of a batch, so a chunk of rows
+# costs a handful of regex passes over its distinct cells plus array takes.
+# Table cells wrapped over two lines come out of the PDF as "c.5039 5041del _"
+# or "p.P172 G174d _ elinsCND"; HGVS text is repaired before it is split.
+
+NORMALIZED_COLUMNS = {
+    'basic': [],
+    'mutation': ['基因符号', '突变来源', '外显子编号', 'c.位置', 'c.起始', 'c.终止', 'c.改变',
+                 'p.参考', 'p.位置', 'p.改变', '突变频率(%)'],
+    'rearrangement': ['重排基因1', '重排基因2', '左断裂点染色体', '左断裂点坐标', '右断裂点染色体', '右断裂点坐标'],
+}
+# Non-text columns, for typed output formats (Parquet)
+COLUMN_TYPES = {
+    '外显子编号': 'int', 'c.起始': 'int', 'c.终止': 'int', 'p.位置': 'int', '突变频率(%)': 'float',
+    '左断裂点坐标': 'int', '右断裂点坐标': 'int',
+}
+
+_GENE = r"^\s*(?P<symbol>[^(（]*?)\s*(?:[(（](?P<note>[^)）]*)[)）])?\s*$"
+_EXON = r"^(?:exon|ex|e|外显子)?\s*(?P<number>\d+)"
+_POSITION = r"[-*]?\d+(?:[+-]\d+)?"
+_CDNA = rf"^c\.(?P<position>(?P<start>{_POSITION})(?:_(?P<end>{_POSITION}))?)(?P<change>.*)$"
+_AMINO_ACID = r"(?:[A-Z](?:[a-z]{2})?|\*)"
+_PROTEIN = rf"^p\.\(?(?P<ref>{_AMINO_ACID})(?P<position>\d+)(?:_{_AMINO_ACID}\d+)?(?P<change>.*?)\)?$"
+_VAF = r"^\s*(?P<value>\d+(?:\.\d+)?)\s*%?\s*$"
+_BREAKPOINT = r"^\s*(?:chr)?(?P<chrom>[0-9]{1,2}|[XYM])\s*[:：]\s*(?P<coord>[\d,]+)"
+# Fusion partners: / or ::, or a - with a symbol on both sides (EML4-ALK), not the - of a
+# hyphenated symbol (NKX2-1, HLA-A, HLA-DRB1, MT-ND1, HOXA11-AS)
+_PARTNERS = (r"\s*(?:/|::)\s*|(?<=[A-Z0-9])(?<!\bHLA)(?<!\bMT)\s*-\s*"
+             r"(?=[A-Z][A-Z0-9]{2,}\b)(?!(?:AS|IT|OT|DT)\d*\b)")
+NO_VALUE = ['', '-', '无', 'None']
+
+
+def normalized_columns(kind, columns):
+    return list(columns) + NORMALIZED_COLUMNS[kind]
+
+
+def _text(frame, column):
+    if column in frame:
+        return frame[column].astype("string").str.strip()
+    return pd.Series(pd.NA, index=frame.index, dtype="string")
+
+
+def _distinct(values, parse):
+    # parse(distinct values) -> frame, spread back over `values` (NA rows stay NA)
+    codes, uniques = pd.factorize(values)
+    parsed = parse(pd.Series(uniques, dtype="string")).reindex(range(len(uniques) + 1))
+    spread = parsed.iloc[np.where(codes < 0, len(uniques), codes)]
+    spread.index = values.index
+    return spread
+
+
+def _extract(values, pattern, flags=0):
+    return _distinct(values, lambda v: v.str.extract(pattern, flags=flags))
+
+
+def _integer(values):
+    # Leading coordinate of a position such as 1234+1 or -14; *5 (3' UTR) has none
+    return pd.to_numeric(values.str.extract(r"^(-?\d+)", expand=False), errors="coerce").astype("Int64")
+
+
+def _missing(values):
+    return values.isna() | values.isin(NO_VALUE)
+
+
+def repair_hgvs(values):
+    # A gap is a wrapped line (pdfplumber: c.514_521delinsTGTA ATGA), joined with
+    # no separator. Only a cell with a stray underscore token (PyMuPDF moves the
+    # range underscore of a wrapped cell: c.514 521delinsTGTA _ ATGA, c.5039 5041del _)
+    # gets it back, at its first gap; the token's own gaps are joined.
+    stray = values.str.contains(r"\s_(?:\s|$)", regex=True, na=False)
+    values = values.str.replace(r"\s+_(?:\s+|$)", "", regex=True)
+    values = values.where(~stray, values.str.replace(r"\s+", "_", n=1, regex=True))
+    return values.str.replace(r"\s+", "", regex=True)
+
+
+def normalize_mutations(frame):
+    out = pd.DataFrame(index=frame.index)
+    gene = _extract(_text(frame, '突变基因'), _GENE)
+    out['基因符号'] = gene['symbol'].str.upper().mask(_missing(gene['symbol']))
+    out['突变来源'] = gene['note'].mask(gene['note'] == "")
+    exon = _extract(_text(frame, '外显子'), _EXON, re.IGNORECASE)
+    out['外显子编号'] = pd.to_numeric(exon['number'], errors="coerce").astype("Int64")
+    cdna = _distinct(_text(frame, '核苷酸改变'), lambda v: repair_hgvs(v).str.extract(_CDNA))
+    out['c.位置'] = cdna['position']
+    out['c.起始'] = _integer(cdna['start'])
+    out['c.终止'] = _integer(cdna['end'].fillna(cdna['start']))
+    out['c.改变'] = cdna['change'].mask(cdna['change'] == "")
+    protein = _distinct(_text(frame, '氨基酸改变'), lambda v: repair_hgvs(v).str.extract(_PROTEIN))
+    out['p.参考'] = protein['ref']
+    out['p.位置'] = pd.to_numeric(protein['position'], errors="coerce").astype("Int64")
+    out['p.改变'] = protein['change'].mask(protein['change'] == "")
+    vaf = _extract(_text(frame, '突变频率'), _VAF)
+    out['突变频率(%)'] = pd.to_numeric(vaf['value'], errors="coerce").astype("Float64")
+    return out
+
+
+def normalize_rearrangements(frame):
+    out = pd.DataFrame(index=frame.index)
+    genes = _extract(_text(frame, '重排基因'), _GENE)['symbol'].str.upper()
+    partners = genes.mask(_missing(genes)).str.split(_PARTNERS, n=1, regex=True, expand=True)
+    partners = partners.reindex(columns=[0, 1])
+    out['重排基因1'] = partners[0].astype("string")
+    out['重排基因2'] = partners[1].astype("string")
+    for side in ('左', '右'):
+        point = _extract(_text(frame, f'{side}断裂点位'), _BREAKPOINT, re.IGNORECASE)
+        out[f'{side}断裂点染色体'] = ("chr" + point['chrom'].str.upper()).astype("string")
+        out[f'{side}断裂点坐标'] = pd.to_numeric(point['coord'].str.replace(",", ""), errors="coerce").astype("Int64")
+    return out
+
+
+NORMALIZERS = {'mutation': normalize_mutations, 'rearrangement': normalize_rearrangements}
+
+
+def normalize_frame(kind, frame):
+    # `frame` with the kind's normalized columns added (typed: string, Int64, Float64)
+    normalizer = NORMALIZERS.get(kind)
+    if normalizer is None or frame.empty:
+        return frame.reindex(columns=normalized_columns(kind, frame.columns))
+    return pd.concat([frame, normalizer(frame)], axis=1)
+
+
+def normalize_rows(kind, rows):
+    # Row dicts with the normalized columns added; values are plain Python
+    # (int, float, str or None), ready for any output writer
+    rows = list(rows)
+    if not rows or kind not in NORMALIZERS:
+        return rows
+    added = NORMALIZERS[kind](pd.DataFrame(rows))
+    columns = list(added.columns)
+    values = zip(*[_plain(added[c]) for c in columns])
+    return [{**row, **dict(zip(columns, line))} for row, line in zip(rows, values)]
+
+
+def _plain(column):
+    # Python values, NA as None
+    return column.astype(object).where(column.notna(), None).tolist()
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from result_cache import user_cache_dir
+
+# OCR for scanned pages, used by ParsedReport only where a page has no usable
+# text layer (fewer than MIN_TEXT_CHARS characters of text, and an image):
+# the page is rendered with PyMuPDF at OCR_DPI in grayscale, recognized by an
+# OCR engine, and its text takes the place of the empty page text, so the
+# basic-info fields and table locating read it like any other page. Tables
+# on such pages are still read by the table engine from the PDF itself and
+# come out empty: scanned reports yield their basic info, not their tables.
+#
+# Engines (OCR_ENGINES) recognize one page image at a time:
+#
+#   key                  engine, version and languages, for the caches
+#   recognize(png)       the text of a PNG page image
+#
+# The default, tesseract, runs the `tesseract` executable ($TESSERACT, else
+# PATH, languages $TESSERACT_LANGUAGES or chi_sim+eng), one process per page:
+# OcrReader keeps up to `workers` of them running at once, so a scanned
+# report's pages are recognized in parallel across processes. Each process is
+# limited to one thread (OMP_THREAD_LIMIT=1); Tesseract's own threading only
+# competes with the other pages. Anything with `key` and `recognize` can be
+# passed instead of an engine name (a stub in tests, another engine).
+#
+# Recognized text is cached by a hash of the rendered page image (OcrCache,
+# next to the result cache), so a scanned report, or a page identical to one
+# seen before, costs one render per page the second time.
+#
+#   reader = OcrReader('tesseract', OcrCache(), workers=4)
+#   with ParsedReport(path, ocr=reader) as report:
+#       text = report.text
+
+# Below the usual 300 DPI: recognition time grows with the pixel count (2.25x
+# at 300), and report text is printed at 9pt or more
+OCR_DPI = 200
+MIN_TEXT_CHARS = 10
+OCR_LANGUAGES = "chi_sim+eng"
+OCR_TIMEOUT = 120  # seconds per page
+
+
+def find_tesseract():
+    return os.environ.get("TESSERACT") or shutil.which("tesseract")
+
+
+class TesseractEngine:
+    name = 'tesseract'
+
+    def __init__(self, languages=None, executable=None):
+        self.languages = languages or os.environ.get("TESSERACT_LANGUAGES") or OCR_LANGUAGES
+        self.executable = executable or find_tesseract()
+        self._version = None
+
+    @property
+    def key(self):
+        if self._version is None:
+            self._version = self._run(["--version"]).splitlines()[0].strip()
+        return f"{self._version} {self.languages}"
+
+    def recognize(self, png):
+        return self._run(["stdin", "stdout", "-l", self.languages], png)
+
+    def _run(self, args, data=None):
+        if not self.executable:
+            raise RuntimeError("Tesseract not found: install it (with the chi_sim language data) or set TESSERACT")
+        env = dict(os.environ, OMP_THREAD_LIMIT="1")
+        done = subprocess.run([self.executable] + args, input=data, capture_output=True, env=env,
+                              timeout=OCR_TIMEOUT)
+        if done.returncode != 0:
+            raise RuntimeError(f"Tesseract failed: {done.stderr.decode(errors='replace').strip()}")
+        return done.stdout.decode("utf-8", errors="replace")
+
+
+OCR_ENGINES = {'tesseract': TesseractEngine}
+DEFAULT_OCR_ENGINE = 'tesseract'
+
+
+def get_ocr_engine(engine):
+    # An engine instance for a name in OCR_ENGINES; an instance is returned as is
+    if not isinstance(engine, str):
+        return engine
+    try:
+        return OCR_ENGINES[engine]()
+    except KeyError:
+        raise ValueError(f"Unknown OCR engine {engine!r}, expected one of {', '.join(OCR_ENGINES)}")
+
+
+def needs_ocr(page, text):
+    # No usable text layer: (almost) no text, but something drawn as an image
+    return len("".join(text.split())) < MIN_TEXT_CHARS and bool(page.get_images(full=False))
+
+
+class OcrCache:
+    # Recognized text by page-image hash and engine key; entries unused for
+    # `max_age_days` are dropped on open
+    def __init__(self, path=None, max_age_days=90):
+        self.path = path or os.path.join(user_cache_dir(), "ocr.sqlite3")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Batch pool processes share the file, so wait on locks instead of failing
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS pages (
+            digest TEXT NOT NULL, engine TEXT NOT NULL, text TEXT NOT NULL, accessed REAL NOT NULL,
+            PRIMARY KEY (digest, engine))""")
+        with self._db:
+            self._db.execute("DELETE FROM pages WHERE accessed < ?", (time.time() - max_age_days * 86400,))
+
+    def close(self):
+        self._db.close()
+
+    def get(self, digest, engine):
+        row = self._db.execute("SELECT text FROM pages WHERE digest=? AND engine=?", (digest, engine)).fetchone()
+        if row is not None:
+            with self._db:
+                self._db.execute("UPDATE pages SET accessed=? WHERE digest=? AND engine=?",
+                                 (time.time(), digest, engine))
+            return row[0]
+        return None
+
+    def put(self, digest, engine, text):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (digest, engine, text, time.time()))
+
+
+class OcrReader:
+    # Recognizes pages of an open fitz document for ParsedReport. `engine` is
+    # a name in OCR_ENGINES or an engine; `cache` an OcrCache or None.
+    def __init__(self, engine=DEFAULT_OCR_ENGINE, cache=None, workers=1, dpi=OCR_DPI):
+        self.engine = get_ocr_engine(engine)
+        self.cache = cache
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.dpi = dpi
+        self.hits = 0
+        self.recognized = 0
+
+    @property
+    def key(self):
+        # Part of the result cache key: results read with OCR are not those read without
+        return f"ocr {self.engine.key} {self.dpi}dpi"
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+    def recognize_pages(self, doc, indices, timer):
+        # {index: text} of the given pages, at most `workers` recognized at once
+        # (rendering happens here, so only that many page images are held)
+        import fitz  # PyMuPDF, as loaded by extractors
+        texts = {}
+        with timer.stage('ocr', pages=len(indices)):
+            images = {}
+            for index in indices:
+                pixmap = doc[index].get_pixmap(dpi=self.dpi, colorspace=fitz.csGRAY)
+                digest = hashlib.sha256(pixmap.samples_mv).hexdigest() + f"-{pixmap.width}x{pixmap.height}"
+                text = self.cache.get(digest, self.key) if self.cache is not None else None
+                if text is not None:
+                    self.hits += 1
+                    texts[index] = text
+                else:
+                    images[index] = (digest, pixmap.tobytes("png"))
+            if images:
+                with ThreadPoolExecutor(min(self.workers, len(images))) as pool:
+                    found = pool.map(self.engine.recognize, [png for _, png in images.values()])
+                    for (index, (digest, _)), text in zip(images.items(), found):
+                        texts[index] = text
+                        self.recognized += 1
+                        if self.cache is not None:
+                            self.cache.put(digest, self.key, text)
+        return texts
+
+    def stats_message(self):
+        return f"OCR 识别 {self.recognized} 页，缓存命中 {self.hits} 页"
@@ -0,0 +1,346 @@
+import atexit
+import glob
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Word -> PDF engines behind converters.word_to_pdf. A backend converts one
+# file at a time per pooled converter and is safe to share between threads:
+#
+#   convert(docx_path, pdf_path, timeout=None)   blocks until the PDF is written
+#   resize(size)                                 allow `size` concurrent conversions
+#   close()
+#
+# Backends are shared per process (get_word_backend), so a GUI session or a
+# batch keeps its office processes warm from one file to the next.
+
+DEFAULT_TIMEOUT = 120  # seconds per document
+DEFAULT_POOL_SIZE = 2
+STARTUP_TIMEOUT = 60
+# Recycle a LibreOffice process after this many documents (it grows over time)
+MAX_JOBS_PER_PROCESS = 200
+
+SOFFICE_CANDIDATES = [
+    "/usr/bin/soffice",
+    "/usr/lib/libreoffice/program/soffice",
+    "/opt/libreoffice*/program/soffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+    r"C:\Program Files\LibreOffice\program\soffice.exe",
+    r"C:\Program Files (x86)\LibreOffice\program\soffice.exe",
+]
+
+
+def find_soffice():
+    # $SOFFICE wins, then PATH, then the usual install locations
+    if os.environ.get("SOFFICE"):
+        return os.environ["SOFFICE"]
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    for pattern in SOFFICE_CANDIDATES:
+        for match in sorted(glob.glob(pattern), reverse=True):
+            if os.path.isfile(match):
+                return match
+    return None
+
+
+def _uno_available():
+    # pyuno ships with LibreOffice's own Python (or the python3-uno package);
+    # without it every conversion is a one-shot `soffice --convert-to`
+    try:
+        import uno  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _popen_group():
+    # soffice forks soffice.bin; a process group lets a hung one be killed whole
+    if os.name == "nt":
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def _kill(proc):
+    if proc is None or proc.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)], capture_output=True)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+    proc.wait()
+
+
+class _CommandSlot:
+    # One cold `soffice --convert-to pdf` per document. The user profile is
+    # kept between runs, which saves its (slowest) first-start initialisation
+    # and lets several slots convert at once.
+    def __init__(self, soffice):
+        self.soffice = soffice
+        self.profile = tempfile.mkdtemp(prefix="pdftool-soffice-")
+        self.jobs = 0
+
+    def convert(self, docx_path, pdf_path, timeout):
+        out_dir = tempfile.mkdtemp(prefix=".soffice-", dir=os.path.dirname(os.path.abspath(pdf_path)))
+        try:
+            cmd = [self.soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nolockcheck",
+                   f"-env:UserInstallation={Path(self.profile).as_uri()}",
+                   "--convert-to", "pdf:writer_pdf_Export", "--outdir", out_dir, os.path.abspath(docx_path)]
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **_popen_group())
+            try:
+                output, _ = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                _kill(proc)
+                raise TimeoutError(f"LibreOffice timed out after {timeout}s on {os.path.basename(docx_path)}")
+            produced = os.path.join(out_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+            if not os.path.exists(produced):
+                message = output.decode(errors="replace").strip().splitlines()
+                raise RuntimeError(f"LibreOffice did not convert {os.path.basename(docx_path)}"
+                                   + (f": {message[-1]}" if message else ""))
+            os.replace(produced, pdf_path)
+            self.jobs += 1
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+
+    def close(self):
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class _ListenerSlot:
+    # A warm headless soffice listening on a local socket, driven over UNO:
+    # documents are loaded and exported without paying the office startup
+    # again. A conversion that runs past its timeout kills the process; it is
+    # started again right away so the pool stays warm.
+    def __init__(self, soffice):
+        self.soffice = soffice
+        self.profile = tempfile.mkdtemp(prefix="pdftool-soffice-")
+        self.proc = None
+        self.desktop = None
+        self.jobs = 0
+
+    def start(self):
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        cmd = [self.soffice, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+               "--nolockcheck", f"-env:UserInstallation={Path(self.profile).as_uri()}",
+               f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **_popen_group())
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+                break
+            except NoConnectException:
+                if self.proc.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("LibreOffice listener failed to start")
+                time.sleep(0.2)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        self.jobs = 0
+
+    def stop(self):
+        if self.desktop is not None and self.proc is not None and self.proc.poll() is None:
+            try:
+                self.desktop.terminate()
+                self.proc.wait(timeout=5)
+            except Exception:
+                pass
+        _kill(self.proc)
+        self.proc = None
+        self.desktop = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def convert(self, docx_path, pdf_path, timeout):
+        if self.proc is None or self.proc.poll() is not None or self.jobs >= MAX_JOBS_PER_PROCESS:
+            self.restart()
+        outcome = {}
+
+        def run():
+            try:
+                self._export(docx_path, pdf_path)
+            except Exception as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            # Hung on this document: kill it (the blocked call then fails and
+            # the thread ends) and bring up a fresh listener for the next job
+            _kill(self.proc)
+            try:
+                self.restart()
+            except Exception:
+                self.stop()
+            raise TimeoutError(f"LibreOffice timed out after {timeout}s on {os.path.basename(docx_path)}")
+        if 'error' in outcome:
+            if self.proc.poll() is not None:
+                # The listener crashed; leave the restart to the next job
+                self.stop()
+            raise RuntimeError(f"LibreOffice failed on {os.path.basename(docx_path)}: {outcome['error']}")
+        self.jobs += 1
+
+    def _export(self, docx_path, pdf_path):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def props(**values):
+            result = []
+            for name, value in values.items():
+                p = PropertyValue()
+                p.Name, p.Value = name, value
+                result.append(p)
+            return tuple(result)
+
+        doc = self.desktop.loadComponentFromURL(uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0,
+                                                props(Hidden=True, ReadOnly=True))
+        if doc is None:
+            raise RuntimeError("could not open the document")
+        try:
+            doc.storeToURL(uno.systemPathToFileUrl(os.path.abspath(pdf_path)), props(FilterName="writer_pdf_Export"))
+        finally:
+            doc.close(True)
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile, ignore_errors=True)
+
+
+class LibreOfficeBackend:
+    # Pool of converters, one document each at a time. With pyuno they are
+    # warm listeners (_ListenerSlot); otherwise one soffice run per document
+    # with a reused profile (_CommandSlot). Slots start on first use and stay up until close().
+    name = 'libreoffice'
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, soffice=None):
+        self.soffice = soffice or find_soffice()
+        if not self.soffice:
+            raise RuntimeError("LibreOffice (soffice) not found; install it or set SOFFICE")
+        self.timeout = timeout
+        self.warm = _uno_available()
+        self.size = 0
+        self._slots = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self.resize(size)
+
+    @staticmethod
+    def available():
+        return find_soffice() is not None
+
+    def resize(self, size):
+        # Grow only: slots that are already up keep running
+        with self._lock:
+            while self.size < max(1, size or DEFAULT_POOL_SIZE):
+                slot = (_ListenerSlot if self.warm else _CommandSlot)(self.soffice)
+                self._slots.append(slot)
+                self._idle.put(slot)
+                self.size += 1
+
+    def convert(self, docx_path, pdf_path, timeout=None):
+        slot = self._idle.get()
+        try:
+            slot.convert(docx_path, pdf_path, timeout or self.timeout)
+        finally:
+            self._idle.put(slot)
+        return pdf_path
+
+    def close(self):
+        with self._lock:
+            for slot in self._slots:
+                slot.close()
+            self._slots = []
+            self._idle = queue.Queue()
+            self.size = 0
+
+
+class Docx2PdfBackend:
+    # Microsoft Word through docx2pdf (Windows/macOS). Word runs one
+    # conversion at a time and is driven in-process, so there is no pool and
+    # no per-job timeout.
+    name = 'docx2pdf'
+
+    def __init__(self, size=1, timeout=None):
+        self.size = 1
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        return sys.platform in ("win32", "darwin")
+
+    def resize(self, size):
+        pass
+
+    def convert(self, docx_path, pdf_path, timeout=None):
+        from docx2pdf import convert
+        with self._lock:
+            convert(docx_path, pdf_path)
+        return pdf_path
+
+    def close(self):
+        pass
+
+
+WORD_BACKENDS = {
+    'libreoffice': LibreOfficeBackend,
+    'docx2pdf': Docx2PdfBackend,
+}
+# 'auto': LibreOffice when installed, else Word through docx2pdf
+DEFAULT_WORD_BACKEND = 'auto'
+WORD_BACKEND_CHOICES = ['auto'] + list(WORD_BACKENDS)
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def resolve_word_backend(name=None):
+    name = name or DEFAULT_WORD_BACKEND
+    if name == 'auto':
+        for candidate, cls in WORD_BACKENDS.items():
+            if cls.available():
+                return candidate
+        raise RuntimeError("No Word to PDF backend: install LibreOffice (soffice) or Microsoft Word")
+    if name not in WORD_BACKENDS:
+        raise ValueError(f"Unknown Word backend: {name} (choose from {', '.join(WORD_BACKEND_CHOICES)})")
+    return name
+
+
+def get_word_backend(name=None, size=None):
+    # The process-wide instance of a backend, grown to `size` concurrent conversions
+    name = resolve_word_backend(name)
+    with _shared_lock:
+        backend = _shared.get(name)
+        if backend is None:
+            backend = _shared[name] = WORD_BACKENDS[name](size or DEFAULT_POOL_SIZE)
+        elif size:
+            backend.resize(size)
+    return backend
+
+
+@atexit.register
+def close_word_backends():
+    with _shared_lock:
+        for backend in _shared.values():
+            backend.close()
+        _shared.clear()
@@ -0,0 +1,186 @@
+import hashlib
+import io
+import mmap
+import os
+import tarfile
+import zipfile
+
+# Where a report's bytes come from. Extractors take a path, bytes, a
+# bytearray or memoryview, a binary file-like object (read once) or a
+# PdfSource; the bytes are read a single time and shared by PyMuPDF, the
+# table engine and the cache hash without copies:
+#
+#   path          the file is memory-mapped (pages are read from disk as the
+#                 parsers touch them, through the OS page cache)
+#   bytes / view  used in place (uploads, database blobs, archive members)
+#   file-like     read() once into bytes
+#
+# PyMuPDF opens the buffer directly (fitz.open(stream=memoryview)),
+# pdfplumber gets a reader over the same memoryview, and the result cache
+# hashes it. With low_memory, ParsedReport reads a path from disk in each
+# parser as before: the mapped pages of a large PDF count in the process RSS
+# the memory limit is checked against.
+#
+# Archives (.zip, .tar and compressed tars) are read member by member
+# without extracting anything to disk: iter_archive() yields a PdfSource per
+# PDF member, named "<archive>/<member>", reading the next member only when
+# asked for, so a batch holds just the members in flight. Tars are read as a
+# stream (mode "r|*"), so one on a network share is read once, front to back.
+#
+#   with PdfSource(open("报告.pdf", "rb")) as source:
+#       doc = fitz.open(stream=source.view, filetype="pdf")
+#   for source in iter_archive("reports.zip"):
+#       result = extract_all(source)
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+MEMORY_NAME = "<memory>"
+
+
+def is_archive(path):
+    return isinstance(path, str) and path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def source_name(source):
+    # Display name of a source: its path, member name or <memory>
+    if isinstance(source, PdfSource):
+        return source.name
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, "name", None) or MEMORY_NAME
+
+
+class BufferReader(io.RawIOBase):
+    # Read-only file object over a memoryview (each read copies just the bytes asked for)
+    def __init__(self, view):
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:n] = self._view[self._position:self._position + n]
+        self._position += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        self._view = memoryview(b"")
+        super().close()
+
+
+class PdfSource:
+    # One report's bytes (see above). Picklable while it has not been read
+    # from a path yet, or when it holds bytes, so it can be sent to a pool process.
+    def __init__(self, source, name=None):
+        self.path = None
+        self._data = None
+        self._file = None
+        self._map = None
+        self._view = None
+        if isinstance(source, PdfSource):
+            self.path, self._data = source.path, source._data
+        elif isinstance(source, (str, os.PathLike)):
+            self.path = os.fspath(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._data = source
+        elif hasattr(source, "read"):
+            self._data = source.read()
+        else:
+            raise TypeError(f"Cannot read a PDF from {type(source).__name__}")
+        self.name = name or source_name(source)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        return {'path': self.path, '_data': bytes(self._data) if self._data is not None else None,
+                'name': self.name, '_file': None, '_map': None, '_view': None}
+
+    @property
+    def view(self):
+        # The whole file as a read-only memoryview, mapped or read on first use
+        if self._view is None:
+            if self._data is not None:
+                self._view = memoryview(self._data)
+            else:
+                self._file = open(self.path, "rb")
+                try:
+                    self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._view = memoryview(self._map)
+                except (ValueError, OSError):
+                    # Empty files cannot be mapped, nor can some special or remote files
+                    self._view = memoryview(self._file.read())
+        return self._view
+
+    def reader(self):
+        # A new file object over the shared bytes (for pdfplumber; each has its own position)
+        return io.BufferedReader(BufferReader(self.view), 1 << 16)
+
+    def digest(self):
+        # SHA-256 of the content: the result cache key
+        return hashlib.sha256(self.view).hexdigest()
+
+    def close(self):
+        # Parsers opened on view / reader() must be closed first
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # A parser still holds a view; the mapping goes when that does
+                pass
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def as_source(source):
+    # `source` itself when it is a PdfSource (sharing its bytes), else a PdfSource of it
+    return source if isinstance(source, PdfSource) else PdfSource(source)
+
+
+def iter_archive(path, extensions=(".pdf",)):
+    # PdfSource per member whose name ends with one of `extensions`, in archive order
+    if path.lower().endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith(extensions):
+                    with archive.open(info) as member:
+                        yield PdfSource(member.read(), f"{path}/{info.filename}")
+        return
+    with tarfile.open(path, mode="r|*") as archive:
+        for info in archive:
+            if info.isfile() and info.name.lower().endswith(extensions):
+                yield PdfSource(archive.extractfile(info).read(), f"{path}/{info.name}")
+
+
+def iter_sources(paths, extensions=(".pdf",)):
+    # Paths as they are, archives expanded into their members (lazily)
+    for path in paths:
+        if is_archive(path):
+            yield from iter_archive(path, extensions)
+        else:
+            yield path
@@ -0,0 +1,220 @@
+import os
+import re
+import sqlite3
+import sys
+import time
+from extractors import BASIC_COLUMNS, KINDS, MUTATION_COLUMNS, REARRANGEMENT_COLUMNS
+from result_cache import APP_NAME
+from timing import StageTimer
+
+# Persistent store of extracted records, one place to look a patient or a
+# gene up in instead of the workbooks of every run. Each report's rows are
+# normalized into three tables, keyed by 检测号:
+#
+#   reports         one row per 检测号: the basic-info fields, 源文件 and 更新时间
+#   mutations       MUTATION_COLUMNS, linked by 检测号, in report order
+#   rearrangements  REARRANGEMENT_COLUMNS but 姓名 (taken from the report), likewise
+#   genes           gene symbols of both, for lookups: 突变基因 "ATM(体细胞突变)"
+#                   is found as ATM, 重排基因 "BCL6/IGH" as BCL6 and as IGH
+#
+# Storing a report again is an upsert: the kinds in the new result replace
+# that report's earlier rows of those kinds, other kinds are kept. A result
+# without any 检测号 cannot be keyed and is skipped (counted in `skipped`).
+# Columns carry the sheet headers, so exported tables are the familiar ones.
+#
+#   with RecordStore() as store:
+#       store.put(result, source='报告.pdf')
+#       ids = store.find(gene='EGFR')
+#       write_batch(path, store.iter_results(ids, kinds), kinds)
+
+SCHEMA = 1
+REPORT_COLUMNS = BASIC_COLUMNS
+MUTATION_FIELDS = [c for c in MUTATION_COLUMNS if c != '检测号']
+REARRANGEMENT_FIELDS = [c for c in REARRANGEMENT_COLUMNS if c not in ('姓名', '检测号')]
+KIND_TABLES = {'mutation': ('mutations', MUTATION_FIELDS), 'rearrangement': ('rearrangements', REARRANGEMENT_FIELDS)}
+GENE_FIELDS = {'mutation': '突变基因', 'rearrangement': '重排基因'}
+# Annotation after the symbol, e.g. (体细胞突变); fusion partners are joined by / or ::, or by a -
+# with a symbol on both sides (EML4-ALK), which the hyphenated symbols themselves do not have:
+# a short suffix (NKX2-1, HLA-A), an HLA- or MT- family (HLA-DRB1, MT-ND1) or an -AS1 style RNA
+_ANNOTATION = re.compile(r"[(（].*$")
+_PARTNERS = re.compile(r"\s*(?:/|::)\s*|(?<=[A-Z0-9])(?<!\bHLA)(?<!\bMT)\s*-\s*"
+                       r"(?=[A-Z][A-Z0-9]{2,}\b)(?!(?:AS|IT|OT|DT)\d*\b)", re.IGNORECASE)
+NO_GENE = {'', '-', '无'}
+
+
+def user_data_dir():
+    # Kept data (unlike user_cache_dir, nothing here can be rebuilt by re-running)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, APP_NAME, "Data")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Application Support"), APP_NAME)
+    base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, APP_NAME)
+
+
+def default_store_path():
+    return os.path.join(user_data_dir(), "records.sqlite3")
+
+
+def gene_symbols(value):
+    # Upper-cased symbols a gene cell is looked up by: the whole symbol and,
+    # for fusions, each partner
+    value = _ANNOTATION.sub("", value or "").strip()
+    if value in NO_GENE:
+        return set()
+    symbols = {value.upper()}
+    symbols.update(part.upper() for part in _PARTNERS.split(value) if part not in NO_GENE)
+    return symbols
+
+
+def _names(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def _assignments(columns):
+    return ", ".join(f'"{c}"=?' for c in columns)
+
+
+class RecordStore:
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self.stored = 0
+        self.skipped = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA:
+            self._db.close()
+            raise RuntimeError(f"{self.path} was written by a newer version (schema {version})")
+        basic = ", ".join(f'"{c}" TEXT' for c in REPORT_COLUMNS if c != '检测号')
+        with self._db:
+            self._db.execute(f"""CREATE TABLE IF NOT EXISTS reports (
+                "检测号" TEXT PRIMARY KEY, {basic}, "源文件" TEXT, "更新时间" REAL NOT NULL)""")
+            for table, fields in KIND_TABLES.values():
+                columns = ", ".join(f'"{c}" TEXT' for c in fields)
+                self._db.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                    "检测号" TEXT NOT NULL REFERENCES reports ("检测号") ON DELETE CASCADE,
+                    position INTEGER NOT NULL, {columns},
+                    PRIMARY KEY ("检测号", position))""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS genes (
+                "检测号" TEXT NOT NULL REFERENCES reports ("检测号") ON DELETE CASCADE,
+                kind TEXT NOT NULL, "基因" TEXT NOT NULL,
+                PRIMARY KEY ("检测号", kind, "基因"))""")
+            self._db.execute('CREATE INDEX IF NOT EXISTS reports_id_card ON reports ("身份证号")')
+            self._db.execute('CREATE INDEX IF NOT EXISTS reports_name ON reports ("姓名")')
+            self._db.execute('CREATE INDEX IF NOT EXISTS genes_gene ON genes ("基因")')
+            self._db.execute(f"PRAGMA user_version={SCHEMA}")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, result, source=None):
+        # Upsert one report's result (kind -> rows); returns its 检测号, or None when it has none
+        rows = [row for kind in KINDS for row in result.get(kind, [])]
+        report_id = next((row['检测号'] for row in rows if row.get('检测号')), None)
+        if not report_id:
+            self.skipped += 1
+            return None
+        with self._db:
+            self._db.execute('INSERT INTO reports ("检测号", "源文件", "更新时间") VALUES (?, ?, ?) '
+                             'ON CONFLICT ("检测号") DO UPDATE SET "源文件"=COALESCE(excluded."源文件", "源文件"), '
+                             '"更新时间"=excluded."更新时间"', (report_id, source, time.time()))
+            if result.get('basic'):
+                fields = [c for c in REPORT_COLUMNS if c != '检测号']
+                self._db.execute(f'UPDATE reports SET {_assignments(fields)} WHERE "检测号"=?',
+                                 [result['basic'][0].get(c) for c in fields] + [report_id])
+            for kind, (table, fields) in KIND_TABLES.items():
+                if kind not in result:
+                    continue
+                self._db.execute(f'DELETE FROM {table} WHERE "检测号"=?', (report_id,))
+                self._db.executemany(
+                    f'INSERT INTO {table} ("检测号", position, {_names(fields)}) '
+                    f'VALUES (?, ?, {", ".join("?" * len(fields))})',
+                    [[report_id, i] + [row.get(c) for c in fields] for i, row in enumerate(result[kind])])
+                self._db.execute('DELETE FROM genes WHERE "检测号"=? AND kind=?', (report_id, kind))
+                symbols = {g for row in result[kind] for g in gene_symbols(row.get(GENE_FIELDS[kind]))}
+                self._db.executemany('INSERT INTO genes VALUES (?, ?, ?)',
+                                     [(report_id, kind, g) for g in sorted(symbols)])
+            name = next((row['姓名'] for row in result.get('rearrangement', []) if row.get('姓名')), None)
+            if name:
+                # Rearrangement rows carry the name too; keep it for reports stored without basic info
+                self._db.execute('UPDATE reports SET "姓名"=? WHERE "检测号"=? AND COALESCE("姓名", \'\')=\'\'',
+                                 (name, report_id))
+        self.stored += 1
+        return report_id
+
+    def delete(self, report_id):
+        with self._db:
+            return self._db.execute('DELETE FROM reports WHERE "检测号"=?', (report_id,)).rowcount
+
+    def find(self, report_id=None, id_card=None, name=None, gene=None):
+        # 检测号 of the reports matching every given filter, in 检测号 order. `gene`
+        # is a symbol (any case) of a 突变基因 or 重排基因, see gene_symbols().
+        where, params = [], []
+        for column, value in (('检测号', report_id), ('身份证号', id_card), ('姓名', name)):
+            if value:
+                where.append(f'"{column}"=?')
+                params.append(value)
+        if gene:
+            where.append('"检测号" IN (SELECT "检测号" FROM genes WHERE "基因"=?)')
+            params.append(gene.strip().upper())
+        sql = 'SELECT "检测号" FROM reports' + (f" WHERE {' AND '.join(where)}" if where else "") + ' ORDER BY "检测号"'
+        return [row[0] for row in self._db.execute(sql, params)]
+
+    def get(self, report_id, kinds=None):
+        # The report as an extraction result (kind -> rows), or None
+        report = self._db.execute(f'SELECT {_names(REPORT_COLUMNS)} FROM reports WHERE "检测号"=?',
+                                  (report_id,)).fetchone()
+        if report is None:
+            return None
+        basic = dict(zip(REPORT_COLUMNS, report))
+        result = {}
+        for kind in kinds or KINDS:
+            if kind == 'basic':
+                result[kind] = [basic]
+                continue
+            table, fields = KIND_TABLES[kind]
+            rows = self._db.execute(f'SELECT {_names(fields)} FROM {table} WHERE "检测号"=? ORDER BY position',
+                                    (report_id,))
+            if kind == 'mutation':
+                result[kind] = [{'检测号': report_id, **dict(zip(fields, row))} for row in rows]
+            else:
+                result[kind] = [{'姓名': basic['姓名'], '检测号': report_id, **dict(zip(fields, row))} for row in rows]
+        return result
+
+    def source(self, report_id):
+        row = self._db.execute('SELECT "源文件" FROM reports WHERE "检测号"=?', (report_id,)).fetchone()
+        return row[0] if row else None
+
+    def iter_results(self, report_ids, kinds=None):
+        # (源文件 or 检测号, result, None) per report, the shape exporters.write_batch takes
+        for report_id in report_ids:
+            result = self.get(report_id, kinds)
+            if result is not None:
+                yield self.source(report_id) or report_id, result, None
+
+    def stats_message(self):
+        message = f"已入库 {self.stored} 份报告"
+        if self.skipped:
+            message += f"，{self.skipped} 份结果中没有检测号（如仅提取突变且无突变行），未入库"
+        return message
+
+
+def store_results(store, results, timer=None):
+    # Passes (path, result, error) tuples through, storing each readable report
+    # as it goes by (timed as the 'store' stage)
+    timer = timer or StageTimer()
+    for path, result, error in results:
+        if error is None:
+            with timer.stage('store'):
+                store.put(result, os.path.basename(path))
+        yield path, result, error
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+# Persistent cache of extractor results, keyed by the PDF's content hash, the
+# report kind, the table backend and the extractor version. The version is a
+# hash of the extraction source files, so any change to the parsing logic
+# invalidates old entries automatically (they are purged on open).
+
+APP_NAME = "PDFToolSuite"
+CACHE_SCHEMA = 1
+
+# Modules whose code determines extractor output
+VERSION_SOURCES = ['extractors.py', 'fields.py', 'table_backends.py', 'templates.py', 'ocr.py']
+
+
+def user_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+        return os.path.join(base, APP_NAME, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), APP_NAME)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, APP_NAME)
+
+
+def extractor_version():
+    h = hashlib.sha256(f"schema {CACHE_SCHEMA}".encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in VERSION_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+EXTRACTOR_VERSION = extractor_version()
+
+
+class ResultCache:
+    # Eviction: entries not used for `max_age_days` are dropped, then the least
+    # recently used ones until the stored rows fit in `max_bytes`.
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024, max_age_days=90):
+        self.path = path or os.path.join(user_cache_dir(), "results.sqlite3")
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Batch pool processes share the file, so wait on locks instead of failing
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS results (
+            digest TEXT NOT NULL, kind TEXT NOT NULL, backend TEXT NOT NULL, version TEXT NOT NULL,
+            rows TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL,
+            PRIMARY KEY (digest, kind, backend, version))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        with self._db:
+            self._db.execute("DELETE FROM results WHERE version != ?", (EXTRACTOR_VERSION,))
+
+    def close(self):
+        self._db.close()
+
+    def get(self, digest, kind, backend):
+        row = self._db.execute(
+            "SELECT rows FROM results WHERE digest=? AND kind=? AND backend=? AND version=?",
+            (digest, kind, self._backend_key(kind, backend), EXTRACTOR_VERSION)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._db:
+            self._db.execute("UPDATE results SET accessed=? WHERE digest=? AND kind=? AND backend=? AND version=?",
+                             (time.time(), digest, kind, self._backend_key(kind, backend), EXTRACTOR_VERSION))
+        return json.loads(row[0])
+
+    def put(self, digest, kind, backend, rows):
+        payload = json.dumps(rows, ensure_ascii=False)
+        now = time.time()
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (digest, kind, self._backend_key(kind, backend), EXTRACTOR_VERSION,
+                              payload, len(payload.encode("utf-8")), now, now))
+        self._puts += 1
+        if self._puts % 50 == 1:
+            self.evict()
+
+    def evict(self):
+        with self._db:
+            cutoff = time.time() - self.max_age_days * 86400
+            self._db.execute("DELETE FROM results WHERE accessed < ?", (cutoff,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                # Walk from least recently used until enough has been freed
+                excess = total - self.max_bytes
+                stale = []
+                for rowid, size in self._db.execute("SELECT rowid, size FROM results ORDER BY accessed"):
+                    stale.append((rowid,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                self._db.executemany("DELETE FROM results WHERE rowid=?", stale)
+
+    def stats_message(self):
+        return f"缓存命中 {self.hits}，未命中 {self.misses}"
+
+    @staticmethod
+    def _backend_key(kind, backend):
+        # Basic info never touches the table backend, so share it across
+        # backends; a "<backend>+<OCR key>" (see extract_all) keeps the OCR part
+        return backend.partition("+")[2] if kind == 'basic' else backend
@@ -0,0 +1,275 @@
+import json
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import Request, urlopen
+from pdf_source import PdfSource
+from table_backends import DEFAULT_TABLE_BACKEND
+from time_budget import DOCUMENT_BUDGET, PAGE_BUDGET
+from timing import StageTimer, write_jsonl
+
+# Local HTTP extraction service, for a LIMS that posts a report and wants its
+# records back as JSON without paying interpreter, PyMuPDF, pdfplumber and
+# pandas startup per report (more than the extraction itself: the sample report
+# takes 0.31s from a cold `python -m cli extract`, 0.13s on a warm worker):
+#
+#   POST /extract?kind=all|basic|mutation|rearrangement[&normalize=1]
+#        body: the PDF bytes (Content-Type application/pdf, or anything)
+#        200 {"basic": [...], "mutation": [...], ..., "cached": false, "seconds": 0.21}
+#            plus "degraded" when pages were read by the fallback engine and
+#            "incomplete" (kinds) when rows of a table continued onto one were lost
+#        400 bad kind / not a PDF, 411 no Content-Length, 413 over max_bytes,
+#        422 the report could not be extracted, 503 queue full (Retry-After)
+#   GET  /health
+#        {"status": "ok", "workers", "in_flight", "queued", "requests",
+#         "latency_ms": {"p50", "p90", "p99", "max"}, ...}
+#
+# Extraction runs on a process pool started with the server, each process
+# importing the parsers up front (warm), with the same per-process result cache
+# and layout templates as a batch (batch.extract_file). The handler threads
+# (one per connection) only read the body and wait for the pool, which gets
+# the bytes as they are (a pdf_source.PdfSource; nothing is written to disk).
+# At most workers + queue_limit requests are admitted at once, before their
+# body is read; the rest are turned away with 503 immediately instead of piling
+# up behind a slow report.
+# A pool process that dies fails its requests with 503 and the pool is
+# started again.
+#
+# Binds 127.0.0.1 by default and has no authentication: put it behind the
+# LIMS host's firewall or a reverse proxy before listening elsewhere.
+#
+#   server = ExtractionServer(("127.0.0.1", 0), workers=2)   # port 0: any free port
+#   threading.Thread(target=server.serve_forever, daemon=True).start()
+#   result = request_extraction(server.url, open("报告.pdf", "rb").read(), "mutation")
+#   server.shutdown(); server.close()
+
+# Repeated as the defaults of `python -m cli serve`, which does not import this module to parse its arguments
+DEFAULT_PORT = 8765
+QUEUE_LIMIT = 16
+MAX_BYTES = 100 * 1024 * 1024
+LATENCY_WINDOW = 1000  # recent successful requests the percentiles are taken over
+REQUEST_KINDS = ['basic', 'rearrangement', 'mutation', 'all']
+
+
+def _warm():
+    # Pool process initializer: pay the imports once per process, not per
+    # request. Ctrl+C is left to the server, which shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import fitz  # noqa: F401
+    import pdfplumber  # noqa: F401
+    import pandas  # noqa: F401
+    import normalize  # noqa: F401
+    import batch  # noqa: F401
+
+
+def extract_request(source, kinds, normalize, options):
+    # Runs in a pool process: (result, cached, stage records) of one posted report.
+    # Imported here (already loaded by _warm) so importing this module, and
+    # `python -m cli serve --help`, stays instant
+    from batch import extract_file
+    result, cached, records = extract_file(source, kinds, *options)
+    if normalize:
+        from normalize import normalize_rows
+        timer = StageTimer()
+        with timer.stage('normalize'):
+            result = {kind: normalize_rows(kind, rows) for kind, rows in result.items()}
+        records = list(records) + timer.records
+    return result, cached, records
+
+
+def percentiles(values, points=(50, 90, 99)):
+    # Nearest-rank percentiles of `values`, in the same unit
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    out = {f"p{p}": ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))] for p in points}
+    out['max'] = ordered[-1]
+    return out
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    quiet = False  # True: no per-request access log on stderr
+
+    # Options after `timings_path` are those of batch.extract_file;
+    # timings_path appends each request's stage records (JSON lines)
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), workers=None, queue_limit=QUEUE_LIMIT,
+                 max_bytes=MAX_BYTES, timings_path=None, table_backend=DEFAULT_TABLE_BACKEND, use_cache=True,
+                 use_templates=True, low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET,
+                 document_budget=DOCUMENT_BUDGET, ocr=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.max_bytes = max_bytes
+        self.timings_path = timings_path
+        self.options = (table_backend, use_cache, False, use_templates, low_memory, memory_limit, page_budget,
+                        document_budget, ocr)
+        self.started = time.time()
+        self._slots = threading.BoundedSemaphore(self.workers + queue_limit)
+        self._lock = threading.Lock()
+        self._restart_lock = threading.Lock()  # held while a new pool warms up, which _lock must not wait for
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'requests': 0, 'ok': 0, 'failed': 0, 'rejected': 0, 'invalid': 0}
+        self.in_flight = 0
+        # Pool first: processes forked after the bind would hold the listening socket open
+        self._pool = self._start_pool()
+        try:
+            super().__init__(address, ExtractionHandler)
+        except OSError:
+            self._pool.shutdown(cancel_futures=True)
+            raise
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _start_pool(self):
+        # Starts every process now (importing the parsers) so the first requests do not wait for it
+        pool = ProcessPoolExecutor(self.workers, initializer=_warm)
+        for future in [pool.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def close(self):
+        self.server_close()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def admit(self):
+        # False when workers + queue_limit requests are already being served
+        if not self._slots.acquire(blocking=False):
+            self.count('rejected')
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def count(self, outcome, seconds=None):
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts[outcome] += 1
+            if seconds is not None:
+                self._latencies.append(seconds)
+
+    def extract(self, data, kinds, normalize, name=None):
+        # (result, cached, stage records) of a posted PDF, extracted on the pool
+        pool = self._pool
+        try:
+            return pool.submit(extract_request, PdfSource(data, name), kinds, normalize, self.options).result()
+        except BrokenProcessPool:
+            with self._restart_lock:
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = self._start_pool()
+            raise
+
+    def health(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            counts = dict(self.counts)
+            in_flight = self.in_flight
+        return {
+            'status': 'ok', 'workers': self.workers, 'queue_limit': self.queue_limit, 'in_flight': in_flight,
+            'queued': max(0, in_flight - self.workers), 'uptime_seconds': round(time.time() - self.started, 1),
+            **counts,
+            'latency_ms': {k: round(v * 1000, 1) for k, v in percentiles(latencies).items()},
+        }
+
+
+class ExtractionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "PDFExtract/1.0"
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self.reply(404, {'error': "Not found: GET /health or POST /extract"})
+        self.reply(200, self.server.health())
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/extract":
+            return self.reply(404, {'error': "Not found: GET /health or POST /extract"})
+        query = parse_qs(url.query)
+        kind = query.get('kind', ['all'])[0]
+        normalize = query.get('normalize', ['0'])[0].lower() in ('1', 'true', 'yes')
+        if kind not in REQUEST_KINDS:
+            return self.invalid(400, f"Unknown kind {kind!r}, expected one of {', '.join(REQUEST_KINDS)}")
+        length = self.headers.get('Content-Length', "")
+        if not length.isdigit():
+            return self.invalid(411, "Content-Length required")
+        length = int(length)
+        if length > self.server.max_bytes:
+            return self.invalid(413, f"Report over {self.server.max_bytes // (1024 * 1024)} MB")
+        if not self.server.admit():
+            # Before the body is read, so a turned-away upload is not buffered first
+            self.close_connection = True
+            return self.reply(503, {'error': "Extraction queue full, retry later"}, {'Retry-After': "1"})
+        try:
+            data = self.rfile.read(length)
+        except BaseException:
+            self.server.release()
+            raise
+        if not data.startswith(b"%PDF-"):
+            self.server.release()
+            return self.invalid(400, "Body is not a PDF")
+
+        start = time.perf_counter()
+        kinds = ['basic', 'rearrangement', 'mutation'] if kind == 'all' else [kind]
+        try:
+            result, cached, records = self.server.extract(data, kinds, normalize, self.headers.get('X-Filename'))
+        except BrokenProcessPool:
+            self.server.count('failed')
+            return self.reply(503, {'error': "Worker process crashed, retry later"}, {'Retry-After': "1"})
+        except Exception as e:
+            self.server.count('failed')
+            return self.reply(422, {'error': str(e) or e.__class__.__name__})
+        finally:
+            self.server.release()
+        seconds = time.perf_counter() - start
+        self.server.count('ok', seconds)
+        if self.server.timings_path:
+            context = {'job': f"serve {kind}", 'input': self.headers.get('X-Filename'), 'output': None}
+            with self.server._lock:
+                write_jsonl(self.server.timings_path, [(context, records)])
+        self.reply(200, {**result, 'cached': cached, 'seconds': round(seconds, 3)})
+
+    def invalid(self, status, message):
+        self.server.count('invalid')
+        # The body may not have been read: close rather than misread it as the next request
+        self.close_connection = True
+        self.reply(status, {'error': message})
+
+    def reply(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def request_extraction(url, data, kind='all', normalize=False, timeout=600):
+    # Client side: POST a PDF's bytes to a running server, returning the decoded
+    # JSON (an HTTPError carries the server's {"error": ...} body)
+    query = urlencode({'kind': kind, 'normalize': int(normalize)})
+    request = Request(f"{url}/extract?{query}", data=data, headers={'Content-Type': "application/pdf"})
+    with urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
@@ -0,0 +1,349 @@
+from bisect import bisect_right
+from collections import namedtuple
+
+# Table-extraction engines behind ParsedReport. A backend returns the tables
+# of one page as lists of rows of cell strings (None for empty cells), which
+# is the shape the header-keyword / find_idx column mapping expects, so the
+# mutation and rearrangement parsers work unchanged on either engine.
+#
+#   extract_tables(index, top=None)  tables on page `index`; when `top` is
+#                                     given only the region below it is searched
+#   find_tables(index, top=None, continued=None)
+#                                    the same tables with their geometry (FoundTable);
+#                                    `continued` is (column boundaries, row pattern) of a
+#                                    table the page may continue without repeating its
+#                                    header, for engines that otherwise only find tables
+#                                    under a header row (the others find it anyway)
+#   release(index)                   drop what the engine keeps of page `index`
+#                                     (ParsedReport's low-memory mode, once its tables are read)
+#   close()
+#   shardable                        worth reading in pool processes (ParsedReport.page_workers)
+
+# rows as above; bbox (x0, top, x1, bottom); columns: sorted cell x-boundaries
+FoundTable = namedtuple('FoundTable', 'rows bbox columns')
+
+
+def column_edges(cells):
+    return sorted({round(cell[i], 2) for cell in cells if cell for i in (0, 2)})
+
+
+class PdfplumberBackend:
+    name = 'pdfplumber'
+    shardable = True
+
+    def __init__(self, report):
+        self.report = report
+        self._pdf = None
+
+    def extract_tables(self, index, top=None):
+        return [t.rows for t in self.find_tables(index, top)]
+
+    def find_tables(self, index, top=None, continued=None):
+        if self._pdf is None:
+            # Imported here: pdfplumber (pdfminer) is slow to load and unused by
+            # text-only runs and the fitz backend
+            import pdfplumber
+            self._pdf = pdfplumber.open(self.report.open_pdf())
+        page = self._pdf.pages[index]
+        if top is not None and top > page.bbox[1]:
+            x0, _, x1, bottom = page.bbox
+            page = page.crop((x0, top, x1, bottom))
+        found = []
+        for table in page.find_tables():
+            rows = table.extract()
+            if rows:
+                found.append(FoundTable(rows, table.bbox, column_edges(table.cells)))
+        return found
+
+    def release(self, index):
+        # pdfplumber keeps every page's parsed layout objects until the PDF is closed
+        if self._pdf is not None:
+            pages = self._pdf.pages
+            if len(pages) < self.report.doc.page_count:
+                # A time budget cut the page list short while it was built (on first use): start over
+                self.close()
+            else:
+                pages[index].close()
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+
+
+class FitzBackend:
+    # PyMuPDF's native table finder; reuses the document already opened for the text pass
+    name = 'fitz'
+    shardable = True
+
+    def __init__(self, report):
+        self.report = report
+
+    def extract_tables(self, index, top=None):
+        return [t.rows for t in self.find_tables(index, top)]
+
+    def find_tables(self, index, top=None, continued=None):
+        page = self.report.doc[index]
+        clip = None
+        if top is not None and top > page.rect.y0:
+            clip = (page.rect.x0, top, page.rect.x1, page.rect.y1)
+        found = page.find_tables(clip=clip)
+        if found is None:
+            # PyMuPDF reports its own errors as a message and no result
+            raise RuntimeError(f"PyMuPDF table detection failed on page {index + 1}")
+        tables = []
+        for table in found.tables:
+            rows = table.extract()
+            if rows:
+                tables.append(FoundTable(rows, tuple(table.bbox), column_edges(table.cells)))
+        return tables
+
+    def release(self, index):
+        # Page objects go with their last reference; the document's object
+        # store is trimmed by memory.release_memory() when over the ceiling
+        pass
+
+    def close(self):
+        pass
+
+
+# Word-geometry engine: tables read from the words PyMuPDF already extracts
+# for the text pass, without a second parse of the PDF and without looking at
+# ruling lines. Our tables are simple column grids under a header row of known
+# words, so:
+#
+#   lines    words whose vertical centres are within LINE_TOLERANCE line
+#            heights of each other, left to right
+#   header   a line with HEADER_MIN cells (words closer than CELL_GAP line
+#            heights) holding HEADER_KEYWORDS, the table locators' and
+#            column-mapping words; cells of lines overlapping it vertically are
+#            joined to it (header cells over two lines)
+#   columns  cut midway between the header cells; a word goes to the column
+#            its centre falls in
+#   rows     the following lines that fit the columns (no word across another
+#            column's header centre) and are closer than TABLE_GAP line
+#            heights; lines that overlap vertically make one row (cells centred
+#            beside a wrapped one), as does a line with nothing in the first
+#            column and the row above it (a wrapped cell). A row that fills less
+#            than half the columns (a heading below the table) or a repeated
+#            header ends the table.
+#   continued a table running on from the previous page without its header
+#            has no header to find: given that table's column boundaries and
+#            row pattern, the rows from the first line that fits those columns
+#            and matches the pattern (running page headers above it do not)
+#            are read the same way, up to the page's first header.
+#
+# A cell's lines are joined with newlines, as pdfplumber returns them. The
+# word and line arithmetic runs on NumPy arrays, imported on first use.
+HEADER_KEYWORDS = ['基因', '转录本', '外显子', '改变', '频率', '断裂点', 'Gene', 'Transcript', 'Exon', 'VAF']
+HEADER_MIN = 2
+LINE_TOLERANCE = 0.5
+CELL_GAP = 1.0
+TABLE_GAP = 2.5
+
+
+def word_lines(words):
+    # (y0, y1) of each line, top to bottom, and each line's words as
+    # (x0, x1, text), left to right. `words` are PyMuPDF "words" tuples.
+    import numpy as np
+    if not words:
+        return np.empty((0, 2)), []
+    box = np.array([w[:4] for w in words], dtype=float)
+    texts = [w[4] for w in words]
+    middle = (box[:, 1] + box[:, 3]) / 2
+    tolerance = LINE_TOLERANCE * float(np.median(box[:, 3] - box[:, 1]))
+    by_middle = np.argsort(middle, kind="stable")
+    line = np.empty(len(box), dtype=int)
+    line[by_middle] = np.concatenate([[0], np.cumsum(np.diff(middle[by_middle]) > tolerance)])
+    order = np.lexsort((box[:, 0], line))
+    line, box = line[order], box[order]
+    starts = np.flatnonzero(np.concatenate([[True], line[1:] != line[:-1]]))
+    extents = np.column_stack([np.minimum.reduceat(box[:, 1], starts), np.maximum.reduceat(box[:, 3], starts)])
+    ends = list(starts[1:]) + [len(box)]
+    spans = box[:, [0, 2]].tolist()
+    ordered = [texts[i] for i in order.tolist()]
+    return extents, [[(*spans[i], ordered[i]) for i in range(start, end)] for start, end in zip(starts, ends)]
+
+
+def _cells(words, height):
+    # The line's words joined into cells wherever they are closer than CELL_GAP
+    cells = []
+    for x0, x1, text in words:
+        if cells and x0 - cells[-1][1] < CELL_GAP * height:
+            cells[-1] = (cells[-1][0], max(cells[-1][1], x1), cells[-1][2] + " " + text)
+        else:
+            cells.append((x0, x1, text))
+    return cells
+
+
+def _is_header(cells, keywords):
+    compact = ["".join(text.split()) for _, _, text in cells]
+    return sum(any(k in cell for k in keywords) for cell in compact) >= HEADER_MIN
+
+
+def _merge_header(lines):
+    # Header cells from the cells of vertically overlapping lines (top to
+    # bottom): cells that overlap horizontally are one, their texts joined by newlines
+    merged = []
+    for x0, x1, text in sorted((cell for cells in lines for cell in cells), key=lambda c: c[0]):
+        if merged and x0 < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], x1)
+            merged[-1][2].append(text)
+        else:
+            merged.append([x0, x1, [text]])
+    return [(x0, x1, "\n".join(texts)) for x0, x1, texts in merged]
+
+
+def _fit(header, bounds, words):
+    # The line's cell texts by column, or None when a word reaches across
+    # another column's header centre (a heading or prose line)
+    cells = [[] for _ in header]
+    for x0, x1, text in words:
+        column = bisect_right(bounds, (x0 + x1) / 2)
+        if any(k != column and x0 < (h0 + h1) / 2 < x1 for k, (h0, h1, _) in enumerate(header)):
+            return None
+        cells[column].append(text)
+    return [" ".join(texts) or None for texts in cells]
+
+
+def _rows(lines, extents, heights, header, bounds, j, bottom, ends):
+    # Rows (cell texts) of the lines from j on that make the table's body, see
+    # above, and the index of its last line (None without rows); ends(cells)
+    # marks a line that starts something else
+    import numpy as np
+    body, cells = [], []
+    while j < len(lines) and extents[j, 0] - bottom < TABLE_GAP * heights[j]:
+        fit = _fit(header, bounds, lines[j])
+        if fit is None or ends(_cells(lines[j], heights[j])):
+            break
+        body.append(j)
+        cells.append(fit)
+        bottom = max(bottom, extents[j, 1])
+        j += 1
+    if not body:
+        return [], None
+    # Row groups: a line starts a new row unless it overlaps the lines above it
+    top, low = extents[body, 0], np.maximum.accumulate(extents[body, 1])
+    group = np.concatenate([[0], np.cumsum(top[1:] >= low[:-1])]).tolist()
+    grouped = [[[] for _ in header] for _ in range(group[-1] + 1)]
+    for fit, number in zip(cells, group):
+        for column, text in enumerate(fit):
+            if text is not None:
+                grouped[number][column].append(text)
+    rows = []
+    used = 0
+    for texts in grouped:
+        row = ["\n".join(parts) or None for parts in texts]
+        if rows and row[0] is None:
+            rows[-1] = [c if n is None else n if c is None else c + "\n" + n for c, n in zip(rows[-1], row)]
+        elif 2 * sum(c is not None for c in row) < len(row):
+            break
+        else:
+            rows.append(row)
+        used += 1
+    if not rows:
+        return [], None
+    return rows, max(b for b, g in zip(body, group) if g < used)
+
+
+def _bbox(lines, extents, first, last):
+    spans = [word for k in range(first, last + 1) for word in lines[k]]
+    return min(w[0] for w in spans), float(extents[first, 0]), max(w[1] for w in spans), float(extents[last, 1])
+
+
+def _continued_table(lines, extents, heights, keywords, continued):
+    # The headerless rows at the top of the page that carry on the previous
+    # page's table (see above), or None
+    columns, pattern = continued
+    header = [(x0, x1, None) for x0, x1 in zip(columns, columns[1:])]
+    bounds = list(columns[1:-1])
+    for k in range(len(lines)):
+        cells = _cells(lines[k], heights[k])
+        if _is_header(cells, keywords):
+            return None
+        if _fit(header, bounds, lines[k]) is None or not pattern.search(" ".join(t for _, _, t in lines[k])):
+            continue
+        rows, last = _rows(lines, extents, heights, header, bounds, k, extents[k, 0],
+                           lambda line: _is_header(line, keywords))
+        if rows:
+            return FoundTable(rows, _bbox(lines, extents, k, last), list(columns)), last
+    return None
+
+
+def word_tables(words, keywords=HEADER_KEYWORDS, continued=None):
+    # FoundTables of a page (or clip) from its words, see above
+    extents, lines = word_lines(words)
+    heights = (extents[:, 1] - extents[:, 0]).tolist()
+    tables = []
+    i = 0
+    if continued is not None:
+        found = _continued_table(lines, extents, heights, keywords, continued)
+        if found is not None:
+            tables.append(found[0])
+            i = found[1] + 1
+    while i < len(lines):
+        header_cells = _cells(lines[i], heights[i])
+        if not _is_header(header_cells, keywords):
+            i += 1
+            continue
+        first = i
+        while first > 0 and extents[first - 1, 1] > extents[i, 0]:
+            first -= 1
+        j = i + 1
+        while j < len(lines) and extents[j, 0] < extents[i, 1]:
+            j += 1
+        header = _merge_header([_cells(lines[k], heights[k]) for k in range(first, j)])
+        bounds = [(left[1] + right[0]) / 2 for left, right in zip(header, header[1:])]
+        rows, last = _rows(lines, extents, heights, header, bounds, j, extents[first:j, 1].max(),
+                           lambda cells: cells == header_cells)
+        if not rows:
+            i += 1
+            continue
+        x0, top, x1, bottom = _bbox(lines, extents, first, last)
+        tables.append(FoundTable([[text for _, _, text in header]] + rows, (x0, top, x1, bottom),
+                                 [x0] + bounds + [x1]))
+        i = last + 1
+    return tables
+
+
+class WordsBackend:
+    # The word-geometry engine above. Reuses the document opened for the text
+    # pass, so a report is parsed once; also the fallback for pages another
+    # engine ran out of time on (time_budget.py). A page takes about a
+    # millisecond: not worth a pool process.
+    name = 'words'
+    shardable = False
+
+    def __init__(self, report):
+        self.report = report
+
+    def extract_tables(self, index, top=None):
+        return [t.rows for t in self.find_tables(index, top)]
+
+    def find_tables(self, index, top=None, continued=None):
+        page = self.report.doc[index]
+        clip = None
+        if top is not None and top > page.rect.y0:
+            clip = (page.rect.x0, top, page.rect.x1, page.rect.y1)
+        return word_tables(page.get_text("words", clip=clip), continued=continued)
+
+    def release(self, index):
+        pass
+
+    def close(self):
+        pass
+
+
+TABLE_BACKENDS = {
+    'pdfplumber': PdfplumberBackend,
+    'fitz': FitzBackend,
+    'words': WordsBackend,
+}
+DEFAULT_TABLE_BACKEND = 'pdfplumber'
+
+
+def get_table_backend(name):
+    try:
+        return TABLE_BACKENDS[name or DEFAULT_TABLE_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown table backend: {name} (choose from {', '.join(TABLE_BACKENDS)})")
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import fitz  # PyMuPDF
+from result_cache import EXTRACTOR_VERSION, user_cache_dir
+
+# Report layout templates. Our reports come from a few fixed templates, so
+# once full table detection has found a template's tables their geometry is
+# remembered and later reports of the same template skip the detection:
+#
+#   fingerprint  page size, rotation and the static text of the first page's
+#                running header (values such as the 检测号 stripped), with the
+#                position of each header block
+#   layout       per fingerprint, table kind and table backend: the header row
+#                of the kind's tables and their column x-boundaries
+#
+# With a known layout, ParsedReport sends only the located pages that carry
+# the learned header text to the table backend; the keyword locator alone
+# also picks up prose pages (interpretation text mentioning 基因 and 改变),
+# which make up most of the table time on long reports. If a page read this
+# way has no table of the kind, or one whose header or columns differ, the
+# layout no longer fits: the kind falls back to full detection on every
+# located page and the layout is learned again. A report with none of the
+# learned header text gets full detection too, so a template whose table
+# header changed is relearned rather than read as empty.
+#
+# The columns are checked, not imposed: explicit column lines run the full
+# height of the search area and would join tables stacked on one page
+# through the gap between them.
+
+HEADER_BAND = 0.12  # top part of the first page read for the fingerprint
+# Digits, Latin letters, spaces and separators: the values in the running header
+_VARIABLE = re.compile(r"[A-Za-z0-9\s.:：/_\-]+")
+COLUMN_TOLERANCE = 2.0  # points two tables' column boundaries may differ by
+
+
+def template_fingerprint(doc):
+    page = doc[0]
+    rect = page.rect
+    band = fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * HEADER_BAND)
+    parts = [f"{rect.width:.0f}x{rect.height:.0f}", str(page.rotation)]
+    for x0, y0, _, _, text, *_ in page.get_text("blocks", clip=band):
+        static = _VARIABLE.sub("", text)
+        if static:
+            # x1 is left out: it moves with the length of the values
+            parts.append(f"{x0:.0f},{y0:.0f}:{static}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _compact(cells):
+    return "".join("".join(str(cell).split()) for cell in cells if cell)
+
+
+def kind_tables(tables, required):
+    # Tables whose first row holds every locator keyword of a kind
+    return [t for t in tables if all(k in _compact(t.rows[0]) for k in required)]
+
+
+def learn_layout(tables, required):
+    # Layout shared by the kind's tables (FoundTable) from full detection;
+    # None when there are none or they disagree
+    tables = kind_tables(tables, required)
+    if not tables:
+        return None
+    header = tables[0].rows[0]
+    columns = list(tables[0].columns)
+    if any(t.rows[0] != header or not same_columns(t.columns, columns) for t in tables[1:]):
+        return None
+    return {'header': header, 'columns': columns}
+
+
+def same_columns(a, b):
+    return len(a) == len(b) and all(abs(x - y) <= COLUMN_TOLERANCE for x, y in zip(a, b))
+
+
+def has_header(page_text, layout):
+    # The learned header text appears on the page (cells compared without whitespace)
+    compact = "".join(page_text.split())
+    return all("".join(str(cell).split()) in compact for cell in layout['header'] if cell)
+
+
+def layout_matches(tables, layout, required):
+    # The tables of a page picked by a layout fit it: the kind's tables are
+    # there and all have the learned header and columns
+    found = kind_tables(tables, required)
+    return bool(found) and all(t.rows[0] == layout['header'] and same_columns(t.columns, layout['columns'])
+                               for t in found)
+
+
+class TemplateStore:
+    # Layouts live next to the result cache and, like it, are dropped when the
+    # extractor version changes. hits / fallbacks / learned count kinds read
+    # with a layout, layouts that no longer fitted and layouts (re)learned.
+    def __init__(self, path=None):
+        self.path = path or os.path.join(user_cache_dir(), "templates.sqlite3")
+        self.hits = 0
+        self.fallbacks = 0
+        self.learned = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Batch pool processes share the file, so wait on locks instead of failing
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""CREATE TABLE IF NOT EXISTS layouts (
+            fingerprint TEXT NOT NULL, kind TEXT NOT NULL, backend TEXT NOT NULL, version TEXT NOT NULL,
+            layout TEXT NOT NULL, updated REAL NOT NULL,
+            PRIMARY KEY (fingerprint, kind, backend, version))""")
+        with self._db:
+            self._db.execute("DELETE FROM layouts WHERE version != ?", (EXTRACTOR_VERSION,))
+
+    def close(self):
+        self._db.close()
+
+    def get(self, fingerprint, kind, backend):
+        row = self._db.execute(
+            "SELECT layout FROM layouts WHERE fingerprint=? AND kind=? AND backend=? AND version=?",
+            (fingerprint, kind, backend, EXTRACTOR_VERSION)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def learn(self, fingerprint, kind, backend, tables, required):
+        # Store (or replace) the layout full detection found, if any
+        layout = learn_layout(tables, required)
+        if layout is None:
+            return None
+        with self._db:
+            if layout != self.get(fingerprint, kind, backend):
+                self._db.execute("INSERT OR REPLACE INTO layouts VALUES (?, ?, ?, ?, ?, ?)",
+                                 (fingerprint, kind, backend, EXTRACTOR_VERSION,
+                                  json.dumps(layout, ensure_ascii=False), time.time()))
+                self.learned += 1
+        return layout
+
+    def forget(self, fingerprint, kind, backend):
+        # A layout that did not fit a report of its template
+        self.fallbacks += 1
+        with self._db:
+            self._db.execute("DELETE FROM layouts WHERE fingerprint=? AND kind=? AND backend=? AND version=?",
+                             (fingerprint, kind, backend, EXTRACTOR_VERSION))
+
+    def stats_message(self):
+        return f"模板命中 {self.hits}，回退 {self.fallbacks}，新学习 {self.learned}"
@@ -62,6 +62,24 @@ QFrame#dropArea {
     border-radius: 10px;
 }
 QLabel#dropLabel { color: #cbd5e1; }
+QLabel#queueTitle {
+    color: #ffffff;
+    font-size: 15px;
+    font-weight: 600;
+}
+QTableWidget#jobTable {
+    background: #0b1220;
+    border: 1px solid #1f2937;
+    border-radius: 8px;
+    color: #e5e7eb;
+    gridline-color: #1f2937;
+}
+QHeaderView::section {
+    background: #1f2937;
+    color: #cbd5e1;
+    border: none;
+    padding: 4px 8px;
+}
 QTextEdit#logArea {
     background: #0b1220;
     border: 1px solid #1f2937;
@@ -0,0 +1,112 @@
+import ctypes
+import threading
+import time
+from contextlib import contextmanager
+
+# Time budgets for one report's extraction, so a pathological page (a
+# malformed or vector-heavy one can keep pdfplumber busy for minutes) cannot
+# hold a GUI job slot or a batch pool process indefinitely:
+#
+#   page      seconds the table engine may spend on one page
+#   document  seconds for the whole report, counted from when it is opened
+#             (text, locate and table passes alike)
+#
+# A page over either budget is abandoned: BudgetExceeded is raised in the
+# extracting thread by a watchdog timer and ParsedReport reads the page again
+# with the word-geometry engine (table_backends.WordsBackend), flagging
+# it as degraded. Once the document budget is spent, the remaining table pages
+# go to the fallback directly. The table engines are pure Python, so the
+# exception arrives within milliseconds; PyMuPDF's text pass is a single C call
+# per page that cannot be interrupted, and only counts against the document budget.
+#
+#   budget = TimeBudget(page=15, document=300)
+#   try:
+#       with budget.page_deadline():
+#           tables = engine.find_tables(index)
+#   except BudgetExceeded:
+#       tables = fallback.find_tables(index)
+
+PAGE_BUDGET = 15.0
+DOCUMENT_BUDGET = 300.0
+
+
+class BudgetExceeded(BaseException):
+    # A BaseException: the table engines' own `except Exception` handlers must not swallow it
+    pass
+
+
+def _raise_in(thread_id, exc):
+    # Schedule `exc` in another thread (None clears a pending one)
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id),
+                                               ctypes.py_object(exc) if exc is not None else None)
+
+
+@contextmanager
+def deadline(seconds):
+    # Raise BudgetExceeded in this thread if the block runs longer than
+    # `seconds` (None: no limit). The exception can also surface as the block
+    # exits, so catch it around the `with`, not inside.
+    if seconds is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    lock = threading.Lock()
+    state = {'active': True, 'fired': False}
+
+    def expire():
+        with lock:
+            if state['active']:
+                state['fired'] = True
+                _raise_in(thread_id, BudgetExceeded)
+
+    timer = threading.Timer(seconds, expire)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield
+    except Exception:
+        if state['fired']:
+            # The block turned the exception into one of its own: it ran out of time all the same
+            raise BudgetExceeded
+        raise
+    finally:
+        with lock:
+            state['active'] = False
+        timer.cancel()
+        if state['fired']:
+            _raise_in(thread_id, None)
+    if state['fired']:
+        # Or swallowed it (PyMuPDF's table finder returns None on any error)
+        raise BudgetExceeded
+
+
+class TimeBudget:
+    # A page or document budget of None (or 0) is no limit
+    def __init__(self, page=PAGE_BUDGET, document=DOCUMENT_BUDGET):
+        self.page = page or None
+        self.document = document or None
+        self.start = time.perf_counter()
+
+    @property
+    def remaining(self):
+        # Seconds left of the document budget, or None
+        if self.document is None:
+            return None
+        return max(0.0, self.document - (time.perf_counter() - self.start))
+
+    @property
+    def exhausted(self):
+        return self.remaining == 0
+
+    def page_deadline(self):
+        limits = [s for s in (self.page, self.remaining) if s is not None]
+        return deadline(min(limits) if limits else None)
+
+    def reason(self):
+        # Why a page was abandoned (called right after it was). Without a page
+        # budget only the document one can have fired
+        if self.document is not None and (self.exhausted or self.page is None):
+            return f"over the {self.document:g}s document time budget"
+        if self.page is not None:
+            return f"over the {self.page:g}s page time budget"
+        return "over its time budget"
@@ -0,0 +1,130 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from memory import current_rss
+
+# Per-stage timing for one job (a report extraction, a conversion, a batch).
+#
+#   with timer.stage('tables', pages=1) as counts:
+#       found = ...
+#       counts['tables'] = len(found)
+#
+# Stages with the same name accumulate into one record (page text is read a
+# page at a time, for instance). Nested stages are timed exclusively: a
+# parent's seconds leave out its children's, so the records add up to the
+# job's total. With track_memory the tracemalloc peak (Python allocations,
+# KB) seen while each stage was open is recorded as well. The process RSS is
+# sampled whenever a stage ends; the highest sample is the stage's 'rss_kb'
+# and the largest of those the job's peak RSS (peak_rss_kb, in the summary).
+#
+# Record: {'stage', 'seconds', 'calls', counts such as 'pages' / 'tables' /
+# 'rows' / 'degraded' when given, 'peak_kb' when tracking memory, 'rss_kb' where RSS can be read}
+
+STAGE_LABELS = {
+    'cache': '缓存', 'open': '打开', 'text': '文本', 'ocr': 'OCR', 'locate': '定位', 'template': '模板', 'tables': '表格',
+    'parse': '解析', 'normalize': '规范化', 'write': '写入', 'store': '入库', 'convert': '转换', 'batch': '批量',
+}
+COUNT_LABELS = {'pages': '页', 'tables': '表', 'rows': '行', 'files': '文件', 'degraded': '页降级', 'processes': '进程'}
+
+
+class StageTimer:
+    def __init__(self, track_memory=False):
+        self.track_memory = track_memory
+        self._records = {}
+        self._stack = []
+        self._started_tracing = False
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, **counts):
+        record = self._record(name)
+        frame = [record, 0.0]  # record, seconds spent in nested stages
+        if self.track_memory:
+            self._fold_peak()
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield counts
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            record['seconds'] += elapsed - frame[1]
+            record['calls'] += 1
+            if self._stack:
+                self._stack[-1][1] += elapsed
+            for key, value in counts.items():
+                record[key] = record.get(key, 0) + value
+            if self.track_memory:
+                self._fold_peak(record)
+            rss = current_rss()
+            if rss is not None:
+                record['rss_kb'] = max(record.get('rss_kb', 0), rss // 1024)
+
+    def merge(self, records):
+        # Add records from another timer (e.g. one per file of a batch)
+        for other in records:
+            record = self._record(other['stage'])
+            for key, value in other.items():
+                if key == 'stage':
+                    continue
+                if key in ('peak_kb', 'rss_kb'):
+                    record[key] = max(record.get(key, 0), value)
+                else:
+                    record[key] = record.get(key, 0) + value
+
+    @property
+    def records(self):
+        return [dict(record) for record in self._records.values()]
+
+    @property
+    def total(self):
+        return sum(record['seconds'] for record in self._records.values())
+
+    @property
+    def peak_rss_kb(self):
+        return max((record['rss_kb'] for record in self._records.values() if 'rss_kb' in record), default=None)
+
+    def summary(self):
+        # One line for the log panel
+        parts = []
+        for record in self._records.values():
+            part = f"{STAGE_LABELS.get(record['stage'], record['stage'])} {record['seconds']:.3f}s"
+            counts = [f"{record[key]}{label}" for key, label in COUNT_LABELS.items() if key in record]
+            if 'peak_kb' in record:
+                counts.append(f"峰值 {record['peak_kb'] / 1024:.1f}MB")
+            if counts:
+                part += f"（{'，'.join(counts)}）"
+            parts.append(part)
+        line = f"阶段耗时：{'｜'.join(parts) or '-'}｜合计 {self.total:.3f}s"
+        if self.peak_rss_kb is not None:
+            line += f"｜RSS 峰值 {self.peak_rss_kb / 1024:.0f}MB"
+        return line
+
+    def _record(self, name):
+        if name not in self._records:
+            self._records[name] = {'stage': name, 'seconds': 0.0, 'calls': 0}
+        return self._records[name]
+
+    def _fold_peak(self, *extra):
+        # The peak counter is reset per stage, so push it into every open stage first
+        peak = tracemalloc.get_traced_memory()[1] // 1024
+        for record in [frame[0] for frame in self._stack] + list(extra):
+            record['peak_kb'] = max(record.get('peak_kb', 0), peak)
+
+
+def write_jsonl(path, entries):
+    # Appends one JSON object per line; `entries` are (context dict, records) pairs
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    with open(path, "a", encoding="utf-8") as f:
+        for context, records in entries:
+            for record in records:
+                f.write(json.dumps({'time': stamp, **context, **record}, ensure_ascii=False) + "\n")
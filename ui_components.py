@@ -1,16 +1,45 @@
 import os
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QPushButton, QLabel,
-                               QFileDialog, QMessageBox, QProgressBar,
-                               QFrame, QHBoxLayout, QTextEdit, QComboBox)
-from PySide6.QtCore import Qt
+                               QFileDialog, QProgressBar,
+                               QFrame, QHBoxLayout, QTextEdit, QComboBox, QSpinBox, QCheckBox,
+                               QToolButton, QMenu, QTableWidget, QTableWidgetItem, QHeaderView)
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import QStyle
-from workers import PdfToWordWorker, WordToPdfWorker, PdfToExcelWorker, PdfToRearrangementWorker, PdfToMutationWorker
+from workers import (PdfToWordWorker, WordToPdfWorker, PdfToExcelWorker, PdfToRearrangementWorker,
+                     PdfToMutationWorker, PdfToReportWorker, BatchExtractWorker, BatchConvertWorker)
+from batch import collect_pdfs
+from extractors import KINDS
+from table_backends import TABLE_BACKENDS
+from office_backends import WORD_BACKEND_CHOICES, DEFAULT_POOL_SIZE
+from record_store import default_store_path
+from jobs import QUEUED, RUNNING, CANCELLING
+
+# Report extraction modes, the extractor kinds each one runs and its default output name
+EXTRACT_MODE_KINDS = {
+    'pdf2excel': ['basic'],
+    'pdf2rearrangement': ['rearrangement'],
+    'pdf2mutation': ['mutation'],
+    'pdf2all': KINDS,
+}
+EXTRACT_MODE_NAMES = {'pdf2excel': "基础信息", 'pdf2rearrangement': "重排结果", 'pdf2mutation': "突变数据", 'pdf2all': "全部数据"}
+# Save dialog filters for extraction output, one per exporters.OUTPUT_FORMATS entry
+EXTRACT_OUTPUT_FILTERS = {
+    "Excel Files (*.xlsx)": ".xlsx",
+    "CSV Files (*.csv)": ".csv",
+    "JSON Lines (*.jsonl)": ".jsonl",
+    "Parquet Files (*.parquet)": ".parquet",
+}
+
+
+def source_extensions(mode):
+    return (".doc", ".docx") if mode == "word2pdf" else (".pdf",)
 
 class FileDropArea(QFrame):
-    def __init__(self, mode, on_file_selected):
+    def __init__(self, mode, on_file_selected, on_batch_selected=None):
         super().__init__()
         self.mode = mode
         self.on_file_selected = on_file_selected
+        self.on_batch_selected = on_batch_selected
         self.setObjectName("dropArea")
         self.setAcceptDrops(True)
         layout = QVBoxLayout()
@@ -22,31 +51,43 @@ class FileDropArea(QFrame):
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
-            url = event.mimeData().urls()[0]
-            path = url.toLocalFile()
-            if self._is_valid_file(path):
+            paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            if self._batch_paths(paths) or self._is_valid_file(paths[0]):
                 event.acceptProposedAction()
                 return
         event.ignore()
 
     def dropEvent(self, event):
         if event.mimeData().hasUrls():
-            path = event.mimeData().urls()[0].toLocalFile()
-            if self._is_valid_file(path):
-                self.on_file_selected(path)
+            paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            batch = self._batch_paths(paths)
+            if batch:
+                self.on_batch_selected(batch)
+            elif self._is_valid_file(paths[0]):
+                self.on_file_selected(paths[0])
+
+    def _batch_paths(self, paths):
+        # Several files or a folder dropped on the tab start a batch
+        if not self.on_batch_selected:
+            return []
+        if len(paths) == 1 and not os.path.isdir(paths[0]):
+            return []
+        return collect_pdfs(paths, source_extensions(self.mode))
 
     def _is_valid_file(self, path):
         ext = os.path.splitext(path)[1].lower()
-        if self.mode in ["pdf2word", "pdf2excel", "pdf2rearrangement", "pdf2mutation"]:
-            return ext == ".pdf"
-        return ext in [".doc", ".docx"]
+        return ext in source_extensions(self.mode)
 
 class ConversionTab(QWidget):
-    def __init__(self, mode="pdf2word"):
+    # Builds jobs for one mode and hands them to the shared scheduler; the
+    # buttons stay enabled so more files can be queued while jobs run
+    def __init__(self, mode, scheduler):
         super().__init__()
         self.mode = mode
+        self.scheduler = scheduler
         self.layout = QVBoxLayout()
         self.file_path = ""
+        self.batch_paths = []
         
         # File Selection
         header = QLabel("模式")
@@ -61,11 +102,78 @@ class ConversionTab(QWidget):
         self.file_label.setObjectName("filePathLabel")
         self.file_label.setWordWrap(True)
 
-        self.drop_area = FileDropArea(self.mode, self._on_file_selected)
+        self.drop_area = FileDropArea(self.mode, self._on_file_selected, self._on_batch_selected)
 
         self.select_btn = QPushButton("浏览…")
         self.select_btn.setIcon(self.style().standardIcon(QStyle.SP_DialogOpenButton))
         self.select_btn.clicked.connect(self.select_file)
+
+        # Batch mode: pick a folder of files and a process count (files at
+        # once; for a single PDF to Word conversion or a single report's
+        # tables, processes parsing its pages)
+        self.folder_btn = QPushButton("文件夹…")
+        self.folder_btn.setIcon(self.style().standardIcon(QStyle.SP_DirOpenIcon))
+        self.folder_btn.clicked.connect(self.select_folder)
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.workers_spin.setValue(max(1, os.cpu_count() or 1))
+        self.workers_spin.setPrefix("进程数 ")
+        if self.mode == "pdf2word":
+            self.workers_spin.setToolTip("单个文件：并行解析页面的进程数；批量：同时转换的文件数")
+        elif self.mode == "word2pdf":
+            # Each LibreOffice process holds a few hundred MB, so keep the pool small by default
+            self.workers_spin.setValue(min(DEFAULT_POOL_SIZE, self.workers_spin.maximum()))
+            self.workers_spin.setToolTip("常驻 LibreOffice 进程数（同时转换的文件数）")
+        elif self.mode in EXTRACT_MODE_KINDS:
+            self.workers_spin.setToolTip("单个文件：并行识别表格页的进程数（长报告）；批量：同时处理的文件数")
+        # Table engine for the mutation / rearrangement extractors,
+        # conversion engine for Word to PDF
+        self.backend_combo = QComboBox()
+        if self.mode == "word2pdf":
+            self.backend_combo.addItems(WORD_BACKEND_CHOICES)
+            self.backend_combo.setToolTip("转换引擎（auto：优先 LibreOffice，否则 Microsoft Word）")
+        else:
+            self.backend_combo.addItems(list(TABLE_BACKENDS))
+            self.backend_combo.setToolTip("表格引擎")
+        # Reuse results of previously processed (identical) PDFs and the
+        # table layouts learned for each report template
+        self.cache_check = QCheckBox("缓存")
+        self.cache_check.setChecked(True)
+        self.cache_check.setToolTip("复用已处理文件的结果，以及已识别报告模板的表格布局")
+        # Memory ceiling for table extraction (0: none); when set, pages are
+        # released as they are read (extractors.ParsedReport's low-memory mode)
+        self.memory_spin = QSpinBox()
+        self.memory_spin.setRange(0, 65536)
+        self.memory_spin.setSingleStep(256)
+        self.memory_spin.setPrefix("内存上限 ")
+        self.memory_spin.setSuffix(" MB")
+        self.memory_spin.setSpecialValueText("内存不限")
+        self.memory_spin.setToolTip("超大 PDF：逐页释放解析数据；进程内存超过上限时该文件失败")
+        # Also upsert the results into the record store (record_store.py)
+        self.store_check = QCheckBox("入库")
+        self.store_check.setToolTip(f"同时写入记录库，可用 python -m cli query 查询与导出\n{default_store_path()}")
+        # Recognize the text of scanned pages (ocr.py; needs Tesseract)
+        self.ocr_check = QCheckBox("OCR")
+        self.ocr_check.setToolTip("无文本层的扫描页用 Tesseract 识别文字（需安装 Tesseract 及 chi_sim 语言包）；"
+                                  "扫描页中的表格仍无法识别")
+        # Add typed columns to mutation / rearrangement sheets (normalize.py)
+        self.normalize_check = QCheckBox("规范化")
+        self.normalize_check.setToolTip("追加规范化列：突变频率、外显子编号、断裂点坐标为数值，"
+                                        "HGVS 拆分为位置与改变，基因符号与融合伙伴分列")
+        # Add rows to an existing output file instead of replacing it
+        self.append_check = QCheckBox("追加")
+        self.append_check.setToolTip("追加到已有的输出文件（列需一致）")
+        # Diagnostics: stage timings always go to the log; these add exports
+        self.diag_btn = QToolButton()
+        self.diag_btn.setText("诊断")
+        self.diag_btn.setPopupMode(QToolButton.InstantPopup)
+        diag_menu = QMenu(self.diag_btn)
+        self.timings_action = diag_menu.addAction("导出计时记录（JSONL）")
+        self.memory_action = diag_menu.addAction("记录内存峰值")
+        self.profile_action = diag_menu.addAction("cProfile 性能剖析")
+        for action in (self.timings_action, self.memory_action, self.profile_action):
+            action.setCheckable(True)
+        self.diag_btn.setMenu(diag_menu)
         
         # Convert Button
         btn_text = "Convert"
@@ -84,13 +192,22 @@ class ConversionTab(QWidget):
         self.convert_btn.clicked.connect(self.convert_file)
         self.convert_btn.setEnabled(False)
         
-        # Progress Bar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 0)
-        self.progress_bar.hide()
-        
         footer = QHBoxLayout()
         footer.addWidget(self.select_btn)
+        footer.addWidget(self.folder_btn)
+        footer.addWidget(self.workers_spin)
+        if self.mode == "word2pdf":
+            footer.addWidget(self.backend_combo)
+        if self.mode in EXTRACT_MODE_KINDS:
+            if self.mode != 'pdf2excel':
+                footer.addWidget(self.backend_combo)
+                footer.addWidget(self.memory_spin)
+                footer.addWidget(self.normalize_check)
+            footer.addWidget(self.cache_check)
+            footer.addWidget(self.ocr_check)
+            footer.addWidget(self.append_check)
+            footer.addWidget(self.store_check)
+        footer.addWidget(self.diag_btn)
         footer.addStretch(1)
         footer.addWidget(self.convert_btn)
 
@@ -101,7 +218,6 @@ class ConversionTab(QWidget):
         card_layout.addWidget(self.file_label)
         card_layout.addWidget(self.drop_area)
         card_layout.addLayout(footer)
-        card_layout.addWidget(self.progress_bar)
         card.setLayout(card_layout)
 
         self.layout.addWidget(header)
@@ -109,26 +225,47 @@ class ConversionTab(QWidget):
         self.layout.addWidget(self.log_area)
         self.layout.addStretch()
         self.setLayout(self.layout)
-        
-        self.worker = None
 
     def select_file(self):
-        if self.mode in ["pdf2word", "pdf2excel", "pdf2rearrangement", "pdf2mutation"]:
+        if self.mode != "word2pdf":
             file_filter = "PDF Files (*.pdf)"
         else:
             file_filter = "Word Files (*.docx *.doc)"
             
-        fname, _ = QFileDialog.getOpenFileName(self, "Select File", "", file_filter)
-        if fname:
-            self._on_file_selected(fname)
+        # Several files selected at once become one batch job
+        fnames, _ = QFileDialog.getOpenFileNames(self, "Select Files", "", file_filter)
+        if len(fnames) == 1:
+            self._on_file_selected(fnames[0])
+        elif fnames:
+            self._on_batch_selected(collect_pdfs(fnames, source_extensions(self.mode)))
+
+    def select_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder")
+        if folder:
+            self._on_batch_selected(collect_pdfs(folder, source_extensions(self.mode)))
 
     def _on_file_selected(self, path):
         self.file_path = path
+        self.batch_paths = []
         self.file_label.setText(path)
         self.convert_btn.setEnabled(True)
         self.log_area.append(f"已选择文件: {os.path.basename(path)}")
 
+    def _on_batch_selected(self, paths):
+        kind = "Word 文件" if self.mode == "word2pdf" else "PDF"
+        if not paths:
+            self.log_area.append(f"未找到 {kind}")
+            return
+        self.batch_paths = paths
+        self.file_path = ""
+        self.file_label.setText(f"已选择 {len(paths)} 个 {kind}（批量）")
+        self.convert_btn.setEnabled(True)
+        self.log_area.append(f"已选择 {len(paths)} 个文件: {os.path.dirname(paths[0])}")
+
     def convert_file(self):
+        if self.batch_paths:
+            self.convert_batch()
+            return
         if not self.file_path:
             return
             
@@ -154,44 +291,92 @@ class ConversionTab(QWidget):
             source_dir = os.path.dirname(self.file_path)
             default_out = os.path.join(source_dir, "突变数据.xlsx")
             file_filter = "Excel Files (*.xlsx)"
-            
-        out_fname, _ = QFileDialog.getSaveFileName(self, "Save Result", default_out, file_filter)
+        elif self.mode == "pdf2all":
+            # All three sheets in one workbook: "全部数据.xlsx"
+            source_dir = os.path.dirname(self.file_path)
+            default_out = os.path.join(source_dir, "全部数据.xlsx")
+            file_filter = "Excel Files (*.xlsx)"
+
+        if self.mode in EXTRACT_MODE_KINDS:
+            out_fname = self._extract_output(default_out)
+        else:
+            out_fname, _ = QFileDialog.getSaveFileName(self, "Save Result", default_out, file_filter)
         
         if not out_fname:
             return
 
-        self.progress_bar.show()
-        self.convert_btn.setEnabled(False)
-        self.select_btn.setEnabled(False)
-        
         if self.mode == "pdf2word":
-            self.worker = PdfToWordWorker(self.file_path, out_fname)
+            worker = PdfToWordWorker(self.file_path, out_fname, self.workers_spin.value())
         elif self.mode == "word2pdf":
-            self.worker = WordToPdfWorker(self.file_path, out_fname)
+            worker = WordToPdfWorker(self.file_path, out_fname, self.backend_combo.currentText())
         elif self.mode == "pdf2excel":
-            self.worker = PdfToExcelWorker(self.file_path, out_fname)
+            worker = PdfToExcelWorker(self.file_path, out_fname, self.cache_check.isChecked(),
+                                      self.append_check.isChecked(), self.store_check.isChecked(),
+                                      self.ocr_check.isChecked())
         elif self.mode == "pdf2rearrangement":
-            self.worker = PdfToRearrangementWorker(self.file_path, out_fname)
+            worker = PdfToRearrangementWorker(self.file_path, out_fname, self.backend_combo.currentText(),
+                                              self.cache_check.isChecked(), self.append_check.isChecked(),
+                                              self.memory_spin.value() or None, self.store_check.isChecked(),
+                                              self.normalize_check.isChecked(), self.ocr_check.isChecked(),
+                                              self.workers_spin.value())
         elif self.mode == "pdf2mutation":
-            self.worker = PdfToMutationWorker(self.file_path, out_fname)
-            
-        self.worker.finished.connect(self.on_finished)
-        self.worker.error.connect(self.on_error)
-        self.worker.start()
+            worker = PdfToMutationWorker(self.file_path, out_fname, self.backend_combo.currentText(),
+                                         self.cache_check.isChecked(), self.append_check.isChecked(),
+                                         self.memory_spin.value() or None, self.store_check.isChecked(),
+                                         self.normalize_check.isChecked(), self.ocr_check.isChecked(),
+                                         self.workers_spin.value())
+        elif self.mode == "pdf2all":
+            worker = PdfToReportWorker(self.file_path, out_fname, self.backend_combo.currentText(),
+                                       self.cache_check.isChecked(), self.append_check.isChecked(),
+                                       self.memory_spin.value() or None, self.store_check.isChecked(),
+                                       self.normalize_check.isChecked(), self.ocr_check.isChecked(),
+                                       self.workers_spin.value())
 
-    def on_finished(self, msg):
-        self.progress_bar.hide()
-        self.convert_btn.setEnabled(True)
-        self.select_btn.setEnabled(True)
-        QMessageBox.information(self, "Success", msg)
-        self.log_area.append(msg)
+        self._submit(worker, os.path.basename(self.file_path))
 
-    def on_error(self, err):
-        self.progress_bar.hide()
-        self.convert_btn.setEnabled(True)
-        self.select_btn.setEnabled(True)
-        QMessageBox.critical(self, "Error", f"Conversion failed:\n{err}")
-        self.log_area.append(str(err))
+    def convert_batch(self):
+        source_dir = os.path.dirname(self.batch_paths[0])
+        if self.mode in EXTRACT_MODE_KINDS:
+            default_out = os.path.join(source_dir, EXTRACT_MODE_NAMES[self.mode] + "_批量.xlsx")
+            out_fname = self._extract_output(default_out)
+        else:
+            # Converted files keep their names, in a folder of the user's choice
+            out_fname = QFileDialog.getExistingDirectory(self, "Select Output Folder", source_dir)
+        if not out_fname:
+            return
+
+        if self.mode in EXTRACT_MODE_KINDS:
+            worker = BatchExtractWorker(self.batch_paths, out_fname, EXTRACT_MODE_KINDS[self.mode],
+                                        self.workers_spin.value(), self.backend_combo.currentText(),
+                                        self.cache_check.isChecked(), self.append_check.isChecked(),
+                                        self.memory_spin.value() or None, self.store_check.isChecked(),
+                                        self.normalize_check.isChecked(), self.ocr_check.isChecked())
+        else:
+            worker = BatchConvertWorker(self.batch_paths, self.mode, out_fname, self.workers_spin.value(),
+                                        self.backend_combo.currentText())
+        self._submit(worker, f"{len(self.batch_paths)} 个文件（批量）")
+
+    def _extract_output(self, default_out):
+        # Output file for an extraction; the format follows the chosen filter
+        # when the name has no extension of its own. Appending to an existing
+        # file is not an overwrite, so Qt's confirmation is skipped then.
+        options = QFileDialog.DontConfirmOverwrite if self.append_check.isChecked() else QFileDialog.Options()
+        out_fname, selected = QFileDialog.getSaveFileName(self, "Save Result", default_out,
+                                                          ";;".join(EXTRACT_OUTPUT_FILTERS), "", options)
+        if out_fname and not os.path.splitext(out_fname)[1]:
+            out_fname += EXTRACT_OUTPUT_FILTERS.get(selected, ".xlsx")
+        return out_fname
+
+    def _submit(self, worker, name):
+        # Progress, status and cancellation live in the queue view; this tab's
+        # log gets the job's messages for as long as the tab exists (Qt drops
+        # the connections when a mode switch deletes the tab)
+        worker.set_diagnostics(self.timings_action.isChecked(), self.profile_action.isChecked(),
+                               self.memory_action.isChecked())
+        for signal in (worker.log, worker.finished, worker.error, worker.cancelled):
+            signal.connect(self.log_area.append)
+        self.scheduler.submit(worker, f"{self._mode_title()}｜{name}")
+        self.log_area.append(f"已加入队列: {name}")
 
     def _mode_title(self):
         if self.mode == 'pdf2word':
@@ -204,12 +389,15 @@ class ConversionTab(QWidget):
             return "PDF 转 Excel（重排结果）"
         if self.mode == 'pdf2mutation':
             return "PDF 转 Excel（突变数据）"
+        if self.mode == 'pdf2all':
+            return "PDF 转 Excel（全部数据）"
         return "模式"
 
 class CombinedConversionTab(QWidget):
-    def __init__(self, group):
+    def __init__(self, group, scheduler):
         super().__init__()
         self.group = group
+        self.scheduler = scheduler
         self.layout = QVBoxLayout()
         self.selector = QComboBox()
         self.selector.setEditable(False)
@@ -218,7 +406,7 @@ class CombinedConversionTab(QWidget):
         if group == 'doc':
             self.selector.addItems(["PDF 转 Word", "Word 转 PDF"]) 
         else:
-            self.selector.addItems(["基础信息", "重排结果", "突变数据"]) 
+            self.selector.addItems(["基础信息", "重排结果", "突变数据", "全部提取"]) 
 
         self.selector.currentIndexChanged.connect(self._on_mode_change)
         self.layout.addWidget(self.selector)
@@ -233,6 +421,104 @@ class CombinedConversionTab(QWidget):
         if self.group == 'doc':
             mode = 'pdf2word' if idx == 0 else 'word2pdf'
         else:
-            mode = ['pdf2excel', 'pdf2rearrangement', 'pdf2mutation'][idx]
-        self.inner = ConversionTab(mode)
+            mode = ['pdf2excel', 'pdf2rearrangement', 'pdf2mutation', 'pdf2all'][idx]
+        self.inner = ConversionTab(mode, self.scheduler)
         self.layout.addWidget(self.inner)
+
+class JobQueueView(QFrame):
+    # Every submitted job with its status, progress and elapsed time; the
+    # button on each row cancels it
+    COLUMNS = ["任务", "状态", "进度", "耗时", ""]
+
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+        self.setObjectName("card")
+        self.rows = {}  # job id -> row
+
+        title = QLabel("任务队列")
+        title.setObjectName("queueTitle")
+        self.running_spin = QSpinBox()
+        self.running_spin.setRange(1, max(1, os.cpu_count() or 1))
+        self.running_spin.setValue(min(scheduler.max_running, self.running_spin.maximum()))
+        self.running_spin.setPrefix("同时运行 ")
+        self.running_spin.valueChanged.connect(scheduler.set_max_running)
+        scheduler.set_max_running(self.running_spin.value())
+        clear_btn = QPushButton("清除已结束")
+        clear_btn.clicked.connect(scheduler.clear_ended)
+        cancel_all_btn = QPushButton("全部取消")
+        cancel_all_btn.clicked.connect(scheduler.cancel_all)
+
+        header = QHBoxLayout()
+        header.addWidget(title)
+        header.addStretch(1)
+        header.addWidget(self.running_spin)
+        header.addWidget(clear_btn)
+        header.addWidget(cancel_all_btn)
+
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setObjectName("jobTable")
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().hide()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionMode(QTableWidget.NoSelection)
+        head = self.table.horizontalHeader()
+        head.setSectionResizeMode(0, QHeaderView.Stretch)
+        for col in range(1, len(self.COLUMNS)):
+            head.setSectionResizeMode(col, QHeaderView.ResizeToContents)
+
+        layout = QVBoxLayout()
+        layout.addLayout(header)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+        scheduler.job_added.connect(self._add_row)
+        scheduler.job_changed.connect(self._update_row)
+        scheduler.job_removed.connect(self._remove_row)
+        # Elapsed time of running jobs
+        self.clock = QTimer(self)
+        self.clock.timeout.connect(self._tick)
+        self.clock.start(500)
+
+    def _add_row(self, job_id):
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        self.rows[job_id] = row
+        self.table.setItem(row, 0, QTableWidgetItem(self.scheduler.jobs[job_id].title))
+        self.table.setItem(row, 1, QTableWidgetItem())
+        bar = QProgressBar()
+        bar.setRange(0, 100)
+        self.table.setCellWidget(row, 2, bar)
+        self.table.setItem(row, 3, QTableWidgetItem())
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(lambda _=False, job_id=job_id: self.scheduler.cancel(job_id))
+        self.table.setCellWidget(row, 4, cancel_btn)
+        self._update_row(job_id)
+
+    def _update_row(self, job_id):
+        job = self.scheduler.jobs.get(job_id)
+        row = self.rows.get(job_id)
+        if job is None or row is None:
+            return
+        status = self.table.item(row, 1)
+        status.setText(job.status)
+        status.setToolTip(job.message)
+        bar = self.table.cellWidget(row, 2)
+        if job.status in (RUNNING, CANCELLING) and job.progress is None:
+            bar.setRange(0, 0)  # no progress reported: busy indicator
+        else:
+            bar.setRange(0, 100)
+            bar.setValue(job.progress or 0)
+        self.table.item(row, 3).setText(f"{job.elapsed:.1f}s" if job.started is not None else "")
+        self.table.cellWidget(row, 4).setEnabled(job.status in (QUEUED, RUNNING))
+
+    def _remove_row(self, job_id):
+        row = self.rows.pop(job_id, None)
+        if row is None:
+            return
+        self.table.removeRow(row)
+        self.rows = {jid: r - 1 if r > row else r for jid, r in self.rows.items()}
+
+    def _tick(self):
+        for job in self.scheduler.running():
+            self._update_row(job.id)
@@ -0,0 +1,299 @@
+import os
+import signal
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from batch import SUBMIT_AHEAD, extract_file
+from exporters import write_batch
+from extractors import KINDS
+from record_store import store_results, user_data_dir
+from table_backends import DEFAULT_TABLE_BACKEND
+from time_budget import DOCUMENT_BUDGET, PAGE_BUDGET
+from timing import StageTimer, write_jsonl
+
+# Watch-folder service: reports dropped into one or more folders during the
+# day are extracted as they arrive and appended to the configured outputs
+# (any exporters format, and/or the record store), without anyone opening the GUI.
+#
+#   scan     the folders are listed every `interval` seconds (os.scandir,
+#            no extra dependency; network shares have no change notifications)
+#   settle   a PDF is taken once its size and mtime have not changed for
+#            `settle` seconds and it ends with %%EOF, so a file still being
+#            copied is left alone. One that never gets its %%EOF is taken
+#            after INCOMPLETE_GRACE seconds and fails like any unreadable PDF.
+#   pool     at most `workers` processes, with `workers * SUBMIT_AHEAD` files
+#            in flight. Backpressure: files beyond that wait as paths in the
+#            ready queue (and those not yet listed, on disk), so a burst of
+#            several hundred files costs no more processes or memory than a
+#            steady trickle, only time.
+#   flush    finished files are written every `flush_files` files or
+#            `flush_seconds` seconds, whichever comes first, then recorded in
+#            the ledger. An output that cannot be written (a workbook open in
+#            Excel, a full disk) keeps its files for the next flush, every
+#            `flush_seconds` seconds, while the other outputs carry on; a
+#            file is recorded only once every output has its rows
+#   ledger   SQLite, one row per file: path, size, mtime, status (done /
+#            failed), error. A file is skipped while its size and mtime match
+#            its row, so a restart resumes where the last run stopped and a
+#            replaced file is extracted again. Files are recorded only after
+#            their rows are written, so a crash between the two repeats those
+#            files (at most one flush); the record store's upserts absorb that.
+#
+# Failed files are recorded too (in the outputs' 失败文件 table and the ledger)
+# and not retried until they change. A pool process that dies takes its
+# in-flight files down with it: they are recorded as failed and the pool is
+# restarted.
+#
+#   watcher = FolderWatcher(['/mnt/drop'], outputs=['突变数据.csv'], kinds=['mutation'], workers=4)
+#   watcher.run()          # until watcher.stop() (e.g. from a signal handler)
+#   watcher.run(once=True) # what is there now, then return
+
+LEDGER_NAME = "watch-ledger.sqlite3"
+INCOMPLETE_GRACE = 60.0
+EOF_TAIL = 2048  # bytes at the end of a PDF searched for %%EOF
+
+
+def default_ledger_path():
+    return os.path.join(user_data_dir(), LEDGER_NAME)
+
+
+def _ignore_interrupt():
+    # Pool processes leave Ctrl+C to the watcher, which lets their files finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _complete(path):
+    # A finished PDF ends with %%EOF (give or take trailing whitespace)
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - EOF_TAIL))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+class Ledger:
+    def __init__(self, path=None):
+        self.path = path or default_ledger_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+                status TEXT NOT NULL, error TEXT, processed REAL NOT NULL)""")
+        # path -> (size, mtime_ns), so a scan does not query the database per file
+        self.known = {path: (size, mtime) for path, size, mtime in
+                      self._db.execute("SELECT path, size, mtime_ns FROM files")}
+
+    def close(self):
+        self._db.close()
+
+    def seen(self, path, size, mtime_ns):
+        return self.known.get(path) == (size, mtime_ns)
+
+    def record(self, entries):
+        # (path, size, mtime_ns, error or None) per file
+        now = time.time()
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(path, size, mtime, 'failed' if error else 'done', error, now)
+                                  for path, size, mtime, error in entries])
+        for path, size, mtime, _ in entries:
+            self.known[path] = (size, mtime)
+
+    def counts(self):
+        return dict(self._db.execute("SELECT status, COUNT(*) FROM files GROUP BY status"))
+
+
+class FolderWatcher:
+    # Options after `timer` are those of batch.extract_file. on_event(kind,
+    # path, detail) reports 'queued' / 'done' / 'failed' (detail: the error) /
+    # 'flushed' (path is then the output, detail the number of files) /
+    # 'write_failed' (path the output or record store, detail the error);
+    # timings_path appends the per-file stage records at every flush, `timer`
+    # times the writing.
+    def __init__(self, folders, outputs=(), kinds=None, workers=None, interval=2.0, settle=5.0, flush_files=50,
+                 flush_seconds=10.0, ledger=None, store=None, normalize=False, on_event=None, timings_path=None,
+                 timer=None, table_backend=DEFAULT_TABLE_BACKEND, use_cache=False, track_memory=False,
+                 use_templates=False, low_memory=False, memory_limit=None, page_budget=PAGE_BUDGET,
+                 document_budget=DOCUMENT_BUDGET, ocr=None):
+        self.folders = list(folders)
+        self.outputs = list(outputs)
+        self.kinds = list(kinds or KINDS)
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.settle = settle
+        self.flush_files = flush_files
+        self.flush_seconds = flush_seconds
+        self.ledger = ledger if ledger is not None else Ledger()
+        self.store = store
+        self.normalize = normalize
+        self.on_event = on_event or (lambda kind, path, detail: None)
+        self.timings_path = timings_path
+        self.options = (table_backend, use_cache, track_memory, use_templates, low_memory, memory_limit, page_budget,
+                        document_budget, ocr)
+        self.timer = timer or StageTimer()
+        self._stop = threading.Event()
+        self._candidates = {}  # path -> (size, mtime_ns, unchanged since)
+        self._queued = set()  # paths in the ready queue or in flight
+        self._ready = deque()  # (path, size, mtime_ns)
+        self._finished = []  # ((path, result, error), (size, mtime_ns), stage records) not flushed yet
+        self._written = {}  # output (or the store) -> leading files of _finished it already has
+        self._write_failed = False  # last flush left files unwritten: retry after flush_seconds only
+        self._last_flush = time.monotonic()
+
+    def stop(self):
+        # Safe from any thread or a signal handler: files in flight finish and are flushed
+        self._stop.set()
+
+    def run(self, once=False):
+        # Watch until stop(); with once=True, return when every file present
+        # (and settled) has been extracted
+        pool = self._pool()
+        inflight = {}  # future -> (path, size, mtime_ns)
+        next_scan = 0.0
+        try:
+            while True:
+                now = time.monotonic()
+                if not self._stop.is_set() and now >= next_scan:
+                    self.scan(now)
+                    next_scan = now + self.interval
+                while not self._stop.is_set() and self._ready and len(inflight) < self.workers * SUBMIT_AHEAD:
+                    path, size, mtime = self._ready.popleft()
+                    inflight[pool.submit(extract_file, path, self.kinds, *self.options)] = (path, size, mtime)
+                if not inflight:
+                    if self._stop.is_set() or (once and not self._ready and not self._candidates):
+                        break
+                    # The flush deadline only counts with files waiting for it: idle, sleep until the next scan
+                    wake = min(next_scan, self._last_flush + self.flush_seconds) if self._finished else next_scan
+                    self._stop.wait(max(0.0, wake - now))
+                else:
+                    done, _ = wait(inflight, timeout=max(0.05, next_scan - time.monotonic()),
+                                   return_when=FIRST_COMPLETED)
+                    broken = False
+                    for future in done:
+                        path, size, mtime = inflight.pop(future)
+                        broken |= self._collect(future, path, size, mtime)
+                    if broken:
+                        pool = self._restart(pool, inflight)
+                if (len(self._finished) >= self.flush_files and not self._write_failed) or (
+                        self._finished and time.monotonic() - self._last_flush >= self.flush_seconds):
+                    self.flush()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.flush()
+
+    def scan(self, now=None):
+        # List the folders, moving settled new or changed PDFs to the ready queue
+        now = time.monotonic() if now is None else now
+        present = set()
+        for folder in self.folders:
+            try:
+                entries = sorted(os.scandir(folder), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.lower().endswith(".pdf") or entry.name.startswith((".", "~$")):
+                    continue
+                path = os.path.abspath(entry.path)
+                try:
+                    stat = entry.stat()
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                present.add(path)
+                size, mtime = stat.st_size, stat.st_mtime_ns
+                if path in self._queued or self.ledger.seen(path, size, mtime):
+                    continue
+                known = self._candidates.get(path)
+                if known is None or known[:2] != (size, mtime):
+                    self._candidates[path] = (size, mtime, now)
+                    continue
+                waited = now - known[2]
+                if waited >= self.settle and (waited >= INCOMPLETE_GRACE or _complete(path)):
+                    del self._candidates[path]
+                    self._queued.add(path)
+                    self._ready.append((path, size, mtime))
+                    self.on_event('queued', path, None)
+        for path in set(self._candidates) - present:
+            # Removed (or renamed) before it settled
+            del self._candidates[path]
+
+    def flush(self):
+        # Write the finished files each output (and the store) does not have yet, then
+        # record in the ledger those that every one of them has
+        if not self._finished:
+            return
+        results = [item for item, _, _ in self._finished]
+        targets = ([self.store] if self.store is not None else []) + self.outputs
+        for target in targets:
+            start = self._written.get(target, 0)
+            if start == len(results):
+                continue
+            try:
+                if target is self.store:
+                    # A retry stores the files already put again: the upserts absorb that
+                    for _ in store_results(self.store, results[start:], self.timer):
+                        pass
+                else:
+                    write_batch(target, results[start:], self.kinds, self.timer, append=True,
+                                normalize=self.normalize)
+            except Exception as e:
+                name = self.store.path if target is self.store else target
+                self.on_event('write_failed', name, str(e) or e.__class__.__name__)
+                continue
+            self._written[target] = len(results)
+            if target is not self.store:
+                self.on_event('flushed', target, len(results) - start)
+        written = min((self._written.get(target, 0) for target in targets), default=len(results))
+        self._write_failed = written < len(results)
+        self._last_flush = time.monotonic()
+        if not written:
+            return
+        finished, self._finished = self._finished[:written], self._finished[written:]
+        self._written = {target: count - written for target, count in self._written.items()}
+        self.ledger.record([(path, size, mtime, error) for (path, _, error), (size, mtime), _ in finished])
+        if self.timings_path:
+            write_jsonl(self.timings_path, [({'job': 'watch', 'input': path, 'output': ";".join(self.outputs)},
+                                             records) for (path, _, _), _, records in finished if records])
+        for (path, _, _), _, _ in finished:
+            self._queued.discard(path)
+
+    def _collect(self, future, path, size, mtime):
+        # Move a finished future to the flush buffer; True when the pool broke
+        broken = False
+        records = None
+        try:
+            result, _, records = future.result()
+            item = (path, result, None)
+            self.on_event('done', path, None)
+        except BrokenProcessPool:
+            broken = True
+            item = (path, None, "Worker process crashed while extracting this file")
+            self.on_event('failed', path, item[2])
+        except Exception as e:
+            item = (path, None, str(e) or e.__class__.__name__)
+            self.on_event('failed', path, item[2])
+        self._finished.append((item, (size, mtime), records))
+        return broken
+
+    def _restart(self, pool, inflight):
+        # A dead process breaks the whole pool: its other files fail the same way
+        for future, (path, size, mtime) in list(inflight.items()):
+            self._collect(future, path, size, mtime)
+        inflight.clear()
+        pool.shutdown(wait=False, cancel_futures=True)
+        return self._pool()
+
+    def _pool(self):
+        return ProcessPoolExecutor(self.workers, initializer=_ignore_interrupt)
+
+    def stats_message(self):
+        counts = self.ledger.counts()
+        return (f"已处理 {counts.get('done', 0)} 份报告，失败 {counts.get('failed', 0)} 份；"
+                f"排队 {len(self._ready)} 份，等待写入完成 {len(self._candidates)} 份")
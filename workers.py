@@ -1,346 +1,420 @@
-import re
-import pandas as pd
-import fitz  # PyMuPDF
-import sys
-import pdfplumber
+import os
+import cProfile
+import threading
+from contextlib import contextmanager
 from PySide6.QtCore import QThread, Signal
-from pdf2docx import Converter
-from docx2pdf import convert
+from converters import pdf_to_word, word_to_pdf, convert_batch
+from extractors import DEGRADED, INCOMPLETE, KINDS, SHEET_NAMES, extract_all
+from exporters import write_report, write_batch
+from batch import iter_batch
+from table_backends import DEFAULT_TABLE_BACKEND
+from result_cache import ResultCache
+from ocr import DEFAULT_OCR_ENGINE, OcrCache, OcrReader
+from templates import TemplateStore
+from record_store import RecordStore, store_results
+from timing import StageTimer, write_jsonl
+
+# Qt wrappers around the Qt-free core (converters, extractors, exporters,
+# batch): each worker runs one core call in its thread and reports through signals.
+
+class JobCancelled(Exception):
+    pass
 
 class WorkerSignals(QThread):
     finished = Signal(str)  # Message
     error = Signal(str)
+    cancelled = Signal(str)
     progress = Signal(int)
+    log = Signal(str)  # Per-item notes for the log panel
 
-class PdfToWordWorker(WorkerSignals):
-    def __init__(self, pdf_path, docx_path):
+    # Subclasses implement process() and return the success message. run()
+    # times it stage by stage (summary to the log panel) and, when enabled
+    # through set_diagnostics(), appends the records to <output>.timings.jsonl
+    # and saves a cProfile dump as <output>.prof next to the output.
+    #
+    # cancel() may be called from any thread; process() stops at its next
+    # check_cancelled() (between files, page ranges or stages) and the job
+    # ends with `cancelled` instead of `finished`.
+    def __init__(self, input_path, output_path):
         super().__init__()
-        self.pdf_path = pdf_path
-        self.docx_path = docx_path
+        self.input_path = input_path
+        self.output_path = output_path
+        self.export_timings = False
+        self.profile = False
+        self.track_memory = False
+        self.timer = None
+        self._cancel = threading.Event()
+
+    def set_diagnostics(self, export_timings=False, profile=False, track_memory=False):
+        self.export_timings = export_timings
+        self.profile = profile
+        self.track_memory = track_memory
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def process(self):
+        raise NotImplementedError
 
     def run(self):
+        self.timer = StageTimer(self.track_memory)
+        profiler = cProfile.Profile() if self.profile else None
         try:
-            cv = Converter(self.pdf_path)
-            cv.convert(self.docx_path, start=0, end=None)
-            cv.close()
-            self.finished.emit(f"Successfully converted to {self.docx_path}")
+            self.check_cancelled()
+            if profiler:
+                profiler.enable()
+            try:
+                message = self.process()
+            finally:
+                if profiler:
+                    profiler.disable()
+                self.timer.close()
+                self.report_diagnostics(profiler)
+            self.finished.emit(message)
+        except JobCancelled:
+            self.cancelled.emit("Cancelled")
         except Exception as e:
             self.error.emit(str(e))
 
+    def timing_entries(self):
+        # (context, records) pairs for the JSONL export
+        context = {'job': type(self).__name__, 'input': self.input_path, 'output': self.output_path}
+        return [(context, self.timer.records)]
+
+    def report_diagnostics(self, profiler):
+        base = os.path.splitext(self.output_path)[0]
+        if self.timer.records:
+            self.log.emit(self.timer.summary())
+        if self.export_timings and self.timer.records:
+            write_jsonl(base + ".timings.jsonl", self.timing_entries())
+            self.log.emit(f"计时记录已写入: {base}.timings.jsonl")
+        if profiler:
+            profiler.dump_stats(base + ".prof")
+            self.log.emit(f"性能剖析已保存: {base}.prof")
+
+    @contextmanager
+    def result_cache(self, use_cache):
+        # Opened inside run(): SQLite connections belong to the thread that made them.
+        # Yields None when caching is off; hit/miss counts go to the log panel.
+        if not use_cache:
+            yield None
+            return
+        cache = ResultCache()
+        try:
+            yield cache
+            self.log.emit(cache.stats_message())
+        finally:
+            cache.close()
+
+    @contextmanager
+    def template_store(self, enabled):
+        # Learned table layouts (templates.py); follows the cache setting, as both
+        # reuse what earlier runs found
+        if not enabled:
+            yield None
+            return
+        templates = TemplateStore()
+        try:
+            yield templates
+            if templates.hits or templates.fallbacks or templates.learned:
+                self.log.emit(templates.stats_message())
+        finally:
+            templates.close()
+
+    @contextmanager
+    def ocr_reader(self, enabled, use_cache):
+        # OCR for scanned pages (ocr.py), one Tesseract process per CPU on the
+        # pages of this report; recognized pages are cached with the results
+        if not enabled:
+            yield None
+            return
+        reader = OcrReader(DEFAULT_OCR_ENGINE, OcrCache() if use_cache else None, os.cpu_count())
+        try:
+            yield reader
+            if reader.recognized or reader.hits:
+                self.log.emit(reader.stats_message())
+        finally:
+            reader.close()
+
+    @contextmanager
+    def record_store(self, enabled):
+        # The record store (record_store.py) results are upserted into, or None
+        if not enabled:
+            yield None
+            return
+        store = RecordStore()
+        try:
+            yield store
+            self.log.emit(store.stats_message())
+        finally:
+            store.close()
+
+    def store_result(self, enabled, pdf_path, result):
+        # Upsert one report into the record store when enabled
+        with self.record_store(enabled) as store:
+            if store is not None:
+                with self.timer.stage('store'):
+                    store.put(result, os.path.basename(pdf_path))
+
+    def log_degraded(self, pdf_path, result):
+        # Pages whose tables were read with the fallback engine (over a time budget)
+        for page in result.get(DEGRADED, []):
+            self.log.emit(f"{os.path.basename(pdf_path)} 第 {page['页码']} 页降级（改用 words 引擎识别）：{page['原因']}")
+        if result.get(INCOMPLETE):
+            kinds = "、".join(SHEET_NAMES[kind] for kind in result[INCOMPLETE])
+            self.log.emit(f"{os.path.basename(pdf_path)} 结果不完整：{kinds}跨页表格的续页行未能识别")
+
+    def degraded_notes(self, results):
+        # Passes (path, result, error) tuples through, logging degraded pages
+        for path, result, error in results:
+            if error is None:
+                self.log_degraded(path, result)
+            yield path, result, error
+
+class BatchWorker(WorkerSignals):
+    # Base for jobs over many files run on a process pool. Pool processes time
+    # their own files into `file_timings`; those records are summed for the log
+    # and exported one line per file and stage. cProfile only sees this thread
+    # (pool scheduling and output), not the pool processes.
+    def __init__(self, output_path):
+        super().__init__(None, output_path)
+        self.file_timings = []
+
+    def timing_entries(self):
+        job = type(self).__name__
+        entries = [({'job': job, 'input': path, 'output': self.output_path}, records)
+                   for path, records in self.file_timings]
+        entries.append(({'job': job, 'input': None, 'output': self.output_path}, self.timer.records))
+        return entries
+
+    def report_diagnostics(self, profiler):
+        if self.file_timings:
+            per_file = StageTimer()
+            for _, records in self.file_timings:
+                per_file.merge(records)
+            self.log.emit(f"各文件{per_file.summary()}")
+        super().report_diagnostics(profiler)
+
+class PdfToWordWorker(WorkerSignals):
+    # Pages are parsed in ranges on `max_workers` processes; progress follows
+    # the parsed pages up to 95%, the rest is writing the docx
+    def __init__(self, pdf_path, docx_path, max_workers=1):
+        super().__init__(pdf_path, docx_path)
+        self.pdf_path = pdf_path
+        self.docx_path = docx_path
+        self.max_workers = max_workers
+
+    def process(self):
+        with self.timer.stage('convert') as counts:
+            def on_progress(done, total):
+                counts['pages'] = total
+                self.progress.emit(int(done * 95 / total))
+                self.check_cancelled()
+
+            pdf_to_word(self.pdf_path, self.docx_path, self.max_workers, on_progress)
+        self.progress.emit(100)
+        return f"Successfully converted {counts.get('pages', 0)} pages to {self.docx_path}"
+
 class WordToPdfWorker(WorkerSignals):
-    def __init__(self, docx_path, pdf_path):
-        super().__init__()
+    # The office backend is shared by the whole app, so its LibreOffice
+    # processes stay warm from one conversion to the next
+    def __init__(self, docx_path, pdf_path, word_backend=None, timeout=None):
+        super().__init__(docx_path, pdf_path)
         self.docx_path = docx_path
         self.pdf_path = pdf_path
+        self.word_backend = word_backend
+        self.timeout = timeout
 
-    def run(self):
-        try:
-            convert(self.docx_path, self.pdf_path)
-            self.finished.emit(f"Successfully converted to {self.pdf_path}")
-        except Exception as e:
-            self.error.emit(str(e))
+    def process(self):
+        with self.timer.stage('convert'):
+            word_to_pdf(self.docx_path, self.pdf_path, self.word_backend, self.timeout)
+        return f"Successfully converted to {self.pdf_path}"
+
+class BatchConvertWorker(BatchWorker):
+    # Converts many files into one folder with at most `max_workers` conversions at a time
+    def __init__(self, paths, mode, out_dir, max_workers=None, word_backend=None, timeout=None):
+        super().__init__(out_dir)
+        self.paths = list(paths)
+        self.mode = mode
+        self.out_dir = out_dir
+        self.max_workers = max_workers
+        self.word_backend = word_backend
+        self.timeout = timeout
+
+    def process(self):
+        if not self.paths:
+            raise ValueError("No files to convert")
+
+        def on_result(done, total, path, error):
+            name = os.path.basename(path)
+            if error is None:
+                self.log.emit(f"[{done}/{total}] {name} 完成")
+            else:
+                self.log.emit(f"[{done}/{total}] {name} 失败: {error}")
+            self.progress.emit(int(done * 100 / total))
+            self.check_cancelled()
+
+        self.file_timings = []
+        os.makedirs(self.out_dir, exist_ok=True)
+        with self.timer.stage('batch', files=len(self.paths)):
+            results = convert_batch(self.paths, self.mode, self.out_dir, self.max_workers, on_result,
+                                    self.file_timings, self.track_memory, self.word_backend, self.timeout)
+        ok = sum(1 for _, _, error in results if error is None)
+        return f"Successfully converted {ok}/{len(results)} files to {self.out_dir}"
 
 class PdfToExcelWorker(WorkerSignals):
-    def __init__(self, pdf_path, excel_path):
-        super().__init__()
+    def __init__(self, pdf_path, excel_path, use_cache=True, append=False, use_store=False, use_ocr=False):
+        super().__init__(pdf_path, excel_path)
         self.pdf_path = pdf_path
         self.excel_path = excel_path
+        self.use_cache = use_cache
+        self.append = append
+        self.use_store = use_store
+        self.use_ocr = use_ocr
 
-    def run(self):
-        try:
-            doc = fitz.open(self.pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            doc.close()
-            
-            # Safely print text for debugging
-            try:
-                safe_text = text.encode(sys.stdout.encoding, errors='replace').decode(sys.stdout.encoding)
-                print("--- Extracted Text Start ---")
-                print(safe_text)
-                print("--- Extracted Text End ---")
-            except Exception as print_error:
-                print(f"Could not print text to console: {print_error}")
-
-            data = {}
-            
-            def extract(pattern, default=""):
-                match = re.search(pattern, text)
-                return match.group(1).strip() if match else default
-
-            # Basic Info
-            data['检测号'] = extract(r"检测号[：:]\s*([A-Za-z0-9]+)")
-            data['报告系统版本号'] = extract(r"报告系统版本号\s*([A-Za-z0-9\s\.]+?)(?=\s+生信分析版本号|$)")
-            data['生信分析版本号'] = extract(r"生信分析版本号\s*([A-Za-z0-9\s\.]+?)(?=\s+上机号|$)")
-            data['上机号'] = extract(r"上机号[：:]\s*(\d+)")
-            
-            # Simplified Name/Gender/Age extraction
-            match_name = re.search(r"姓\s*名[：:]\s*(\S+)", text)
-            if not match_name:
-                 match_name = re.search(r"姓\s*名\s*[：:]?\s*(\S+)", text)
-            data['姓名'] = match_name.group(1).strip() if match_name else ""
-
-            match_gender = re.search(r"性\s*别[：:]\s*([男女])", text)
-            if not match_gender:
-                 match_gender = re.search(r"性\s*别\s*[：:]?\s*([男女])", text)
-            data['性别'] = match_gender.group(1).strip() if match_gender else ""
-
-            match_age = re.search(r"年\s*龄[：:]\s*(\d+)\s*岁?", text)
-            if not match_age:
-                 match_age = re.search(r"年\s*龄\s*[：:]?\s*(\d+)\s*岁?", text)
-            data['年龄'] = (match_age.group(1).strip() + "岁") if match_age else ""
-            
-            data['采样日期'] = extract(r"采样日期[：:]\s*(\d{4}-\d{2}-\d{2})")
-            
-            match_specimen = re.search(r"标本类型[：:]\s*(.+?)(?=\s+住院号|\s+病理号|\n|$)", text)
-            data['标本类型'] = match_specimen.group(1).strip() if match_specimen else ""
-            
-            data['住院号'] = extract(r"住院号[：:]\s*(\S+)")
-            data['病理号'] = extract(r"病理号[：:]\s*(\S+)")
-            
-            # ID Card Extraction Logic
-            match_id_label = re.search(r"身\s*份\s*证\s*号[：:]\s*(.*?)(?=\s+姓\s*名|\s+送\s*检|\n|$)", text)
-            id_card = match_id_label.group(1).strip() if match_id_label else ""
-            id_card = id_card.replace(" ", "").replace("-", "") 
-
-            is_valid_id = re.match(r"^(\d{15}|\d{17}[0-9Xx])$", id_card)
-            
-            if not is_valid_id:
-                 match_global = re.search(r"(?<!\d)(\d{18}|\d{17}[0-9Xx])(?!\d)", text)
-                 if match_global:
-                     id_card = match_global.group(1)
-            
-            data['身份证号'] = id_card
-
-            data['送检日期'] = extract(r"送检日期[：:]\s*(\d{4}-\d{2}-\d{2})")
-            data['病历号'] = extract(r"病历号[：:]\s*(\d+)")
-            data['送检医生'] = extract(r"送检医生[：:]\s*(\S+)")
-            
-            match_unit = re.search(r"送检单位[：:]\s*(.+?)(?=\s+身份证号|\n|$)", text)
-            unit_raw = match_unit.group(1).strip() if match_unit else ""
-            unit_clean = re.sub(r"\d{18}|\d{17}[Xx]", "", unit_raw).strip()
-            data['送检单位'] = unit_clean
-
-            data['检测项目'] = extract(r"检测项目[：:]\s*(.+)")
-            data['检测方法'] = extract(r"检测方法[：:]\s*(.+)")
-            data['送检材料'] = extract(r"送检材料[：:]\s*(.+)")
-            data['临床诊断'] = extract(r"临床诊断[：:]\s*(.+)")
-
-            columns = [
-                '检测号', '报告系统版本号', '生信分析版本号', '上机号', 
-                '姓名', '性别', '年龄', '采样日期', '标本类型', 
-                '住院号', '病理号', '身份证号', '送检日期', '病历号', 
-                '送检医生', '送检单位', '检测项目', '检测方法', 
-                '送检材料', '临床诊断'
-            ]
-            
-            df = pd.DataFrame([data], columns=columns)
-            df.to_excel(self.excel_path, index=False)
-            
-            self.finished.emit(f"Successfully extracted to {self.excel_path}")
-        except Exception as e:
-            self.error.emit(str(e))
+    def process(self):
+        with self.result_cache(self.use_cache) as cache, self.ocr_reader(self.use_ocr, self.use_cache) as ocr:
+            result = extract_all(self.pdf_path, ['basic'], cache=cache, timer=self.timer, ocr=ocr)
+        self.store_result(self.use_store, self.pdf_path, result)
+        self.check_cancelled()
+        write_report(self.excel_path, result, ['basic'], self.timer, self.append)
+        return f"Successfully extracted to {self.excel_path}"
 
 class PdfToRearrangementWorker(WorkerSignals):
-    def __init__(self, pdf_path, excel_path):
-        super().__init__()
+    # page_workers: processes reading the table pages of a long report (extractors.ParsedReport)
+    def __init__(self, pdf_path, excel_path, table_backend=DEFAULT_TABLE_BACKEND, use_cache=True, append=False,
+                 memory_limit=None, use_store=False, normalize=False, use_ocr=False, page_workers=1):
+        super().__init__(pdf_path, excel_path)
         self.pdf_path = pdf_path
         self.excel_path = excel_path
+        self.table_backend = table_backend
+        self.use_cache = use_cache
+        self.append = append
+        self.use_store = use_store
+        self.normalize = normalize
+        self.memory_limit = memory_limit
+        self.use_ocr = use_ocr
+        self.page_workers = page_workers
 
-    def run(self):
-        try:
-            # Phase 1: Basic text extraction for Name and Detection No (PyMuPDF is faster/reliable for plain text)
-            doc = fitz.open(self.pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            doc.close()
-
-            data_header = {}
-            match_name = re.search(r"姓\s*名[：:]\s*(\S+)", text)
-            if not match_name:
-                 match_name = re.search(r"姓\s*名\s*[：:]?\s*(\S+)", text)
-            data_header['姓名'] = match_name.group(1).strip() if match_name else ""
-            
-            match_det_no = re.search(r"检测号[：:]\s*([A-Za-z0-9]+)", text)
-            data_header['检测号'] = match_det_no.group(1).strip() if match_det_no else ""
-
-            # Phase 2: Table extraction for Rearrangement Data (using pdfplumber)
-            # The image shows a table with headers: 重排基因 | 左断裂点位置 | 右断裂点位置
-            
-            all_rows = []
-            found_table = False
-            
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    for table in tables:
-                        if not table: continue
-                        
-                        # Check header row
-                        header = [str(cell).replace('\n', '').strip() for cell in table[0] if cell]
-                        header_str = "".join(header)
-                        
-                        # Look for key headers from user image
-                        if "重排基因" in header_str and "断裂点" in header_str:
-                            found_table = True
-                            
-                            # Identify column indices
-                            def find_idx(keywords):
-                                for idx, col in enumerate(header):
-                                    if any(k in col for k in keywords):
-                                        return idx
-                                return -1
-
-                            idx_gene = find_idx(["重排基因"])
-                            idx_left = find_idx(["左断裂", "Left"])
-                            idx_right = find_idx(["右断裂", "Right"])
-                            
-                            # Extract rows
-                            for row in table[1:]:
-                                if not row or len(row) < 2: continue
-                                
-                                def get_cell(idx):
-                                    if idx != -1 and idx < len(row):
-                                        val = row[idx]
-                                        return val.replace('\n', ' ').strip() if val else ""
-                                    return ""
-                                
-                                gene_val = get_cell(idx_gene)
-                                # Filter out empty rows or placeholder rows if needed
-                                if not gene_val or gene_val == "-": 
-                                    gene_val = "无" # Or keep as "-" based on preference, user said "有就写有，没有就写无"
-                                    # If it is explicitly "-", let's treat it as "无" for consistency if desired, 
-                                    # but if it's a real gene name, keep it.
-                                
-                                left_val = get_cell(idx_left)
-                                right_val = get_cell(idx_right)
-                                
-                                if gene_val == "无" and not left_val and not right_val:
-                                    # If row is essentially empty/dash, we capture it as one entry of "无"
-                                    pass
-
-                                row_data = {
-                                    '姓名': data_header['姓名'],
-                                    '检测号': data_header['检测号'],
-                                    '重排基因': gene_val,
-                                    '左断裂点位': left_val if left_val else "-",
-                                    '右断裂点位': right_val if right_val else "-"
-                                }
-                                all_rows.append(row_data)
-
-            # If no table found or empty table, create a default "None" row
-            if not all_rows:
-                # Fallback to regex text search if table extraction failed (legacy logic)
-                # But since user asked for "Correction/Efficiency", table extraction is primary.
-                # If table is truly missing, we assume "无"
-                all_rows.append({
-                    '姓名': data_header['姓名'],
-                    '检测号': data_header['检测号'],
-                    '重排基因': "无",
-                    '左断裂点位': "-",
-                    '右断裂点位': "-"
-                })
-
-            columns = ['姓名', '检测号', '重排基因', '左断裂点位', '右断裂点位']
-            df = pd.DataFrame(all_rows, columns=columns)
-            df.to_excel(self.excel_path, index=False)
-            
-            self.finished.emit(f"Successfully extracted {len(all_rows)} rearrangement records to {self.excel_path}")
-        except Exception as e:
-            self.error.emit(str(e))
+    def process(self):
+        with self.result_cache(self.use_cache) as cache, self.template_store(self.use_cache) as templates:
+            with self.ocr_reader(self.use_ocr, self.use_cache) as ocr:
+                result = extract_all(self.pdf_path, ['rearrangement'], self.table_backend, cache, self.timer, templates,
+                                     memory_limit=self.memory_limit, ocr=ocr, page_workers=self.page_workers)
+        self.log_degraded(self.pdf_path, result)
+        self.store_result(self.use_store, self.pdf_path, result)
+        self.check_cancelled()
+        write_report(self.excel_path, result, ['rearrangement'], self.timer, self.append, self.normalize)
+        all_rows = result['rearrangement']
+        return f"Successfully extracted {len(all_rows)} rearrangement records to {self.excel_path}"
 
 class PdfToMutationWorker(WorkerSignals):
-    def __init__(self, pdf_path, excel_path):
-        super().__init__()
+    def __init__(self, pdf_path, excel_path, table_backend=DEFAULT_TABLE_BACKEND, use_cache=True, append=False,
+                 memory_limit=None, use_store=False, normalize=False, use_ocr=False, page_workers=1):
+        super().__init__(pdf_path, excel_path)
         self.pdf_path = pdf_path
         self.excel_path = excel_path
+        self.table_backend = table_backend
+        self.use_cache = use_cache
+        self.append = append
+        self.use_store = use_store
+        self.normalize = normalize
+        self.memory_limit = memory_limit
+        self.use_ocr = use_ocr
+        self.page_workers = page_workers
 
-    def run(self):
-        try:
-            # First pass: Extract Detection No using PyMuPDF (lighter/faster for text)
-            doc = fitz.open(self.pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text() + "\n"
-            doc.close()
-            
-            match_det_no = re.search(r"检测号[：:]\s*([A-Za-z0-9]+)", text)
-            detection_no = match_det_no.group(1).strip() if match_det_no else ""
-
-            # Second pass: Extract Table Data using pdfplumber
-            # We are looking for columns: 突变基因, 转录本 ID, 外显子, 核苷酸改变, 氨基酸改变, 突变频率
-            # Note: Column names in PDF might vary slightly (e.g. "Gene", "Transcript", "Exon", "c.Change", "p.Change", "VAF")
-            # We'll try to identify the table by its header or content.
-            
-            all_rows = []
-            
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for page in pdf.pages:
-                    tables = page.extract_tables()
-                    for table in tables:
-                        # Heuristic: Check if table has relevant headers
-                        # Flatten table to check headers easily
-                        if not table: continue
-                        
-                        header = [str(cell).replace('\n', '') for cell in table[0] if cell]
-                        # Check for keywords like "基因" (Gene), "突变" (Mutation), "频率" (Frequency)
-                        header_str = " ".join(header)
-                        
-                        if "基因" in header_str and "改变" in header_str:
-                            # This looks like the mutation table
-                            # Map columns based on index
-                            # Standard format: Gene | ... | Transcript | Exon | c. | p. | VAF
-                            
-                            # Let's try to find indices dynamically
-                            def find_idx(keywords):
-                                for idx, col in enumerate(header):
-                                    if any(k in col for k in keywords):
-                                        return idx
-                                return -1
-
-                            idx_gene = find_idx(["基因", "Gene"])
-                            idx_trans = find_idx(["转录本", "Transcript"])
-                            idx_exon = find_idx(["外显子", "Exon"])
-                            idx_nuc = find_idx(["核苷酸", "c."])
-                            idx_aa = find_idx(["氨基酸", "p."])
-                            idx_vaf = find_idx(["频率", "VAF", "%"])
-                            
-                            # Iterate data rows (skip header)
-                            for row in table[1:]:
-                                if not row or len(row) < 3: continue # Skip empty or short rows
-                                
-                                # Helper to get cell data safely
-                                def get_cell(idx):
-                                    if idx != -1 and idx < len(row):
-                                        val = row[idx]
-                                        return val.replace('\n', ' ').strip() if val else ""
-                                    return ""
-
-                                # Check if row is valid (has gene name)
-                                gene_val = get_cell(idx_gene)
-                                if not gene_val: continue
-                                
-                                row_data = {
-                                    '检测号': detection_no,
-                                    '突变基因': gene_val,
-                                    '转录本 ID': get_cell(idx_trans),
-                                    '外显子': get_cell(idx_exon),
-                                    '核苷酸改变': get_cell(idx_nuc),
-                                    '氨基酸改变': get_cell(idx_aa),
-                                    '突变频率': get_cell(idx_vaf)
-                                }
-                                all_rows.append(row_data)
-
-            # Create DataFrame
-            columns = ['检测号', '突变基因', '转录本 ID', '外显子', '核苷酸改变', '氨基酸改变', '突变频率']
-            df = pd.DataFrame(all_rows, columns=columns)
-            
-            # Save
-            df.to_excel(self.excel_path, index=False)
-            
-            self.finished.emit(f"Successfully extracted {len(all_rows)} mutations to {self.excel_path}")
-            
-        except Exception as e:
-            self.error.emit(str(e))
+    def process(self):
+        with self.result_cache(self.use_cache) as cache, self.template_store(self.use_cache) as templates:
+            with self.ocr_reader(self.use_ocr, self.use_cache) as ocr:
+                result = extract_all(self.pdf_path, ['mutation'], self.table_backend, cache, self.timer, templates,
+                                     memory_limit=self.memory_limit, ocr=ocr, page_workers=self.page_workers)
+        self.log_degraded(self.pdf_path, result)
+        self.store_result(self.use_store, self.pdf_path, result)
+        self.check_cancelled()
+        write_report(self.excel_path, result, ['mutation'], self.timer, self.append, self.normalize)
+        all_rows = result['mutation']
+        return f"Successfully extracted {len(all_rows)} mutations to {self.excel_path}"
+
+class PdfToReportWorker(WorkerSignals):
+    # Extracts basic info, rearrangements and mutations from one parse of the
+    # PDF and writes them to a multi-sheet workbook
+    def __init__(self, pdf_path, excel_path, table_backend=DEFAULT_TABLE_BACKEND, use_cache=True, append=False,
+                 memory_limit=None, use_store=False, normalize=False, use_ocr=False, page_workers=1):
+        super().__init__(pdf_path, excel_path)
+        self.pdf_path = pdf_path
+        self.excel_path = excel_path
+        self.table_backend = table_backend
+        self.use_cache = use_cache
+        self.append = append
+        self.use_store = use_store
+        self.normalize = normalize
+        self.memory_limit = memory_limit
+        self.use_ocr = use_ocr
+        self.page_workers = page_workers
+
+    def process(self):
+        with self.result_cache(self.use_cache) as cache, self.template_store(self.use_cache) as templates:
+            with self.ocr_reader(self.use_ocr, self.use_cache) as ocr:
+                result = extract_all(self.pdf_path, KINDS, self.table_backend, cache, self.timer, templates,
+                                     memory_limit=self.memory_limit, ocr=ocr, page_workers=self.page_workers)
+        self.log_degraded(self.pdf_path, result)
+        self.store_result(self.use_store, self.pdf_path, result)
+        self.check_cancelled()
+        write_report(self.excel_path, result, KINDS, self.timer, self.append, self.normalize)
+        return (f"Successfully extracted {len(result['mutation'])} mutations and "
+                f"{len(result['rearrangement'])} rearrangement records to {self.excel_path}")
+
+class BatchExtractWorker(BatchWorker):
+    # Extracts many PDFs on a process pool and streams them into one combined
+    # output with a table per report kind (plus a failure table when needed);
+    # rows are written as files finish, in input order
+    def __init__(self, pdf_paths, excel_path, kinds, max_workers=None, table_backend=DEFAULT_TABLE_BACKEND,
+                 use_cache=True, append=False, memory_limit=None, use_store=False, normalize=False, use_ocr=False):
+        super().__init__(excel_path)
+        self.pdf_paths = list(pdf_paths)
+        self.excel_path = excel_path
+        self.kinds = list(kinds)
+        self.max_workers = max_workers
+        self.table_backend = table_backend
+        self.use_cache = use_cache
+        self.append = append
+        self.use_store = use_store
+        self.normalize = normalize
+        self.memory_limit = memory_limit
+        self.use_ocr = use_ocr
+
+    def process(self):
+        if not self.pdf_paths:
+            raise ValueError("No PDF files to process")
+
+        hits = []
+
+        def on_result(done, total, path, error, cached):
+            name = os.path.basename(path)
+            if error is None:
+                hits.append(cached)
+                self.log.emit(f"[{done}/{total}] {name} 完成" + ("（缓存）" if cached else ""))
+            else:
+                self.log.emit(f"[{done}/{total}] {name} 失败: {error}")
+            self.progress.emit(int(done * 100 / total))
+            self.check_cancelled()
+
+        self.file_timings = []
+        with self.timer.stage('batch', files=len(self.pdf_paths)), self.record_store(self.use_store) as store:
+            results = self.degraded_notes(iter_batch(self.pdf_paths, self.kinds, self.max_workers, on_result,
+                                                     self.table_backend, self.use_cache, self.file_timings,
+                                                     self.track_memory, self.use_cache,
+                                                     memory_limit=self.memory_limit,
+                                                     ocr=DEFAULT_OCR_ENGINE if self.use_ocr else None))
+            if store is not None:
+                results = store_results(store, results, self.timer)
+            ok, failed = write_batch(self.excel_path, results, self.kinds, self.timer, self.append,
+                                     self.normalize)
+
+        if self.use_cache:
+            self.log.emit(f"缓存命中 {sum(hits)}，未命中 {len(hits) - sum(hits)}（按文件）")
+        return f"Successfully extracted {ok}/{ok + failed} reports to {self.excel_path}"